@@ -0,0 +1,81 @@
+"""Latency and query counts of the Expense Entry hooks on the in-memory frappe.
+
+Times the save hooks on save and approval, the posting worker and dimension sync
+for a range of entry sizes, and reports the queries each path issues. Needs
+no bench:
+
+    python -m benchmarks.bench_hooks
+"""
+
+import argparse
+import time
+
+from tests import memory_frappe
+
+memory_frappe.install()
+
+from expense_request import accounting_dimensions_handler, api
+from tests.memory_frappe import new_request, run_jobs
+from tests.utils import make_entry, setup_site
+
+ITEM_COUNTS = (10, 100, 1000)
+DIMENSION_COUNTS = (2, 5, 20)
+
+
+def measure(fn):
+    db = memory_frappe.local.db
+    db.log.reset()
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000, db.log.count
+
+
+def measure_save(entry, **changes):
+    """Time the validate and on_update hooks of a save, not the snapshot"""
+    entry.load_doc_before_save()
+    entry.update(changes)
+
+    def hooks():
+        api.setup(entry, "validate")
+        api.on_update(entry, "on_update")
+
+    return measure(hooks)
+
+
+def run_case(item_count, dimension_count):
+    dimensions = tuple(f"dimension_{i}" for i in range(dimension_count))
+    setup_site(dimensions)
+    results = {}
+
+    results["dimension sync"] = measure(accounting_dimensions_handler.sync_all_accounting_dimensions)
+
+    entry = make_entry(items=item_count, dimensions=dimensions)
+    new_request()
+    results["save (cold)"] = measure(lambda: api.setup(entry, "validate"))
+    new_request()
+    results["save (warm)"] = measure_save(entry, remarks="Checked")
+
+    entry = make_entry(items=item_count, dimensions=dimensions, name="EXP-BENCH-2")
+    new_request()
+    results["approve"] = measure_save(entry, status="Approved", docstatus=1)
+    new_request()
+    results["post"] = measure(run_jobs)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, action="append")
+    parser.add_argument("--dimensions", type=int, action="append")
+    args = parser.parse_args(argv)
+
+    print(f"{'items':>6} {'dims':>5} {'path':<16} {'ms':>9} {'queries':>8}")
+    for item_count in args.items or ITEM_COUNTS:
+        for dimension_count in args.dimensions or DIMENSION_COUNTS:
+            for path, (ms, queries) in run_case(item_count, dimension_count).items():
+                print(f"{item_count:>6} {dimension_count:>5} {path:<16} {ms:>9.2f} {queries:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# Runs the tests/ suite against the in-memory frappe stand-in. The suite lives
+# outside the app package so `bench run-tests` never collects it; under a
+# bench the real frappe is importable and this does nothing.
+
+from tests import memory_frappe
+
+memory_frappe.install()
@@ -1,181 +1,470 @@
 # accounting_dimension_handler.py
 # Updated to work with your existing DocType structure
 
+import hashlib
+import json
+
 import frappe
-from frappe.custom.doctype.custom_field.custom_field import create_custom_field
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
 from frappe import _
 
+from expense_request.instrumentation import instrument
 
-def on_dimension_change(doc, method):
-    """Handle accounting dimension creation/update"""
-    if method in ["after_insert", "on_update"]:
-        create_dimension_fields(doc)
+DIMENSION_CACHE_KEY = "expense_request:accounting_dimensions"
+DIMENSION_PAYLOAD_CACHE_KEY = "expense_request:accounting_dimensions_payload"
 
+DIMENSION_FIELDS = [
+    "name",
+    "fieldname",
+    "label",
+    "document_type",
+    "mandatory_for_bs",
+    "mandatory_for_pl",
+]
 
-def on_dimension_delete(doc, method):
-    """Handle accounting dimension deletion"""
-    delete_dimension_fields(doc)
 
+def get_active_dimensions():
+    """Get all active accounting dimensions from the dimension registry.
 
-def create_dimension_fields(dimension_doc):
-    """Create custom fields for a new accounting dimension"""
+    Results are memoised on ``frappe.local`` for the current request and kept in
+    the site cache until an Accounting Dimension changes, so the Expense Entry
+    save path doesn't query the Accounting Dimension table.
+    """
 
-    fieldname = dimension_doc.fieldname
-    label = dimension_doc.label
-    document_type = dimension_doc.document_type
+    dimensions = getattr(frappe.local, "expense_request_dimensions", None)
+    if dimensions is not None:
+        return dimensions
 
-    # Skip if this dimension already exists as a default field in the DocType
-    existing_default_fields = ["default_project", "default_cost_center"]
-    existing_item_fields = ["project", "cost_center"]
+    dimensions = frappe.cache().get_value(DIMENSION_CACHE_KEY)
+    if dimensions is None:
+        dimensions = frappe.get_all(
+            "Accounting Dimension",
+            filters={"disabled": 0},
+            fields=DIMENSION_FIELDS,
+        )
+        frappe.cache().set_value(DIMENSION_CACHE_KEY, dimensions)
 
-    default_fieldname = f"default_{fieldname}"
+    frappe.local.expense_request_dimensions = dimensions
+    return dimensions
 
-    try:
-        # Add default dimension field to parent Expense Entry (only if not already in DocType)
-        if default_fieldname not in existing_default_fields and not frappe.db.exists(
-            "Custom Field", {"dt": "Expense Entry", "fieldname": default_fieldname}
-        ):
 
-            create_custom_field(
-                "Expense Entry",
-                {
-                    "fieldname": default_fieldname,
-                    "label": f"Default {label}",
-                    "fieldtype": "Link",
-                    "options": document_type,
-                    "insert_after": get_insert_after_field("Expense Entry"),
-                    "in_list_view": 0,
-                    "in_standard_filter": 1,
-                    "reqd": 0,
-                    "description": f"Applies to all expenses below unless specified differently",
-                },
-            )
-            print(f"Created default field for {label}")
+def clear_dimension_cache():
+    """Drop the cached dimension registry for this site and request"""
+    frappe.cache().delete_value([DIMENSION_CACHE_KEY, DIMENSION_PAYLOAD_CACHE_KEY])
+    frappe.local.expense_request_dimensions = None
 
-        # Add dimension field to child table (only if not already in DocType)
-        if fieldname not in existing_item_fields and not frappe.db.exists(
-            "Custom Field", {"dt": "Expense Entry Item", "fieldname": fieldname}
+
+def get_dimension_payload():
+    """Dimension metadata for the Expense Entry form.
+
+    Carries the active dimensions with the link filters their DocType
+    supports, per-company defaults from the dimension's default table, and a
+    version hash the browser uses to keep the payload in localStorage. Cached
+    alongside the dimension registry, so it costs no queries once warm.
+    """
+
+    payload = frappe.cache().get_value(DIMENSION_PAYLOAD_CACHE_KEY)
+    if payload is not None:
+        return payload
+
+    dimensions = get_active_dimensions()
+
+    company_defaults = {}
+    if dimensions:
+        for row in frappe.get_all(
+            "Accounting Dimension Detail",
+            filters={
+                "parenttype": "Accounting Dimension",
+                "parent": ("in", [d.name for d in dimensions]),
+            },
+            fields=["parent", "company", "default_dimension"],
         ):
+            if row.default_dimension:
+                fieldname = next(d.fieldname for d in dimensions if d.name == row.parent)
+                company_defaults.setdefault(row.company, {})[fieldname] = row.default_dimension
+
+    client_dimensions = []
+    for dimension in dimensions:
+        meta = frappe.get_meta(dimension.document_type)
+        client_dimensions.append(
+            {
+                "fieldname": dimension.fieldname,
+                "label": dimension.label,
+                "document_type": dimension.document_type,
+                "mandatory_for_pl": dimension.mandatory_for_pl,
+                "mandatory_for_bs": dimension.mandatory_for_bs,
+                "filter_company": meta.has_field("company"),
+                "filter_disabled": meta.has_field("disabled"),
+                "filter_is_group": meta.has_field("is_group"),
+            }
+        )
+
+    payload = {"dimensions": client_dimensions, "company_defaults": company_defaults}
+    payload["version"] = hashlib.md5(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+    frappe.cache().set_value(DIMENSION_PAYLOAD_CACHE_KEY, payload)
+    return payload
+
 
-            create_custom_field(
-                "Expense Entry Item",
-                {
-                    "fieldname": fieldname,
-                    "label": label,
-                    "fieldtype": "Link",
-                    "options": document_type,
-                    "insert_after": get_insert_after_field("Expense Entry Item"),
-                    "in_list_view": 1,
-                    "reqd": 1 if dimension_doc.mandatory_for_pl else 0,
-                    "columns": 2,
-                },
+def get_dimension_version():
+    return get_dimension_payload()["version"]
+
+
+def boot_session(bootinfo):
+    """Let the desk tell whether its stored dimension payload is current"""
+    bootinfo.expense_request_dimensions_version = get_dimension_version()
+
+
+@frappe.whitelist()
+def get_dimension_payload_for_client(version=None):
+    """Dimension payload for forms without an onload payload (new entries);
+    returns only the version when the caller already holds it"""
+
+    payload = get_dimension_payload()
+    if version and version == payload["version"]:
+        return {"version": version}
+    return payload
+
+
+@instrument("on_dimension_change")
+def on_dimension_change(doc, method):
+    """Handle accounting dimension creation/update"""
+    clear_dimension_cache()
+    if method in ["after_insert", "on_update"]:
+        changes = reconcile_dimension_fields()
+        if any(changes.values()):
+            frappe.msgprint(
+                _("Accounting dimension fields updated for {0}").format(doc.label),
+                alert=True,
+                indicator="green",
             )
-            print(f"Created item field for {label}")
 
+        before = doc.get_doc_before_save()
+        if method == "after_insert" or (before and before.disabled != doc.disabled):
+            queue_summary_rebuild()
+
+
+@instrument("on_dimension_delete")
+def on_dimension_delete(doc, method):
+    """Handle accounting dimension deletion"""
+    clear_dimension_cache()
+    queue_summary_rebuild()
+    try:
+        changes = reconcile_dimension_fields(removed=[doc.name])
+    except Exception as e:
+        frappe.log_error(f"Error deleting dimension fields for {doc.label}: {str(e)}")
+        return
+
+    if changes["remove"]:
         frappe.msgprint(
-            _("Accounting dimension fields created for {0}").format(label),
+            _("Accounting dimension fields removed for {0}").format(doc.label),
             alert=True,
-            indicator="green",
+            indicator="orange",
         )
 
-    except Exception as e:
-        frappe.log_error(f"Error creating dimension fields for {label}: {str(e)}")
-        frappe.throw(
-            _("Error creating fields for accounting dimension {0}").format(label)
+
+def queue_summary_rebuild():
+    """Expense Summary rows are keyed by the active dimensions, so rows written
+    before a dimension was added, enabled, disabled or deleted would no longer
+    be found by a cancellation: rebuild them under the new key"""
+    frappe.enqueue(
+        "expense_request.summary.rebuild_summary",
+        queue="long",
+        timeout=3600,
+        job_id="expense_request::rebuild_summary",
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+# Dimension fields that are part of the core DocTypes, never managed as custom fields
+CORE_DIMENSIONS = ("project", "cost_center")
+
+DIMENSION_DOCTYPES = (
+    "Expense Entry",
+    "Expense Entry Item",
+    "Expense Summary",
+    "Expense Entry Template",
+)
+
+SECTION_FIELDNAME = "additional_dimensions_section"
+
+# Custom Field properties kept in step with the dimension; other properties
+# (position, list view, columns) are left as the user arranged them
+RECONCILED_PROPERTIES = ("label", "options", "reqd", "search_index")
+
+
+def get_desired_dimension_fields(dimensions):
+    """Custom fields the given dimensions need: {doctype: {fieldname: df}}"""
+
+    desired = {doctype: {} for doctype in DIMENSION_DOCTYPES}
+    entry_insert_after = get_insert_after_field("Expense Entry")
+    item_insert_after = get_insert_after_field("Expense Entry Item")
+    template_insert_after = get_insert_after_field("Expense Entry Template")
+
+    for dimension in dimensions:
+        if dimension.fieldname in CORE_DIMENSIONS:
+            continue
+
+        desired["Expense Entry"][f"default_{dimension.fieldname}"] = {
+            "fieldname": f"default_{dimension.fieldname}",
+            "label": f"Default {dimension.label}",
+            "fieldtype": "Link",
+            "options": dimension.document_type,
+            "insert_after": entry_insert_after,
+            "in_list_view": 0,
+            "in_standard_filter": 1,
+            "reqd": 0,
+            "search_index": 1,
+            "description": "Applies to all expenses below unless specified differently",
+        }
+        desired["Expense Entry Item"][dimension.fieldname] = {
+            "fieldname": dimension.fieldname,
+            "label": dimension.label,
+            "fieldtype": "Link",
+            "options": dimension.document_type,
+            "insert_after": item_insert_after,
+            "in_list_view": 1,
+            "reqd": 1 if dimension.mandatory_for_pl else 0,
+            "search_index": 1,
+            "columns": 2,
+        }
+        desired["Expense Summary"][dimension.fieldname] = {
+            "fieldname": dimension.fieldname,
+            "label": dimension.label,
+            "fieldtype": "Link",
+            "options": dimension.document_type,
+            "insert_after": "project",
+            "in_standard_filter": 1,
+            "reqd": 0,
+            "read_only": 1,
+            "search_index": 1,
+        }
+        # recurring entries take their defaults from the template
+        desired["Expense Entry Template"][f"default_{dimension.fieldname}"] = {
+            "fieldname": f"default_{dimension.fieldname}",
+            "label": f"Default {dimension.label}",
+            "fieldtype": "Link",
+            "options": dimension.document_type,
+            "insert_after": template_insert_after,
+            "reqd": 0,
+        }
+
+    if desired["Expense Entry"]:
+        desired["Expense Entry"][SECTION_FIELDNAME] = {
+            "fieldname": SECTION_FIELDNAME,
+            "label": "Additional Accounting Dimensions",
+            "fieldtype": "Section Break",
+            "insert_after": "accounting_col",
+            "collapsible": 1,
+        }
+
+    return desired
+
+
+def get_stale_fieldnames(existing, known_fieldnames):
+    """Dimension fields left behind by dimensions that no longer exist.
+
+    A field is recognised as a dimension field by the pair this module creates:
+    a Link ``x`` on Expense Entry Item with a ``default_x`` Link to the same
+    DocType on Expense Entry. Other custom fields are never touched.
+    """
+
+    stale = set()
+    for fieldname, field in existing["Expense Entry Item"].items():
+        default_field = existing["Expense Entry"].get(f"default_{fieldname}")
+        if (
+            fieldname not in known_fieldnames
+            and fieldname not in CORE_DIMENSIONS
+            and field.fieldtype == "Link"
+            and default_field
+            and default_field.fieldtype == "Link"
+            and default_field.options == field.options
+        ):
+            stale.add(fieldname)
+    return stale
+
+
+def diff_dimension_fields(dimensions, custom_fields, removed=None):
+    """Compare the fields the dimensions need with the existing Custom Fields.
+
+    ``dimensions`` are all Accounting Dimension rows, disabled ones included:
+    fields of disabled dimensions are kept but not created. Dimensions named in
+    ``removed`` are treated as deleted. Returns {"add": [(doctype, df)],
+    "update": [(doctype, df)], "remove": [custom_field]}, where an update df
+    holds only the Custom Field name and the reconciled properties.
+    """
+
+    removed = set(removed or ())
+    dimensions = [d for d in dimensions if d.name not in removed]
+    desired = get_desired_dimension_fields([d for d in dimensions if not d.disabled])
+
+    existing = {doctype: {} for doctype in DIMENSION_DOCTYPES}
+    for field in custom_fields:
+        existing[field.dt][field.fieldname] = field
+
+    changes = {"add": [], "update": [], "remove": []}
+
+    for doctype, fields in desired.items():
+        for fieldname, df in fields.items():
+            field = existing[doctype].get(fieldname)
+            if not field:
+                changes["add"].append((doctype, df))
+            elif any(
+                (field.get(prop) or None) != (df.get(prop) or None)
+                for prop in RECONCILED_PROPERTIES
+            ):
+                update = {prop: df.get(prop) for prop in RECONCILED_PROPERTIES}
+                changes["update"].append(
+                    (doctype, dict(update, name=field.name, fieldname=fieldname))
+                )
+
+    stale = get_stale_fieldnames(existing, {d.fieldname for d in dimensions})
+    stale_fields = {
+        "Expense Entry": {f"default_{fieldname}" for fieldname in stale},
+        "Expense Entry Item": stale,
+        "Expense Summary": stale,
+        "Expense Entry Template": {f"default_{fieldname}" for fieldname in stale},
+    }
+    if not desired["Expense Entry"]:
+        stale_fields["Expense Entry"].add(SECTION_FIELDNAME)
+
+    for doctype, fieldnames in stale_fields.items():
+        changes["remove"].extend(
+            existing[doctype][fieldname]
+            for fieldname in sorted(fieldnames)
+            if fieldname in existing[doctype]
         )
 
+    return changes
 
-def delete_dimension_fields(dimension_doc):
-    """Delete custom fields for a deleted accounting dimension (only custom fields, not DocType fields)"""
 
-    fieldname = dimension_doc.fieldname
-    default_fieldname = f"default_{fieldname}"
+def reconcile_dimension_fields(dry_run=False, removed=None):
+    """Bring the dimension custom fields in line with the Accounting Dimensions.
 
-    # Don't delete fields that are part of the core DocType
-    protected_fields = [
-        "default_project",
-        "default_cost_center",
-        "project",
-        "cost_center",
-    ]
+    Reads dimensions and existing Custom Fields in one query each, then applies
+    all additions through a single ``create_custom_fields`` call, updates of
+    the reconciled properties field by field and all removals through one
+    delete, so each DocType gets one cache clear and one schema update per
+    kind of change. With ``dry_run`` the changes are only returned.
+    """
 
-    try:
-        # Delete from Expense Entry (only if it's a custom field)
-        if default_fieldname not in protected_fields:
-            parent_field = frappe.db.exists(
-                "Custom Field", {"dt": "Expense Entry", "fieldname": default_fieldname}
-            )
-            if parent_field:
-                frappe.delete_doc("Custom Field", parent_field)
+    dimensions = frappe.get_all(
+        "Accounting Dimension", fields=[*DIMENSION_FIELDS, "disabled"]
+    )
+    custom_fields = frappe.get_all(
+        "Custom Field",
+        filters={"dt": ("in", DIMENSION_DOCTYPES)},
+        fields=["name", "dt", "fieldname", "fieldtype", *RECONCILED_PROPERTIES],
+    )
 
-        # Delete from Expense Entry Item (only if it's a custom field)
-        if fieldname not in protected_fields:
-            child_field = frappe.db.exists(
-                "Custom Field", {"dt": "Expense Entry Item", "fieldname": fieldname}
-            )
-            if child_field:
-                frappe.delete_doc("Custom Field", child_field)
+    changes = diff_dimension_fields(dimensions, custom_fields, removed=removed)
 
-        frappe.msgprint(
-            _("Accounting dimension fields removed for {0}").format(
-                dimension_doc.label
-            ),
-            alert=True,
-            indicator="orange",
+    if not dry_run:
+        apply_dimension_field_changes(changes)
+
+    return {
+        "add": [f"{doctype}.{df['fieldname']}" for doctype, df in changes["add"]],
+        "update": [f"{doctype}.{df['fieldname']}" for doctype, df in changes["update"]],
+        "remove": [f"{field.dt}.{field.fieldname}" for field in changes["remove"]],
+    }
+
+
+def apply_dimension_field_changes(changes):
+    additions = {}
+    for doctype, df in changes["add"]:
+        additions.setdefault(doctype, []).append(df)
+
+    if additions:
+        create_custom_fields(additions, update=True)
+
+    # only the reconciled properties, so a field the user moved or put in the
+    # list view stays where they left it
+    changed_doctypes = set()
+    for doctype, df in changes["update"]:
+        frappe.db.set_value(
+            "Custom Field", df["name"], {prop: df[prop] for prop in RECONCILED_PROPERTIES}
         )
+        changed_doctypes.add(doctype)
 
-    except Exception as e:
-        frappe.log_error(
-            f"Error deleting dimension fields for {dimension_doc.label}: {str(e)}"
+    if changes["remove"]:
+        frappe.db.delete(
+            "Custom Field", {"name": ("in", [field.name for field in changes["remove"]])}
         )
 
+        removed = {}
+        for field in changes["remove"]:
+            removed.setdefault(field.dt, []).append(field.fieldname)
+
+        for doctype, fieldnames in removed.items():
+            frappe.db.delete(
+                "Property Setter",
+                {"doc_type": doctype, "field_name": ("in", fieldnames)},
+            )
+            changed_doctypes.add(doctype)
+
+    # what CustomField.on_update and on_trash would do, once per DocType
+    # rather than once per field
+    for doctype in sorted(changed_doctypes):
+        frappe.clear_cache(doctype=doctype)
+        frappe.db.updatedb(doctype)
+
 
 def get_insert_after_field(doctype):
     """Get the field to insert after, based on your DocType structure"""
 
+    meta = frappe.get_meta(doctype)
+
     if doctype == "Expense Entry":
         # Try to insert in the accounting dimensions section
         preferred_fields = ["accounting_col", "default_cost_center", "default_project"]
-        for field in preferred_fields:
-            if frappe.db.exists("DocField", {"parent": doctype, "fieldname": field}):
-                return field
-
     elif doctype == "Expense Entry Item":
         # Try to insert after existing dimension fields
         preferred_fields = ["cost_center", "project", "amount"]
-        for field in preferred_fields:
-            if frappe.db.exists("DocField", {"parent": doctype, "fieldname": field}):
-                return field
+    elif doctype == "Expense Entry Template":
+        preferred_fields = ["default_project", "default_cost_center"]
+    else:
+        return None
+
+    for field in preferred_fields:
+        if meta.has_field(field):
+            return field
 
     return None
 
 
-def sync_all_accounting_dimensions():
+@instrument("sync_accounting_dimensions")
+def sync_all_accounting_dimensions(dry_run=False):
     """Sync all accounting dimensions - useful for initial setup or migration"""
 
-    accounting_dimensions = frappe.get_all(
-        "Accounting Dimension", filters={"disabled": 0}, fields=["name"]
-    )
+    changes = reconcile_dimension_fields(dry_run=dry_run)
 
-    count = 0
-    for dimension in accounting_dimensions:
-        dimension_doc = frappe.get_doc("Accounting Dimension", dimension.name)
-        create_dimension_fields(dimension_doc)
-        count += 1
+    if not dry_run:
+        frappe.db.commit()
 
-    frappe.db.commit()
-    return f"Synced {count} accounting dimensions"
+    return _("{0}: {1} fields to add, {2} to update, {3} to remove").format(
+        _("Dry run") if dry_run else _("Synced accounting dimensions"),
+        len(changes["add"]),
+        len(changes["update"]),
+        len(changes["remove"]),
+    )
 
 
 @frappe.whitelist()
-def rebuild_dimension_fields():
+def rebuild_dimension_fields(dry_run=False):
     """API endpoint to rebuild all dimension fields - for admins"""
 
     if not frappe.has_permission("Accounting Dimension", "write"):
         frappe.throw(_("Not permitted"))
 
-    result = sync_all_accounting_dimensions()
-    return {"message": result}
+    dry_run = frappe.utils.cint(dry_run)
+    changes = reconcile_dimension_fields(dry_run=dry_run)
+    if not dry_run:
+        frappe.db.commit()
+
+    return {"message": changes}
 
 
 def get_all_dimension_fieldnames():
@@ -186,11 +475,8 @@ def get_all_dimension_fieldnames():
 
     # Custom dimension fields
     custom_dimensions = {}
-    accounting_dimensions = frappe.get_all(
-        "Accounting Dimension", filters={"disabled": 0}, fields=["fieldname", "label"]
-    )
 
-    for dim in accounting_dimensions:
+    for dim in get_active_dimensions():
         if dim.fieldname not in core_dimensions:
             custom_dimensions[dim.fieldname] = dim.label
 
@@ -209,15 +495,4 @@ def get_dimension_info_for_client():
 
 def get_accounting_dimensions_for_client():
     """Get all active accounting dimensions for client-side JavaScript"""
-    return frappe.get_all(
-        "Accounting Dimension",
-        filters={"disabled": 0},
-        fields=[
-            "name",
-            "fieldname",
-            "label",
-            "document_type",
-            "mandatory_for_bs",
-            "mandatory_for_pl",
-        ],
-    )
+    return get_active_dimensions()
@@ -1,152 +1,192 @@
 import frappe
 from frappe import _, utils
 
+from expense_request import journal_builder
+from expense_request.accounting_dimensions_handler import get_active_dimensions
+from expense_request.instrumentation import entry_size, instrument, span
+from expense_request.journal_registry import claim_expense_entries, link_journal_entry
+from expense_request.lookups import (
+    get_exchange_rate,
+    get_mode_of_payment_account,
+    get_user_full_name,
+)
+from expense_request.validation import validate_account_currency
+
 
 def get_accounting_dimensions():
-    """Get all active accounting dimensions from the system"""
-    return frappe.get_all(
-        "Accounting Dimension",
-        filters={"disabled": 0},
-        fields=["name", "fieldname", "label", "document_type"],
-    )
+    """Get all active accounting dimensions from the cached dimension registry"""
+    with span("dimensions"):
+        return get_active_dimensions()
 
 
 
+@instrument("setup", size=entry_size)
 def setup(expense_entry, method):
-    """Enhanced setup function with dynamic accounting dimensions support"""
+    """Validate hook: totals and default accounting dimensions on expense items.
 
-    # Get all accounting dimensions
-    #
+    Only recomputed when the items or the default_* fields changed since the
+    last save, so workflow transitions and other edits skip the item scan.
+    """
 
     accounting_dimensions = get_accounting_dimensions()
+    if not has_item_changes(expense_entry, accounting_dimensions):
+        return
 
-    # Add expenses up and set the total field
-    # Add default accounting dimensions to expense items
+    set_exchange_rates(
+        expense_entry.expenses, expense_entry.company, expense_entry.posting_date
+    )
 
-    total = 0
-    count = 0
-    expense_items = []
+    # Add expenses up in company currency, set the total field and add
+    # default accounting dimensions to expense items
+    plan = journal_builder.build(
+        expense_entry, expense_entry.expenses, accounting_dimensions
+    )
 
-    for detail in expense_entry.expenses:
-        total += float(detail.amount)
-        count += 1
+    for index, values in plan.defaults.items():
+        expense_entry.expenses[index].update(values)
 
-        # Handle all accounting dimensions dynamically
-        for dimension in accounting_dimensions:
-            fieldname = dimension.fieldname
-            default_fieldname = f"default_{fieldname}"
+    for item, base_amount in zip(expense_entry.expenses, plan.base_amounts, strict=True):
+        item.base_amount = journal_builder.to_amount(base_amount)
 
-            # Set default dimension values if not already set
-            if not getattr(detail, fieldname, None) and getattr(
-                expense_entry, default_fieldname, None
-            ):
-                setattr(detail, fieldname, getattr(expense_entry, default_fieldname))
+    expense_entry.total = journal_builder.to_amount(plan.total)
+    expense_entry.quantity = plan.quantity
 
-        expense_items.append(detail)
 
-    expense_entry.expenses = expense_items
-    expense_entry.total = total
-    expense_entry.quantity = count
+def has_item_changes(expense_entry, accounting_dimensions):
+    """Whether items or default dimensions differ from the before-save snapshot"""
 
-    make_journal_entry(expense_entry)
+    before = expense_entry.get_doc_before_save()
+    if not before:
+        return True
 
+    dimension_fieldnames = journal_builder.resolve_dimensions(accounting_dimensions)
+    return journal_builder.get_tracked_values(
+        expense_entry, expense_entry.expenses, dimension_fieldnames
+    ) != journal_builder.get_tracked_values(
+        before, before.expenses, dimension_fieldnames
+    )
 
-@frappe.whitelist()
-def initialise_journal_entry(expense_entry_name):
-    # make JE from javascript form Make JE button
 
-    make_journal_entry(frappe.get_doc("Expense Entry", expense_entry_name))
+def set_exchange_rates(items, company, posting_date):
+    """Fill currency and exchange rate on items that have none.
 
+    Blank currencies are company currency. Each distinct currency is
+    resolved once per call, through the exchange rate cache, so a batch of
+    items sharing a company and posting date costs one lookup per currency.
+    Rates entered on an item are kept.
+    """
 
-def make_journal_entry(expense_entry):
+    company_currency = None
+    rates = {}
+    for item in items:
+        if item.get("currency") and utils.flt(item.get("exchange_rate")):
+            continue
 
-    if expense_entry.status == "Approved":
+        if not company_currency:
+            company_currency = frappe.get_cached_value("Company", company, "default_currency")
 
-        # Check for duplicates
-        if frappe.db.exists(
-            {"doctype": "Journal Entry", "bill_no": expense_entry.name}
-        ):
-            frappe.throw(
-                title="Error",
-                msg="Journal Entry {} already exists.".format(expense_entry.name),
+        currency = item.get("currency") or company_currency
+        if currency not in rates:
+            rates[currency] = (
+                1
+                if currency == company_currency
+                else get_exchange_rate(currency, company_currency, posting_date)
             )
+            if not rates[currency]:
+                frappe.throw(
+                    _("No exchange rate found from {0} to {1} for {2}").format(
+                        currency, company_currency, posting_date
+                    ),
+                    title=_("Missing Exchange Rate"),
+                )
 
-        # Get all accounting dimensions
-        accounting_dimensions = get_accounting_dimensions()
+        item.update({"currency": currency, "exchange_rate": rates[currency]})
 
-        # Preparing the JE: convert expense_entry details into je account details
-        accounts = []
 
-        for detail in expense_entry.expenses:
+@instrument("on_update", size=entry_size)
+def on_update(expense_entry, method):
+    """Queue the Journal Entry when the entry moves into Approved"""
+
+    if is_approval(expense_entry):
+        make_journal_entry(expense_entry)
 
-            account_detail = {
-                "debit_in_account_currency": float(detail.amount),
-                "user_remark": str(detail.description),
-                "account": detail.expense_account,
-            }
 
-            project_value = getattr(detail, "project", None)
-            if project_value:
-                account_detail["project"] = project_value
+def is_approval(expense_entry):
+    if expense_entry.status != "Approved":
+        return False
 
-            cost_center_value = getattr(detail, "cost_center", None)
-            if cost_center_value:
-                account_detail["cost_center"] = cost_center_value
+    before = expense_entry.get_doc_before_save()
+    return not before or before.status != "Approved"
 
-            # Add all accounting dimensions dynamically
-            for dimension in accounting_dimensions:
-                fieldname = dimension.fieldname
-                dimension_value = getattr(detail, fieldname, None)
-                if dimension_value:
-                    account_detail[fieldname] = dimension_value
 
-            accounts.append(account_detail)
+@frappe.whitelist()
+@instrument("initialise_journal_entry")
+def initialise_journal_entry(expense_entry_name):
+    # make JE from javascript form Make JE button, through the posting queue
+    from expense_request.posting import queue_journal_entry
 
-        # Finally add the payment account detail
-        pay_account = ""
+    expense_entry = frappe.get_doc("Expense Entry", expense_entry_name)
+    expense_entry.check_permission("write")
 
-        if expense_entry.mode_of_payment != "Cash" and (
-            not expense_entry.payment_reference or not expense_entry.clearance_date
-        ):
-            frappe.throw(
-                title="Enter Payment Reference",
-                msg="Payment Reference and Date are Required for all non-cash payments.",
-            )
-        else:
-            expense_entry.clearance_date = ""
-            expense_entry.payment_reference = ""
-
-        pay_account = frappe.db.get_value(
-            "Mode of Payment Account",
-            {"parent": expense_entry.mode_of_payment, "company": expense_entry.company},
-            "default_account",
+    if expense_entry.status != "Approved":
+        frappe.throw(
+            title="Error",
+            msg="Only approved Expense Entries can be posted.",
         )
 
-        if not pay_account or pay_account == "":
-            frappe.throw(
-                title="Error", msg="The selected Mode of Payment has no linked account."
-            )
+    queue_journal_entry(expense_entry, reset=True)
+
+
+@instrument("make_journal_entry", size=entry_size)
+def make_journal_entry(expense_entry):
+    """Record the intent to post an approved entry; the JE is built by a worker"""
+    from expense_request.posting import queue_journal_entry
 
-        # Credit account entry with default accounting dimensions
-        credit_account_detail = {
-            "credit_in_account_currency": float(expense_entry.total),
-            "user_remark": str(detail.description),
-            "account": pay_account,
-        }
+    if expense_entry.status == "Approved":
+
+        validate_payment_reference(expense_entry)
+        set_approved_by(expense_entry)
+
+        # Consolidated mode: the entry is posted later together with others
+        # sharing its company, posting date and mode of payment
+        if is_consolidation_enabled():
+            return
 
-        project_value = getattr(detail, "project", None)
-        if project_value:
-            credit_account_detail["project"] = project_value
+        queue_journal_entry(expense_entry)
 
-        # Add default accounting dimensions to credit entry
-        for dimension in accounting_dimensions:
-            fieldname = dimension.fieldname
-            default_fieldname = f"default_{fieldname}"
-            default_value = getattr(expense_entry, default_fieldname, None)
-            if default_value:
-                credit_account_detail[fieldname] = default_value
 
-        accounts.append(credit_account_detail)
+@instrument("create_journal_entry", size=entry_size)
+def create_journal_entry(expense_entry):
+    """Build, insert and submit the Journal Entry for an approved Expense Entry"""
+
+    if expense_entry.status == "Approved":
+
+        # Claim the entry in the posting registry; raises AlreadyPostedError
+        # if it has been posted, or is being posted by another worker
+        with span("duplicate_check"):
+            claim_expense_entries([expense_entry.name])
+
+        # Preparing the JE: convert expense_entry details into je account
+        # details and add the payment account detail. Defaults are applied
+        # here too since the worker reads the entry back from the db
+        validate_payment_reference(expense_entry)
+        with span("pay_account"):
+            pay_account = get_pay_account(
+                expense_entry.mode_of_payment, expense_entry.company
+            )
+
+        # Lines are posted in company currency; items saved before they had
+        # a currency get one here
+        set_exchange_rates(
+            expense_entry.expenses, expense_entry.company, expense_entry.posting_date
+        )
+
+        accounts = journal_builder.build(
+            expense_entry,
+            expense_entry.expenses,
+            get_accounting_dimensions(),
+            pay_account=pay_account,
+        ).accounts
 
         # Create the journal entry
         je = frappe.get_doc(
@@ -167,12 +207,61 @@ def make_journal_entry(expense_entry):
             }
         )
 
-        user = frappe.get_doc("User", frappe.session.user)
-        full_name = str(user.first_name) + " " + str(user.last_name)
-        expense_entry.db_set("approved_by", full_name)
+        # lets the budget counters move the entry from committed to actual
+        je.flags.expense_entries = [expense_entry.name]
+
+        with span("je_submit"):
+            je.insert()
+            je.submit()
+
+        link_journal_entry([expense_entry.name], je.name)
+
+        return je.name
+
+
+def validate_payment_reference(expense_entry):
+    """Non-cash payments need a reference and clearance date"""
+
+    if expense_entry.mode_of_payment != "Cash" and (
+        not expense_entry.payment_reference or not expense_entry.clearance_date
+    ):
+        frappe.throw(
+            title="Enter Payment Reference",
+            msg="Payment Reference and Date are Required for all non-cash payments.",
+        )
+    else:
+        expense_entry.clearance_date = ""
+        expense_entry.payment_reference = ""
+
 
-        je.insert()
-        je.submit()
+def get_pay_account(mode_of_payment, company):
+    """Get the default account linked to a Mode of Payment for a company"""
+
+    pay_account = get_mode_of_payment_account(mode_of_payment, company)
+
+    if not pay_account or pay_account == "":
+        frappe.throw(
+            title="Error", msg="The selected Mode of Payment has no linked account."
+        )
+
+    # the credit line is in company currency, like the debit lines
+    validate_account_currency(pay_account, company)
+
+    return pay_account
+
+
+def set_approved_by(expense_entry):
+    with span("approver"):
+        expense_entry.db_set("approved_by", get_user_full_name(frappe.session.user))
+
+
+def is_consolidation_enabled():
+    """Whether approved entries are posted as consolidated Journal Entries"""
+    return frappe.utils.cint(
+        frappe.db.get_single_value(
+            "Accounts Settings", "consolidate_expense_journal_entries"
+        )
+    )
 
 
 @frappe.whitelist()
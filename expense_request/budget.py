@@ -0,0 +1,427 @@
+# budget.py
+# Budget pre-check on approval, backed by running committed / actual counters
+
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, fmt_money, now_datetime
+
+from expense_request.api import get_accounting_dimensions
+from expense_request.journal_registry import REGISTRY_DOCTYPE
+
+COUNTER_DOCTYPE = "Expense Budget Counter"
+
+# Budget Against doctype -> line fieldname, before the dynamic dimensions
+CORE_BUDGET_AGAINST = [("Cost Center", "cost_center"), ("Project", "project")]
+
+
+def is_budget_check_enabled():
+    return cint(
+        frappe.db.get_single_value("Accounts Settings", "check_expense_budget")
+    )
+
+
+def get_budget_against_fields():
+    """[(Budget Against doctype, line fieldname)], including dynamic dimensions"""
+
+    fields = list(CORE_BUDGET_AGAINST)
+    for dimension in get_accounting_dimensions():
+        if dimension.fieldname not in dict(CORE_BUDGET_AGAINST).values():
+            fields.append((dimension.document_type, dimension.fieldname))
+    return fields
+
+
+def get_fiscal_year(posting_date, company):
+    from erpnext.accounts.utils import get_fiscal_year
+
+    return get_fiscal_year(posting_date, company=company)[0]
+
+
+def get_counter_name(company, fiscal_year, budget_against, value, account):
+    """Deterministic row name, so every writer of a key upserts the same row"""
+    parts = [company, fiscal_year, budget_against, value, account]
+    return hashlib.md5("\x1f".join(parts).encode()).hexdigest()
+
+
+def get_line_amounts(lines, account_field, amount_field):
+    """{(budget_against, value, account): amount} for expense or JE lines.
+
+    A line counts once for each of its budget dimensions that is set.
+    """
+
+    against_fields = get_budget_against_fields()
+    amounts = {}
+    for line in lines:
+        amount = flt(line.get(amount_field))
+        account = line.get(account_field)
+        if not amount or not account:
+            continue
+        for budget_against, fieldname in against_fields:
+            value = line.get(fieldname)
+            if value:
+                key = (budget_against, value, account)
+                amounts[key] = amounts.get(key, 0) + amount
+    return amounts
+
+
+# ---- approval gate ----
+
+
+def check_budget(expense_entry, method):
+    """Expense Entry before_submit (approval): compare the entry with the
+    Budgets that cover its lines. Budgets set to Stop block the approval,
+    Warn shows a message. Spend so far is read from the counters."""
+
+    if expense_entry.status != "Approved" or not is_budget_check_enabled():
+        return
+
+    amounts = get_line_amounts(expense_entry.expenses, "expense_account", "base_amount")
+    if not amounts:
+        return
+
+    fiscal_year = get_fiscal_year(expense_entry.posting_date, expense_entry.company)
+    budgets = get_budgets(expense_entry.company, fiscal_year, amounts)
+    if not budgets:
+        return
+
+    # create any missing counter and lock them all until commit, so that two
+    # approvals against the same budget are checked one after the other
+    upsert_counters(expense_entry.company, fiscal_year, dict.fromkeys(budgets, 0))
+    counters = get_counters(
+        (get_counter_name(expense_entry.company, fiscal_year, *key) for key in budgets),
+        for_update=True,
+    )
+
+    stop, warn = [], []
+    for key, budget in budgets.items():
+        counter = counters.get(get_counter_name(expense_entry.company, fiscal_year, *key))
+        spent = flt(counter.committed) + flt(counter.actual) if counter else 0
+        if spent + amounts[key] <= flt(budget.budget_amount):
+            continue
+
+        budget_against, value, account = key
+        message = _(
+            "{0} {1}, account {2}: budget {3}, already spent {4}, this entry {5}"
+        ).format(
+            _(budget_against),
+            frappe.bold(value),
+            frappe.bold(account),
+            fmt_money(budget.budget_amount),
+            fmt_money(spent),
+            fmt_money(amounts[key]),
+        )
+        (stop if budget.action == "Stop" else warn).append(message)
+
+    if stop:
+        frappe.throw(
+            "<br>".join(stop + warn),
+            title=_("Annual Budget Exceeded"),
+        )
+    if warn:
+        frappe.msgprint(
+            "<br>".join(warn),
+            title=_("Annual Budget Exceeded"),
+            indicator="orange",
+        )
+
+
+def get_budgets(company, fiscal_year, amounts):
+    """{(budget_against, value, account): budget row} for the given lines, in one query"""
+
+    accounts = list({account for (_against, _value, account) in amounts})
+    against_fields = dict(get_budget_against_fields())
+    value_columns = ", ".join(f"b.`{fieldname}`" for fieldname in against_fields.values())
+
+    rows = frappe.db.sql(
+        f"""
+        select b.budget_against, {value_columns},
+            b.action_if_annual_budget_exceeded as action,
+            ba.account, ba.budget_amount
+        from `tabBudget` b
+        inner join `tabBudget Account` ba
+            on ba.parent = b.name and ba.parenttype = 'Budget'
+        where b.docstatus = 1
+            and b.company = %(company)s
+            and b.fiscal_year = %(fiscal_year)s
+            and b.applicable_on_booking_actual_expenses = 1
+            and b.action_if_annual_budget_exceeded in ('Stop', 'Warn')
+            and ba.account in %(accounts)s
+        """,
+        {"company": company, "fiscal_year": fiscal_year, "accounts": accounts},
+        as_dict=True,
+    )
+
+    budgets = {}
+    for row in rows:
+        fieldname = against_fields.get(row.budget_against)
+        key = (row.budget_against, row.get(fieldname), row.account) if fieldname else None
+        if key in amounts:
+            budgets[key] = row
+    return budgets
+
+
+def get_counters(names, for_update=False):
+    return {
+        row.name: row
+        for row in frappe.get_all(
+            COUNTER_DOCTYPE,
+            filters={"name": ("in", list(names))},
+            fields=["name", "committed", "actual"],
+            for_update=for_update,
+        )
+    }
+
+
+# ---- counter maintenance ----
+
+
+def on_submit(expense_entry, method):
+    """Expense Entry on_submit (approval): the entry is committed spend"""
+    if expense_entry.status == "Approved" and is_budget_check_enabled():
+        apply_entry_delta(expense_entry, committed=1)
+
+
+def on_cancel(expense_entry, method):
+    """Expense Entry on_cancel: release committed spend not yet posted.
+
+    A posted entry's spend is released when its Journal Entry is cancelled.
+    """
+    if (
+        expense_entry.status == "Approved"
+        and not expense_entry.journal_entry
+        and is_budget_check_enabled()
+    ):
+        apply_entry_delta(expense_entry, committed=-1)
+
+
+def on_journal_entry_submit(journal_entry, method):
+    """Journal Entry on_submit: an expense JE turns committed spend into actual"""
+    if journal_entry.flags.expense_entries and is_budget_check_enabled():
+        apply_journal_entry_delta(journal_entry, committed=-1, actual=1)
+
+
+def on_journal_entry_cancel(journal_entry, method):
+    """Journal Entry on_cancel: its spend is no longer actual, and its
+    Expense Entries that are still approved are committed again.
+
+    An entry cancelled while its Journal Entry existed released nothing
+    (see on_cancel), so it is not committed again here.
+    """
+
+    if not is_budget_check_enabled():
+        return
+
+    entry_names = frappe.get_all(
+        REGISTRY_DOCTYPE, filters={"journal_entry": journal_entry.name}, pluck="name"
+    )
+    if not entry_names:
+        return
+
+    apply_journal_entry_delta(journal_entry, actual=-1)
+
+    live_entries = frappe.get_all(
+        "Expense Entry",
+        filters={"name": ["in", entry_names], "docstatus": 1},
+        pluck="name",
+    )
+    if not live_entries:
+        return
+
+    items = frappe.get_all(
+        "Expense Entry Item",
+        filters={"parenttype": "Expense Entry", "parent": ["in", live_entries]},
+        fields=[
+            "expense_account",
+            "base_amount",
+            *(fieldname for _against, fieldname in get_budget_against_fields()),
+        ],
+    )
+    amounts = get_line_amounts(items, "expense_account", "base_amount")
+    if amounts:
+        fiscal_year = get_fiscal_year(journal_entry.posting_date, journal_entry.company)
+        upsert_counters(journal_entry.company, fiscal_year, amounts, committed=1)
+
+
+def on_settings_update(settings, method):
+    """Accounts Settings on_update: counters are only kept while the check is
+    on, so switching it on resyncs them"""
+    before = settings.get_doc_before_save()
+    if cint(settings.get("check_expense_budget")) and not (
+        before and cint(before.get("check_expense_budget"))
+    ):
+        frappe.enqueue(
+            "expense_request.budget.rebuild_counters",
+            queue="long",
+            timeout=3600,
+            enqueue_after_commit=True,
+        )
+
+
+def apply_entry_delta(expense_entry, committed=0, actual=0):
+    amounts = get_line_amounts(expense_entry.expenses, "expense_account", "base_amount")
+    if amounts:
+        fiscal_year = get_fiscal_year(expense_entry.posting_date, expense_entry.company)
+        upsert_counters(expense_entry.company, fiscal_year, amounts, committed, actual)
+
+
+def apply_journal_entry_delta(journal_entry, committed=0, actual=0):
+    """Add an expense Journal Entry's debit lines to the counters with the
+    given signs"""
+
+    amounts = get_line_amounts(
+        journal_entry.accounts, "account", "debit_in_account_currency"
+    )
+    if amounts:
+        fiscal_year = get_fiscal_year(journal_entry.posting_date, journal_entry.company)
+        upsert_counters(journal_entry.company, fiscal_year, amounts, committed, actual)
+
+
+def upsert_counters(company, fiscal_year, amounts, committed=0, actual=0):
+    """Add signed amounts to the counters atomically, creating missing rows"""
+
+    timestamp = now_datetime()
+    user = frappe.session.user
+    columns = [
+        "name", "company", "fiscal_year", "budget_against", "budget_against_value",
+        "expense_account", "committed", "actual", "creation", "modified", "owner", "modified_by",
+    ]
+
+    rows = []
+    for (budget_against, value, account), amount in amounts.items():
+        rows.append(
+            (
+                get_counter_name(company, fiscal_year, budget_against, value, account),
+                company,
+                fiscal_year,
+                budget_against,
+                value,
+                account,
+                committed * flt(amount, 2),
+                actual * flt(amount, 2),
+                timestamp,
+                timestamp,
+                user,
+                user,
+            )
+        )
+
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(rows))
+    frappe.db.sql(
+        f"""
+        insert into `tab{COUNTER_DOCTYPE}` ({", ".join(f"`{c}`" for c in columns)})
+        values {placeholders}
+        on duplicate key update
+            committed = committed + values(committed),
+            actual = actual + values(actual),
+            modified = values(modified)
+        """,
+        [value for row in rows for value in row],
+    )
+
+
+# ---- rebuild ----
+
+
+@frappe.whitelist()
+def rebuild_budget_counters(company=None):
+    """Queue a resync of the counters from Expense Entries and the GL"""
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "expense_request.budget.rebuild_counters",
+        queue="long",
+        timeout=3600,
+        company=company,
+    )
+    return {"message": _("Budget counter rebuild has been queued")}
+
+
+def rebuild_counters_daily():
+    """Scheduler: resync the counters with the entries and their Journal Entries"""
+    if is_budget_check_enabled():
+        rebuild_counters()
+
+
+def rebuild_counters(company=None):
+    """Recompute all counters: committed from approved Expense Entries without
+    a Journal Entry, actual from the GL Entries of their Journal Entries on
+    expense accounts. Like the hooks, spend booked by other documents is left
+    to ERPNext's own budget check.
+
+    The totals are grouped in SQL and written with upsert_counters, the same
+    writer the submit and cancel hooks use.
+    """
+
+    frappe.db.delete(COUNTER_DOCTYPE, {"company": company} if company else {})
+
+    for budget_against, fieldname in get_budget_against_fields():
+        for column, rows in (
+            ("committed", get_committed_amounts(fieldname, company)),
+            ("actual", get_actual_amounts(fieldname, company)),
+        ):
+            amounts = {}
+            for row in rows:
+                amounts.setdefault((row.company, row.fiscal_year), {})[
+                    (budget_against, row.value, row.account)
+                ] = row.amount
+            for (row_company, fiscal_year), company_amounts in amounts.items():
+                upsert_counters(row_company, fiscal_year, company_amounts, **{column: 1})
+
+    frappe.db.commit()
+
+
+def get_committed_amounts(fieldname, company=None):
+    """Approved, unposted entries per (company, fiscal_year, value, account),
+    in the fiscal year of their posting date"""
+
+    return frappe.db.sql(
+        f"""
+        select entry.company as company, fy.name as fiscal_year,
+            item.`{fieldname}` as value, item.expense_account as account,
+            sum(item.base_amount) as amount
+        from `tabExpense Entry` entry
+        inner join `tabExpense Entry Item` item
+            on item.parent = entry.name and item.parenttype = 'Expense Entry'
+        inner join `tabFiscal Year` fy
+            on entry.posting_date between fy.year_start_date and fy.year_end_date
+            and fy.disabled = 0
+            and (
+                not exists (select 1 from `tabFiscal Year Company` fyc where fyc.parent = fy.name)
+                or exists (
+                    select 1 from `tabFiscal Year Company` fyc
+                    where fyc.parent = fy.name and fyc.company = entry.company
+                )
+            )
+        where entry.docstatus = 1 and entry.status = 'Approved'
+            and ifnull(entry.journal_entry, '') = ''
+            and ifnull(item.`{fieldname}`, '') != ''
+            {"and entry.company = %(company)s" if company else ""}
+        group by entry.company, fy.name, item.`{fieldname}`, item.expense_account
+        """,
+        {"company": company},
+        as_dict=True,
+    )
+
+
+def get_actual_amounts(fieldname, company=None):
+    """What this app's Journal Entries booked to expense accounts, per
+    (company, fiscal_year, value, account)"""
+
+    return frappe.db.sql(
+        f"""
+        select gle.company as company, gle.fiscal_year as fiscal_year,
+            gle.`{fieldname}` as value, gle.account as account,
+            sum(gle.debit - gle.credit) as amount
+        from `tabGL Entry` gle
+        inner join `tabAccount` account
+            on account.name = gle.account and account.root_type = 'Expense'
+        where gle.is_cancelled = 0
+            and gle.voucher_type = 'Journal Entry'
+            and gle.voucher_no in (select journal_entry from `tab{REGISTRY_DOCTYPE}`)
+            and ifnull(gle.`{fieldname}`, '') != ''
+            {"and gle.company = %(company)s" if company else ""}
+        group by gle.company, gle.fiscal_year, gle.`{fieldname}`, gle.account
+        """,
+        {"company": company},
+        as_dict=True,
+    )
@@ -0,0 +1,156 @@
+# bulk_approval.py
+# Approve Expense Entries in bulk and post their Journal Entries in the background
+
+import frappe
+from frappe import _
+from frappe.model.workflow import apply_workflow
+
+BULK_APPROVAL_CHUNK_SIZE = 25
+BULK_APPROVAL_CACHE_KEY = "expense_request:bulk_approval:{0}"
+BULK_APPROVAL_RESULT_TTL = 24 * 60 * 60
+
+
+@frappe.whitelist()
+def bulk_approve(names=None, filters=None, chunk_size=BULK_APPROVAL_CHUNK_SIZE):
+    """Queue approval and journal posting for a list or filter of Expense Entries.
+
+    Returns a batch id straight away; progress is published over realtime and
+    the per-entry results can be read back with get_bulk_approval_status.
+    """
+
+    entry_names = get_entries_to_approve(names, filters)
+    if not entry_names:
+        frappe.throw(_("No pending Expense Entries match the selection."))
+
+    batch_id = frappe.generate_hash(length=12)
+    frappe.cache().set_value(
+        BULK_APPROVAL_CACHE_KEY.format(batch_id),
+        {
+            "status": "Queued",
+            "owner": frappe.session.user,
+            "total": len(entry_names),
+            "processed": 0,
+            "results": [],
+        },
+        expires_in_sec=BULK_APPROVAL_RESULT_TTL,
+    )
+
+    frappe.enqueue(
+        "expense_request.bulk_approval.process_bulk_approval",
+        queue="long",
+        timeout=max(1500, len(entry_names) * 10),
+        batch_id=batch_id,
+        names=entry_names,
+        chunk_size=frappe.utils.cint(chunk_size) or BULK_APPROVAL_CHUNK_SIZE,
+    )
+
+    return {"batch_id": batch_id, "total": len(entry_names)}
+
+
+@frappe.whitelist()
+def get_bulk_approval_status(batch_id):
+    """Get progress and per-entry results of a bulk approval batch; only the
+    user who started it may read them"""
+
+    status = frappe.cache().get_value(BULK_APPROVAL_CACHE_KEY.format(batch_id))
+    if status and status.get("owner") != frappe.session.user:
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+    return status
+
+
+def get_entries_to_approve(names=None, filters=None):
+    """Resolve the requested Expense Entries, honouring the user's permissions.
+
+    Only Pending drafts are returned, however they were selected, so entries
+    that are already approved or rejected never reach apply_workflow.
+    """
+
+    if names:
+        names = frappe.parse_json(names)
+        if isinstance(names, str):
+            names = [names]
+        filters = {"name": ["in", names]}
+    else:
+        filters = frappe.parse_json(filters) or {}
+
+    return frappe.get_list(
+        "Expense Entry",
+        filters=[*get_filter_list(filters), ["docstatus", "=", 0], ["status", "=", "Pending"]],
+        fields=["name"],
+        order_by="posting_date asc, name asc",
+        pluck="name",
+    )
+
+
+def get_filter_list(filters):
+    """Filters in list form, so more conditions can be added on a field the
+    caller already filters on"""
+
+    if not isinstance(filters, dict):
+        return list(filters)
+
+    return [
+        [fieldname, *value] if isinstance(value, list | tuple) else [fieldname, "=", value]
+        for fieldname, value in filters.items()
+    ]
+
+
+def process_bulk_approval(batch_id, names, chunk_size=BULK_APPROVAL_CHUNK_SIZE):
+    """Background job: approve entries chunk by chunk, committing after each chunk.
+
+    Every entry runs inside its own savepoint so a failing entry is rolled back
+    and reported without undoing the rest of its chunk.
+    """
+
+    cache_key = BULK_APPROVAL_CACHE_KEY.format(batch_id)
+    total = len(names)
+    results = []
+
+    for start in range(0, total, chunk_size):
+        for name in names[start : start + chunk_size]:
+            results.append(approve_entry(name))
+
+        frappe.db.commit()
+
+        processed = min(start + chunk_size, total)
+        frappe.cache().set_value(
+            cache_key,
+            {
+                "status": "Running" if processed < total else "Completed",
+                # jobs run as the user who queued them
+                "owner": frappe.session.user,
+                "total": total,
+                "processed": processed,
+                "results": results,
+            },
+            expires_in_sec=BULK_APPROVAL_RESULT_TTL,
+        )
+        frappe.publish_progress(
+            processed * 100 / total,
+            title=_("Approving Expense Entries"),
+            description=_("{0} of {1} processed").format(processed, total),
+        )
+
+    failed = [result for result in results if result["status"] == "Failed"]
+    frappe.publish_realtime(
+        "expense_bulk_approval_complete",
+        {"batch_id": batch_id, "total": total, "failed": len(failed)},
+        user=frappe.session.user,
+    )
+
+    return results
+
+
+def approve_entry(name):
+    """Approve a single entry inside a savepoint and report the outcome"""
+
+    frappe.db.savepoint("expense_bulk_approval")
+    try:
+        expense_entry = frappe.get_doc("Expense Entry", name)
+        apply_workflow(expense_entry, "Approve")
+    except Exception as e:
+        frappe.db.rollback(save_point="expense_bulk_approval")
+        frappe.clear_messages()
+        return {"name": name, "status": "Failed", "error": str(e)}
+
+    return {"name": name, "status": "Approved"}
@@ -0,0 +1,41 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-expense-summary")
+@click.option("--company", help="Only rebuild rows for this company")
+@pass_context
+def rebuild_expense_summary(context, company=None):
+    """Rebuild the Expense Summary table from approved Expense Entries"""
+    from expense_request.summary import rebuild_summary
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        rebuild_summary(company=company)
+    finally:
+        frappe.destroy()
+
+
+@click.command("sync-expense-dimensions")
+@click.option("--dry-run", is_flag=True, help="Only list the custom field changes")
+@pass_context
+def sync_expense_dimensions(context, dry_run=False):
+    """Reconcile accounting dimension custom fields on the Expense doctypes"""
+    from expense_request.accounting_dimensions_handler import reconcile_dimension_fields
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        changes = reconcile_dimension_fields(dry_run=dry_run)
+        if not dry_run:
+            frappe.db.commit()
+        for action in ("add", "update", "remove"):
+            for field in changes[action]:
+                click.echo(f"{action:<7} {field}")
+    finally:
+        frappe.destroy()
+
+
+commands = [rebuild_expense_summary, sync_expense_dimensions]
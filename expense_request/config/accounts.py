@@ -14,6 +14,12 @@ def get_data():
 					"name": "Expense Entry",
 					"description": _("Capture Expenses"),
             		"link": "List/Expense Entry/Link"
+				},
+				{
+					"type": "doctype",
+					"name": "Expense Entry Template",
+					"description": _("Recurring Expenses"),
+					"link": "List/Expense Entry Template"
 				}
 			]
 		},
@@ -25,8 +31,22 @@ def get_data():
 					"is_query_report": True,
 					"name": "Expenses Register",
 					"doctype": "Expense Entry",
-            		"link": "List/Expense Entry/Report/Expenses Register"
+            		"link": "query-report/Expenses Register"
 					
+				},
+				{
+					"type": "report",
+					"is_query_report": True,
+					"name": "Expense Hook Metrics",
+					"doctype": "Expense Entry",
+					"link": "query-report/Expense Hook Metrics"
+				},
+				{
+					"type": "report",
+					"is_query_report": True,
+					"name": "Expense Journal Reconciliation",
+					"doctype": "Expense Entry",
+					"link": "query-report/Expense Journal Reconciliation"
 				}
 			]
 		}
@@ -0,0 +1,274 @@
+# consolidation.py
+# Post approved Expense Entries as consolidated Journal Entries
+
+from collections import OrderedDict
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, flt, getdate, today
+
+from expense_request import journal_builder
+from expense_request.api import (
+    get_accounting_dimensions,
+    get_pay_account,
+    is_consolidation_enabled,
+    set_exchange_rates,
+)
+from expense_request.journal_registry import claim_expense_entries, link_journal_entry
+from expense_request.posting import mark_failed
+
+CORE_DIMENSION_FIELDS = ["cost_center", "project"]
+
+
+@frappe.whitelist()
+def post_consolidated_journal_entries(company=None, posting_date=None):
+    """Queue consolidation of approved, unposted Expense Entries"""
+
+    frappe.has_permission("Journal Entry", "create", throw=True)
+
+    frappe.enqueue(
+        "expense_request.consolidation.consolidate_expense_entries",
+        queue="long",
+        timeout=3600,
+        company=company,
+        to_date=posting_date or today(),
+    )
+    return {"message": _("Consolidation of Expense Entries has been queued")}
+
+
+def consolidate_daily():
+    """Scheduler: consolidate everything approved up to and including yesterday"""
+    if is_consolidation_enabled():
+        consolidate_expense_entries(to_date=add_days(today(), -1))
+
+
+def consolidate_expense_entries(company=None, to_date=None):
+    """Group unposted entries by (company, posting_date, mode_of_payment) and
+    post one Journal Entry per group, committing after each group.
+
+    Entries that can't be posted are marked Failed instead of holding back
+    the rest of their group; the posting queue's retry job then posts them
+    one by one, so a bad entry only ever blocks itself.
+    """
+
+    accounting_dimensions = get_accounting_dimensions()
+    groups = get_unposted_entry_groups(accounting_dimensions, company, to_date)
+
+    posted = []
+    for (group_company, posting_date, mode_of_payment), entries in groups.items():
+        try:
+            je_name = make_consolidated_journal_entry(
+                group_company, posting_date, mode_of_payment, entries, accounting_dimensions
+            )
+            frappe.db.commit()
+            if je_name:
+                posted.append(je_name)
+        except Exception as e:
+            # The Journal Entry itself failed, so no single entry is to blame
+            frappe.db.rollback()
+            for entry in entries:
+                mark_failed(entry.name, e)
+            frappe.db.commit()
+
+    return posted
+
+
+def get_unposted_entry_groups(accounting_dimensions, company=None, to_date=None):
+    """Load approved entries without a Journal Entry in a single query"""
+
+    filters = {
+        "docstatus": 1,
+        "status": "Approved",
+        "journal_entry": ["is", "not set"],
+        # Queued, Posting and Failed entries belong to the posting queue, and
+        # a cancelled JE is not re-posted without a person
+        "posting_status": ["is", "not set"],
+    }
+    if company:
+        filters["company"] = company
+    if to_date:
+        filters["posting_date"] = ["<=", getdate(to_date)]
+
+    fields = [
+        "name",
+        "company",
+        "posting_date",
+        "mode_of_payment",
+        "payment_to",
+        "payment_reference",
+        "clearance_date",
+        "default_project",
+    ]
+    fields += [
+        f"default_{fieldname}" for fieldname in get_dimension_fieldnames(accounting_dimensions)
+        if fieldname not in CORE_DIMENSION_FIELDS
+    ]
+
+    groups = OrderedDict()
+    for entry in frappe.get_all(
+        "Expense Entry",
+        filters=filters,
+        fields=fields,
+        order_by="company asc, posting_date asc, mode_of_payment asc, name asc",
+    ):
+        key = (entry.company, entry.posting_date, entry.mode_of_payment)
+        groups.setdefault(key, []).append(entry)
+
+    return groups
+
+
+def get_dimension_fieldnames(accounting_dimensions):
+    """Core dimension fieldnames followed by every dynamic dimension fieldname"""
+
+    fieldnames = list(CORE_DIMENSION_FIELDS)
+    for dimension in accounting_dimensions:
+        if dimension.fieldname not in fieldnames:
+            fieldnames.append(dimension.fieldname)
+    return fieldnames
+
+
+def make_consolidated_journal_entry(
+    company, posting_date, mode_of_payment, entries, accounting_dimensions
+):
+    """Post one Journal Entry for a group of Expense Entries.
+
+    Entries whose items can't be converted to company currency are marked
+    Failed and left out. Returns None when no entry is left to post.
+    """
+
+    dimension_fieldnames = get_dimension_fieldnames(accounting_dimensions)
+
+    items_by_entry = {}
+    for item in frappe.get_all(
+        "Expense Entry Item",
+        filters={
+            "parenttype": "Expense Entry",
+            "parent": ["in", [entry.name for entry in entries]],
+        },
+        fields=[
+            "parent", "expense_account", "amount", "currency", "exchange_rate",
+            *dimension_fieldnames,
+        ],
+    ):
+        items_by_entry.setdefault(item.parent, []).append(item)
+
+    # The group shares a company and posting date, so rates come from the
+    # exchange rate cache after the first entry in each currency
+    postable = []
+    for entry in entries:
+        try:
+            set_exchange_rates(items_by_entry.get(entry.name, []), company, posting_date)
+        except Exception as e:
+            mark_failed(entry.name, e)
+        else:
+            postable.append(entry)
+
+    if not postable:
+        return None
+
+    entries = postable
+    entry_names = [entry.name for entry in entries]
+    items = [item for entry in entries for item in items_by_entry.get(entry.name, [])]
+    for item in items:
+        item.base_amount = journal_builder.to_amount(journal_builder.get_base_amount(item))
+
+    # Totals are taken from the items so the JE always balances
+    entry_totals = {}
+    for item in items:
+        entry_totals[item.parent] = entry_totals.get(item.parent, 0) + item.base_amount
+
+    accounts = get_consolidated_debit_lines(items, dimension_fieldnames)
+    accounts += get_consolidated_credit_lines(
+        entries,
+        entry_totals,
+        get_pay_account(mode_of_payment, company),
+        dimension_fieldnames,
+    )
+
+    claim_expense_entries(entry_names)
+
+    payment_references = {entry.payment_reference for entry in entries}
+    clearance_dates = {entry.clearance_date for entry in entries}
+    single_reference = len(payment_references) == 1 and len(clearance_dates) == 1
+
+    je = frappe.get_doc(
+        {
+            "title": _("Consolidated Expenses {0}").format(posting_date),
+            "doctype": "Journal Entry",
+            "voucher_type": "Journal Entry",
+            "posting_date": posting_date,
+            "company": company,
+            "accounts": accounts,
+            "user_remark": _("Consolidated Expense Entries: {0}").format(
+                ", ".join(entry_names)
+            ),
+            "mode_of_payment": mode_of_payment,
+            "cheque_no": entries[0].payment_reference if single_reference else None,
+            "cheque_date": entries[0].clearance_date if single_reference else None,
+            "expense_entries": [
+                {"expense_entry": entry.name, "amount": entry_totals.get(entry.name, 0)}
+                for entry in entries
+            ],
+        }
+    )
+    je.flags.expense_entries = entry_names
+    je.insert()
+    je.submit()
+
+    link_journal_entry(entry_names, je.name)
+    frappe.db.set_value(
+        "Expense Entry",
+        {"name": ["in", entry_names]},
+        {"journal_entry": je.name, "posting_status": "Posted"},
+        update_modified=False,
+    )
+
+    return je.name
+
+
+def get_consolidated_debit_lines(items, dimension_fieldnames):
+    """Sum company currency item amounts per (expense_account, cost_center,
+    project, dimensions...)"""
+
+    lines = OrderedDict()
+    for item in items:
+        key = (item.expense_account, *(item.get(f) or None for f in dimension_fieldnames))
+        if key not in lines:
+            line = {"account": item.expense_account, "debit_in_account_currency": 0}
+            for fieldname in dimension_fieldnames:
+                if item.get(fieldname):
+                    line[fieldname] = item.get(fieldname)
+            lines[key] = line
+
+        lines[key]["debit_in_account_currency"] += item.base_amount
+
+    for line in lines.values():
+        line["debit_in_account_currency"] = flt(line["debit_in_account_currency"], 2)
+
+    return list(lines.values())
+
+
+def get_consolidated_credit_lines(entries, entry_totals, pay_account, dimension_fieldnames):
+    """Sum entry totals against the pay account per default dimension tuple"""
+
+    lines = OrderedDict()
+    for entry in entries:
+        defaults = {
+            fieldname: entry.get(f"default_{fieldname}")
+            for fieldname in dimension_fieldnames
+            if fieldname != "cost_center" and entry.get(f"default_{fieldname}")
+        }
+        key = tuple(sorted(defaults.items()))
+        if key not in lines:
+            lines[key] = {
+                "account": pay_account,
+                "credit_in_account_currency": 0,
+                **defaults,
+            }
+
+        lines[key]["credit_in_account_currency"] += entry_totals.get(entry.name, 0)
+
+    for line in lines.values():
+        line["credit_in_account_currency"] = flt(line["credit_in_account_currency"], 2)
+
+    return list(lines.values())
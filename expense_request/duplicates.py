@@ -0,0 +1,187 @@
+# duplicates.py
+# Fingerprints of expense items, for detecting the same receipt claimed twice
+
+import hashlib
+import re
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, flt, get_url_to_form, getdate, strip_html
+
+BACKFILL_BATCH_SIZE = 2000
+DEFAULT_WINDOW_DAYS = 30
+
+NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalise(text):
+    """Lowercase words only: punctuation, markup and spacing don't matter"""
+    return NON_WORD.sub(" ", strip_html(text or "")).strip().lower()
+
+
+def get_fingerprint(payment_to, amount, currency, expense_account, description):
+    """Hash of payee, amount and its currency, account and description.
+
+    The posting date is deliberately left out; it is compared as a window in
+    find_duplicates so claims a few days apart still match.
+    """
+    parts = [
+        normalise(payment_to),
+        f"{flt(amount, 2):.2f}",
+        currency or "",
+        expense_account or "",
+        normalise(description),
+    ]
+    return hashlib.md5("\x1f".join(parts).encode()).hexdigest()
+
+
+def set_fingerprints(expense_entry):
+    for item in expense_entry.expenses:
+        item.fingerprint = get_fingerprint(
+            expense_entry.payment_to,
+            item.amount,
+            item.currency,
+            item.expense_account,
+            item.description,
+        )
+
+
+def get_settings():
+    action = frappe.db.get_single_value("Accounts Settings", "duplicate_expense_action")
+    window = cint(
+        frappe.db.get_single_value("Accounts Settings", "duplicate_expense_window")
+    )
+    return action, window or DEFAULT_WINDOW_DAYS
+
+
+def validate_duplicates(expense_entry, method):
+    """Validate hook: fingerprint the items and warn or block when another
+    entry has a matching item within the configured number of days"""
+
+    set_fingerprints(expense_entry)
+
+    action, window = get_settings()
+    if not action or expense_entry.docstatus == 2 or not has_changes(expense_entry):
+        return
+
+    duplicates = find_duplicates(expense_entry, window)
+    if not duplicates:
+        return
+
+    message = _("These expenses match items already claimed:") + "<ul>{0}</ul>".format(
+        "".join(
+            "<li>{0}</li>".format(
+                _("Row {0} matches row {1} of <a href='{2}'>{3}</a> ({4})").format(
+                    row.idx, row.match_idx, get_url_to_form("Expense Entry", row.parent), row.parent, row.posting_date
+                )
+            )
+            for row in duplicates
+        )
+    )
+
+    if action == "Block":
+        frappe.throw(message, title=_("Duplicate Expense"))
+    frappe.msgprint(message, title=_("Possible Duplicate Expense"), indicator="orange")
+
+
+def has_changes(expense_entry):
+    """Whether fingerprints or the posting date changed since the last save"""
+
+    before = expense_entry.get_doc_before_save()
+    if not before:
+        return True
+    return expense_entry.posting_date != before.posting_date or [
+        item.fingerprint for item in expense_entry.expenses
+    ] != [item.get("fingerprint") for item in before.expenses]
+
+
+def find_duplicates(expense_entry, window):
+    """Items of other live entries sharing a fingerprint, within `window` days"""
+
+    fingerprints = {item.fingerprint: item.idx for item in expense_entry.expenses}
+    if not fingerprints:
+        return []
+
+    posting_date = getdate(expense_entry.posting_date)
+    rows = frappe.db.sql(
+        """
+        select item.fingerprint, item.parent, item.idx as match_idx, entry.posting_date
+        from `tabExpense Entry Item` item
+        inner join `tabExpense Entry` entry on entry.name = item.parent
+        where item.fingerprint in %(fingerprints)s
+            and item.parenttype = 'Expense Entry'
+            and item.parent != %(name)s
+            and entry.docstatus < 2
+            and entry.status != 'Rejected'
+            and entry.posting_date between %(from_date)s and %(to_date)s
+        order by entry.posting_date, item.parent, item.idx
+        limit 50
+        """,
+        {
+            "fingerprints": list(fingerprints),
+            "name": expense_entry.name or "",
+            "from_date": add_days(posting_date, -window),
+            "to_date": add_days(posting_date, window),
+        },
+        as_dict=True,
+    )
+
+    for row in rows:
+        row.idx = fingerprints[row.fingerprint]
+    return sorted(rows, key=lambda row: row.idx)
+
+
+# ---- backfill ----
+
+
+@frappe.whitelist()
+def backfill_fingerprints():
+    """Queue fingerprinting of items saved before fingerprints existed"""
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "expense_request.duplicates.run_backfill",
+        queue="long",
+        timeout=4 * 60 * 60,
+        job_id="expense_request::backfill_fingerprints",
+        deduplicate=True,
+    )
+    return {"message": _("Expense fingerprint backfill has been queued")}
+
+
+def run_backfill(batch_size=BACKFILL_BATCH_SIZE):
+    """Fingerprint items without one, a batch per transaction"""
+
+    while True:
+        items = frappe.db.sql(
+            """
+            select item.name, item.amount, item.currency, item.expense_account,
+                item.description, entry.payment_to
+            from `tabExpense Entry Item` item
+            inner join `tabExpense Entry` entry on entry.name = item.parent
+            where item.parenttype = 'Expense Entry'
+                and ifnull(item.fingerprint, '') = ''
+            limit %(batch_size)s
+            """,
+            {"batch_size": batch_size},
+            as_dict=True,
+        )
+        if not items:
+            break
+
+        frappe.db.bulk_update(
+            "Expense Entry Item",
+            {
+                item.name: {
+                    "fingerprint": get_fingerprint(
+                        item.payment_to,
+                        item.amount,
+                        item.currency,
+                        item.expense_account,
+                        item.description,
+                    )
+                }
+                for item in items
+            },
+            update_modified=False,
+        )
+        frappe.db.commit()
@@ -8,70 +8,180 @@ const default_dimensions = [{fieldname: "cost_center", document_type: "Cost Cent
 let accounting_dimensions = [];
 
 // ---- totals ----
-function update_totals(frm) {
-    let total = 0;
-    let quantity = 0;
-
-    if (Array.isArray(frm.doc.expenses)) {
-        frm.doc.expenses.forEach(function(row) {
-            total += Number(row.amount || 0);
-            quantity += 1;
+// Entries above this many rows skip per-row model events: row values are
+// written in one pass and the grid is refreshed once
+const LARGE_ENTRY_ROWS = 200;
+
+function is_large_entry(frm) {
+    return (frm.doc.expenses || []).length > LARGE_ENTRY_ROWS;
+}
+
+// row amount in company currency; rows without a rate are in company currency
+function get_row_base_amount(row) {
+    return flt(flt(row.amount) * (flt(row.exchange_rate) || 1), precision("base_amount", row));
+}
+
+// full scan of the rows; primes the running total kept for incremental updates
+function prime_row_amounts(frm) {
+    frm._row_amounts = {};
+    frm._row_total = 0;
+
+    (frm.doc.expenses || []).forEach(function(row) {
+        let amount = get_row_base_amount(row);
+        frm._row_amounts[row.name] = amount;
+        frm._row_total += amount;
+    });
+}
+
+// apply the change of one row's company currency amount; null for a removed row
+function update_totals_for_row(frm, cdn, amount) {
+    if (!frm._row_amounts) prime_row_amounts(frm);
+
+    let previous = frm._row_amounts[cdn] || 0;
+    if (amount === null) {
+        delete frm._row_amounts[cdn];
+        amount = 0;
+    } else {
+        frm._row_amounts[cdn] = amount;
+    }
+
+    frm._row_total += amount - previous;
+    set_totals(frm, frm._row_total, (frm.doc.expenses || []).length);
+}
+
+function update_row_base_amount(frm, cdt, cdn) {
+    let row = locals[cdt][cdn];
+    let base_amount = get_row_base_amount(row);
+    if (flt(row.base_amount) !== base_amount) {
+        frappe.model.set_value(cdt, cdn, "base_amount", base_amount);
+    }
+    update_totals_for_row(frm, cdn, base_amount);
+}
+
+// rate for one unit of the row currency in company currency, on the posting date
+function set_row_exchange_rate(frm, cdt, cdn) {
+    let row = locals[cdt][cdn];
+    let company_currency = erpnext.get_currency(frm.doc.company);
+
+    if (!row.currency || row.currency === company_currency) {
+        frappe.model.set_value(cdt, cdn, "exchange_rate", 1);
+        return;
+    }
+
+    frappe.call({
+        method: "erpnext.setup.utils.get_exchange_rate",
+        args: {
+            from_currency: row.currency,
+            to_currency: company_currency,
+            transaction_date: frm.doc.posting_date
+        },
+        callback: function(r) {
+            frappe.model.set_value(cdt, cdn, "exchange_rate", flt(r.message));
+        }
+    });
+}
+
+function set_totals(frm, total, quantity) {
+    total = flt(total, precision("total"));
+    if (flt(frm.doc.total) === total && cint(frm.doc.quantity) === quantity) return;
+    frm.set_value({ total: total, quantity: quantity });
+}
+
+// ---- batched row updates ----
+// updates: [[row, fieldname, value], ...]
+function set_row_values(frm, updates) {
+    if (!updates.length) return;
+
+    if (!is_large_entry(frm)) {
+        updates.forEach(function([row, fieldname, value]) {
+            frappe.model.set_value(row.doctype, row.name, fieldname, value);
         });
+        return;
     }
 
-    frm.set_value("total", total);
-    frm.set_value("quantity", quantity);
-    frm.refresh_field("total");
-    frm.refresh_field("quantity");
+    updates.forEach(function([row, fieldname, value]) {
+        row[fieldname] = value;
+    });
+    frm.dirty();
+    frm.refresh_field("expenses");
 }
 
-// ---- load dimensions from server (robust) ----
-function load_accounting_dimensions(frm) {
+// ---- dimension metadata: form onload payload, cached in localStorage ----
+const DIMENSION_STORAGE_KEY = "expense_request:accounting_dimensions";
+let dimension_payload = null;
 
-	// avoid duplicate parallel loads
-    if (frm._loading_accounting_dimensions) return;
-    frm._loading_accounting_dimensions = true;
+function load_accounting_dimensions(frm) {
+    // saved entries carry the payload in __onload; new ones use the stored
+    // copy while it matches the version in boot info
+    let payload = frm.doc.__onload && frm.doc.__onload.accounting_dimensions;
+    if (payload) {
+        store_dimension_payload(payload);
+        frappe.boot.expense_request_dimensions_version = payload.version;
+    } else {
+        payload = get_stored_dimension_payload();
+    }
 
-    // if no company set yet, clear and return
-    if (!frm.doc.company) {
-		accounting_dimensions = [];
-        setup_dimension_queries(frm);
-        frm._loading_accounting_dimensions = false;
+    if (payload && payload.version === frappe.boot.expense_request_dimensions_version) {
+        apply_dimension_payload(frm, payload);
         return;
     }
 
+    // fall back to a background request; the form stays usable meanwhile
+    if (payload) apply_dimension_payload(frm, payload);
+    if (frm._loading_accounting_dimensions) return;
+    frm._loading_accounting_dimensions = true;
 
     frappe.call({
-        method: "expense_request.api.get_accounting_dimensions_for_client",
-        args: { company: frm.doc.company },           // pass company explicitly
-        freeze: true,
-        freeze_message: __("Loading accounting dimensions..."),
+        method: "expense_request.accounting_dimensions_handler.get_dimension_payload_for_client",
+        args: { version: payload ? payload.version : null },
         callback: function(r) {
             frm._loading_accounting_dimensions = false;
-            if (r && !r.exc && r.message) {
-				accounting_dimensions = [...default_dimensions, ...r.message] || default_dimensions;
-                setup_dimension_queries(frm);
-            } else {
-                accounting_dimensions = default_dimensions;
-                console.error("Could not load accounting dimensions", r && r.exc ? r.exc : r);
-                frappe.msgprint({
-                    title: __("Error"),
-                    message: __("Could not load accounting dimensions. Check server logs or ensure the API is whitelisted."),
-                    indicator: "red"
-                });
-                setup_dimension_queries(frm); // keep queries consistent (will be empty)
+            if (r && !r.exc && r.message && r.message.dimensions) {
+                store_dimension_payload(r.message);
+                apply_dimension_payload(frm, r.message);
+            } else if (r && !r.exc && r.message) {
+                frappe.boot.expense_request_dimensions_version = r.message.version;
             }
         }
     }).catch(function(err) {
         frm._loading_accounting_dimensions = false;
-        accounting_dimensions = default_dimensions;
         console.error("Error fetching accounting dimensions:", err);
-        frappe.msgprint({
-            title: __("Error"),
-            message: __("Error fetching accounting dimensions. See console for details."),
-            indicator: "red"
-        });
-        setup_dimension_queries(frm);
+    });
+}
+
+function apply_dimension_payload(frm, payload) {
+    dimension_payload = payload;
+    accounting_dimensions = [...default_dimensions, ...(payload.dimensions || [])];
+    setup_dimension_queries(frm);
+}
+
+function get_stored_dimension_payload() {
+    try {
+        return JSON.parse(localStorage.getItem(DIMENSION_STORAGE_KEY));
+    } catch (e) {
+        return null;
+    }
+}
+
+function store_dimension_payload(payload) {
+    const stored = get_stored_dimension_payload();
+    if (stored && stored.version === payload.version) return;
+    try {
+        localStorage.setItem(DIMENSION_STORAGE_KEY, JSON.stringify(payload));
+    } catch (e) {
+        // storage full or disabled: the onload payload still works
+    }
+}
+
+// ---- company defaults from the dimensions' default tables ----
+function set_company_default_dimensions(frm) {
+    const defaults = (dimension_payload && dimension_payload.company_defaults[frm.doc.company]) || {};
+
+    Object.keys(defaults).forEach(function(fieldname) {
+        let default_fieldname = `default_${fieldname}`;
+        if (frm.fields_dict[default_fieldname] && !frm.doc[default_fieldname]) {
+            frm.set_value(default_fieldname, defaults[fieldname]);
+        }
     });
 }
 
@@ -115,13 +225,19 @@ function get_dimension_query_filters(dimension, company) {
             ]
         };
     } else {
-        // Generic filters for other doc types (disabled + company)
-        return {
-            filters: [
-                // [dimension.document_type, "disabled", "!=", 1],
-                [dimension.document_type, "company", "=", company]
-            ]
-        };
+        // Generic filters for other doc types, limited to the fields the
+        // doctype has (flags come with the dimension payload)
+        let filters = [];
+        if (dimension.filter_company !== false) {
+            filters.push([dimension.document_type, "company", "=", company]);
+        }
+        if (dimension.filter_disabled) {
+            filters.push([dimension.document_type, "disabled", "=", 0]);
+        }
+        if (dimension.filter_is_group) {
+            filters.push([dimension.document_type, "is_group", "=", 0]);
+        }
+        return { filters: filters };
     }
 }
 
@@ -143,65 +259,103 @@ function set_default_dimensions_on_add(frm, cdt, cdn) {
     frm.refresh_field("expenses");
 }
 
-// ---- validate mandatory dimensions (kept but safe) ----
+// ---- validate mandatory dimensions ----
+// Fills missing values from the parent defaults and reports every row that
+// is still missing a mandatory dimension in one message
 function validate_mandatory_dimensions(frm) {
-    let validation_passed = true;
-
-    frm.doc.expenses && frm.doc.expenses.forEach(function(expense, index) {
-        accounting_dimensions.forEach(function(dimension) {
-            let fieldname = dimension.fieldname;
-            let default_fieldname = `default_${fieldname}`;
-
-            // Example check: if dimension.mandatory_for_pl is true -> ensure set
-            if (dimension.mandatory_for_pl) {
-                if (!expense[fieldname] && !frm.doc[default_fieldname]) {
-                    frappe.validated = false;
-                    validation_passed = false;
-                    frappe.msgprint({
-                        title: __("Mandatory Field Missing"),
-                        message: `${dimension.label} is mandatory. Please set a default ${dimension.label} or specify it for expense <strong>No. ${index + 1}</strong>.`,
-                        indicator: "red"
-                    });
-                    return false;
-                } else if (!expense[fieldname] && frm.doc[default_fieldname]) {
-                    frappe.model.set_value(expense.doctype, expense.name, fieldname, frm.doc[default_fieldname]);
-                }
+    let missing = [];
+    let updates = [];
+
+    accounting_dimensions.forEach(function(dimension) {
+        if (!dimension.mandatory_for_pl) return;
+
+        let fieldname = dimension.fieldname;
+        let default_value = frm.doc[`default_${fieldname}`];
+        let rows = [];
+
+        (frm.doc.expenses || []).forEach(function(expense) {
+            if (expense[fieldname]) return;
+            if (default_value) {
+                updates.push([expense, fieldname, default_value]);
+            } else {
+                rows.push(expense.idx);
             }
         });
+
+        if (rows.length) {
+            missing.push(`<li>${__("{0}: rows {1}", [dimension.label, summarise_rows(rows)])}</li>`);
+        }
     });
 
-    return validation_passed;
+    set_row_values(frm, updates);
+
+    if (missing.length) {
+        frappe.msgprint({
+            title: __("Mandatory Field Missing"),
+            message: __("Set a default or a value on each row for:") + `<ul>${missing.join("")}</ul>`,
+            indicator: "red"
+        });
+        return false;
+    }
+
+    return true;
+}
+
+// [1, 2, 3, 7, 9, 10] -> "1-3, 7, 9-10"
+function summarise_rows(rows) {
+    let ranges = [];
+    rows.forEach(function(idx) {
+        let last = ranges[ranges.length - 1];
+        if (last && last[1] === idx - 1) {
+            last[1] = idx;
+        } else {
+            ranges.push([idx, idx]);
+        }
+    });
+    return ranges.map(([start, end]) => start === end ? `${start}` : `${start}-${end}`).join(", ");
 }
 
 // ---- clear defaults on company change ----
 function clear_default_dimensions(frm) {
+    let defaults = {};
+    let updates = [];
+
     accounting_dimensions.forEach(function(dimension) {
         let default_fieldname = `default_${dimension.fieldname}`;
-        frm.set_value(default_fieldname, '');
-		if (frm.doc.expenses) {
-			frm.doc.expenses.forEach(row => {
-				// frappe.model.set_value(doctype, name, fieldname, value)
-				frappe.model.set_value(row.doctype, row.name, dimension.fieldname, '');
-			});
-		}
+        if (frm.doc[default_fieldname]) defaults[default_fieldname] = "";
+
+        (frm.doc.expenses || []).forEach(function(row) {
+            if (row[dimension.fieldname]) updates.push([row, dimension.fieldname, ""]);
+        });
     });
-	frm.refresh_field('expenses')
+
+    if (Object.keys(defaults).length) frm.set_value(defaults);
+    set_row_values(frm, updates);
 }
 
 // ---- event handlers ----
 frappe.ui.form.on('Expense Entry Item', {
     amount: function(frm, cdt, cdn) {
-        update_totals(frm);
+        update_row_base_amount(frm, cdt, cdn);
+    },
+
+    exchange_rate: function(frm, cdt, cdn) {
+        update_row_base_amount(frm, cdt, cdn);
+    },
+
+    currency: function(frm, cdt, cdn) {
+        set_row_exchange_rate(frm, cdt, cdn);
     },
 
     expenses_remove: function(frm, cdt, cdn) {
-        update_totals(frm);
+        update_totals_for_row(frm, cdn, null);
     },
 
     // Note: depending on Frappe version, this event name may need to be on the parent doctype:
     // frappe.ui.form.on('Expense Entry', { expenses_add: function(frm, cdt, cdn) { ... } })
     expenses_add: function(frm, cdt, cdn) {
         set_default_dimensions_on_add(frm, cdt, cdn);
+        update_totals_for_row(frm, cdn, 0);
     }
 });
 
@@ -214,32 +368,50 @@ frappe.ui.form.on('Expense Entry', {
     },
 
     refresh: function(frm) {
-        // only load if company is defined
-        if ((!accounting_dimensions || accounting_dimensions.length === 0) && frm.doc.company) {
-            load_accounting_dimensions(frm);
-        }
+        // a reload brings a fresh onload payload
+        load_accounting_dimensions(frm);
+        prime_row_amounts(frm);
+        add_post_journal_entry_button(frm);
     },
 
     onload: function(frm) {
-        if (frm.doc.company) {
-            load_accounting_dimensions(frm);
+        load_accounting_dimensions(frm);
+        if (frm.is_new() && frm.doc.company) {
+            set_company_default_dimensions(frm);
         }
         set_queries(frm);
     },
 
     company: function(frm) {
-        // company changed -> reload dims and clear defaults
+        // company changed -> clear defaults and apply the new company's;
+        // dimension queries read the company when they run
+        clear_default_dimensions(frm);
         if (frm.doc.company) {
-            load_accounting_dimensions(frm);
+            set_company_default_dimensions(frm);
             set_queries(frm);
-        } else {
-            accounting_dimensions = default_dimensions;
-            setup_dimension_queries(frm);
         }
-        clear_default_dimensions(frm);
     }
 });
 
+// ---- re-post through the journal posting queue ----
+function add_post_journal_entry_button(frm) {
+    if (frm.doc.docstatus !== 1 || frm.doc.status !== "Approved" || frm.doc.journal_entry) return;
+    if (["Queued", "Posting"].includes(frm.doc.posting_status)) return;
+
+    frm.add_custom_button(__("Post Journal Entry"), function() {
+        frappe.call({
+            method: "expense_request.api.initialise_journal_entry",
+            args: { expense_entry_name: frm.doc.name },
+            callback: function(r) {
+                if (!r.exc) {
+                    frappe.show_alert({ message: __("Journal Entry posting queued"), indicator: "blue" });
+                    frm.reload_doc();
+                }
+            }
+        });
+    });
+}
+
 // ---- queries for other fields ----
 function set_queries(frm) {
     frm.set_query("expense_account", 'expenses', function() {
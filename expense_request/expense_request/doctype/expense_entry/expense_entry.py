@@ -6,5 +6,25 @@ from __future__ import unicode_literals
 # import frappe
 from frappe.model.document import Document
 
+from expense_request.accounting_dimensions_handler import get_dimension_payload
+from expense_request.indexes import add_indexes
+from expense_request.validation import validate_expense_links
+
 class ExpenseEntry(Document):
-	pass
+	def onload(self):
+		# Dimension metadata travels with the form, so opening an entry needs
+		# no extra round trip; see load_accounting_dimensions in the JS
+		self.set_onload("accounting_dimensions", get_dimension_payload())
+
+	def _validate_links(self):
+		# Set-based check of all parent and item links, one query per linked
+		# doctype, instead of Frappe's per-row lookups. Runs before the
+		# validate hooks and api.setup fill in default dimensions.
+		if self.flags.ignore_links or self._action == "cancel":
+			return
+
+		validate_expense_links(self)
+
+
+def on_doctype_update():
+	add_indexes("Expense Entry")
@@ -0,0 +1,32 @@
+// Copyright (c) 2020, Bantoo and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings['Expense Entry'] = {
+    onload: function(listview) {
+        listview.page.add_actions_menu_item(__("Approve and Post"), function() {
+            const names = listview.get_checked_items(true);
+            if (!names.length) return;
+
+            frappe.call({
+                method: "expense_request.bulk_approval.bulk_approve",
+                args: { names: names },
+                callback: function(r) {
+                    if (r && r.message) {
+                        frappe.show_alert({
+                            message: __("Queued {0} Expense Entries for approval", [r.message.total]),
+                            indicator: "blue"
+                        });
+                    }
+                }
+            });
+        });
+
+        frappe.realtime.on("expense_bulk_approval_complete", function(data) {
+            frappe.show_alert({
+                message: __("Bulk approval finished: {0} entries, {1} failed", [data.total, data.failed]),
+                indicator: data.failed ? "orange" : "green"
+            });
+            listview.refresh();
+        });
+    }
+};
@@ -3,8 +3,56 @@
 # See license.txt
 from __future__ import unicode_literals
 
-# import frappe
 import unittest
+from unittest.mock import patch
+
+import frappe
+
+from expense_request import api
+from expense_request.accounting_dimensions_handler import (
+	clear_dimension_cache,
+	get_active_dimensions,
+)
+
+
+def make_pending_entry():
+	return frappe.get_doc({
+		"doctype": "Expense Entry",
+		"name": "EXP-TEST-00001",
+		"status": "Pending",
+		"expenses": [{"amount": 100, "description": "Fuel", "expense_account": "Fuel - TC"}],
+	})
+
+
+def dimension_queries(get_all):
+	return [call for call in get_all.call_args_list if call.args and call.args[0] == "Accounting Dimension"]
+
 
 class TestExpenseEntry(unittest.TestCase):
-	pass
+	def test_warm_save_runs_no_dimension_queries(self):
+		clear_dimension_cache()
+		get_active_dimensions()
+
+		with patch("frappe.get_all", wraps=frappe.get_all) as get_all:
+			api.setup(make_pending_entry(), "validate")
+
+		self.assertEqual(dimension_queries(get_all), [])
+
+	def test_new_request_reads_dimensions_from_site_cache(self):
+		clear_dimension_cache()
+		get_active_dimensions()
+		frappe.local.expense_request_dimensions = None
+
+		with patch("frappe.get_all", wraps=frappe.get_all) as get_all:
+			api.setup(make_pending_entry(), "validate")
+
+		self.assertEqual(dimension_queries(get_all), [])
+
+	def test_dimension_change_invalidates_registry(self):
+		get_active_dimensions()
+		clear_dimension_cache()
+
+		with patch("frappe.get_all", wraps=frappe.get_all) as get_all:
+			get_active_dimensions()
+
+		self.assertEqual(len(dimension_queries(get_all)), 1)
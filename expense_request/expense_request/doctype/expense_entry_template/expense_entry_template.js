@@ -0,0 +1,29 @@
+// Copyright (c) 2025, Bantoo and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Expense Entry Template', {
+    setup: function(frm) {
+        frm.set_query("expense_account", "expenses", function() {
+            return {
+                filters: {
+                    company: frm.doc.company,
+                    root_type: "Expense",
+                    is_group: 0
+                }
+            };
+        });
+        let ledger_filters = function() {
+            return { filters: { company: frm.doc.company, is_group: 0 } };
+        };
+        frm.set_query("default_cost_center", ledger_filters);
+        frm.set_query("cost_center", "expenses", ledger_filters);
+    },
+
+    refresh: function(frm) {
+        if (!frm.is_new()) {
+            frm.add_custom_button(__("Expense Entries"), function() {
+                frappe.set_route("List", "Expense Entry", { recurring_template: frm.doc.name });
+            }, __("View"));
+        }
+    }
+});
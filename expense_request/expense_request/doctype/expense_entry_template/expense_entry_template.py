@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Bantoo and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import getdate
+
+from expense_request.validation import validate_expense_links
+
+class ExpenseEntryTemplate(Document):
+	def validate(self):
+		if self.end_date and getdate(self.end_date) < getdate(self.start_date):
+			frappe.throw(_("End Date cannot be before Start Date"))
+
+		# a new or moved-forward start restarts the schedule; periods already
+		# generated are skipped by the generator
+		if not self.next_date or getdate(self.next_date) < getdate(self.start_date):
+			self.next_date = self.start_date
+
+	def _validate_links(self):
+		# same set-based check as Expense Entry, one query per linked doctype
+		if self.flags.ignore_links:
+			return
+
+		validate_expense_links(self)
@@ -0,0 +1,18 @@
+// Copyright (c) 2025, Bantoo and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Expense Hook Metrics"] = {
+    filters: [],
+    onload: function(report) {
+        report.page.add_inner_button(__("Reset Metrics"), function() {
+            frappe.confirm(__("Clear all collected hook metrics?"), function() {
+                frappe.call({
+                    method: "expense_request.instrumentation.reset_metrics",
+                    callback: function() {
+                        report.refresh();
+                    }
+                });
+            });
+        });
+    }
+};
@@ -0,0 +1,44 @@
+# Copyright (c) 2025, Bantoo and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from expense_request.instrumentation import get_metrics, get_sample_rate
+
+
+def execute(filters=None):
+    return get_columns(), get_data(), _("Sample rate: {0}").format(get_sample_rate())
+
+
+def get_columns():
+    return [
+        {"fieldname": "phase", "label": _("Phase"), "fieldtype": "Data", "width": 220},
+        {"fieldname": "calls", "label": _("Sampled Calls"), "fieldtype": "Int", "width": 120},
+        {"fieldname": "avg_ms", "label": _("Avg ms"), "fieldtype": "Float", "precision": 2, "width": 110},
+        {"fieldname": "avg_queries", "label": _("Avg Queries"), "fieldtype": "Float", "precision": 1, "width": 110},
+        {"fieldname": "avg_query_ms", "label": _("Avg Query ms"), "fieldtype": "Float", "precision": 2, "width": 120},
+        {"fieldname": "query_share", "label": _("DB Time %"), "fieldtype": "Percent", "width": 100},
+        {"fieldname": "avg_items", "label": _("Avg Items"), "fieldtype": "Float", "precision": 1, "width": 100},
+        {"fieldname": "avg_dimensions", "label": _("Avg Dimensions"), "fieldtype": "Float", "precision": 1, "width": 120},
+    ]
+
+
+def get_data():
+    data = []
+    for phase, totals in sorted(get_metrics().items()):
+        calls = totals["calls"] or 1
+        data.append(
+            {
+                "phase": phase,
+                "calls": int(totals["calls"]),
+                "avg_ms": flt(totals["ms"] / calls, 2),
+                "avg_queries": flt(totals["queries"] / calls, 1),
+                "avg_query_ms": flt(totals["query_ms"] / calls, 2),
+                "query_share": flt(100 * totals["query_ms"] / totals["ms"], 1) if totals["ms"] else 0,
+                "avg_items": flt(totals["items"] / calls, 1),
+                "avg_dimensions": flt(totals["dimensions"] / calls, 1),
+            }
+        )
+    return data
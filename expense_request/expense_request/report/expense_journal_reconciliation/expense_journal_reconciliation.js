@@ -0,0 +1,24 @@
+// Copyright (c) 2025, Bantoo and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Expense Journal Reconciliation"] = {
+    filters: [
+        {
+            fieldname: "company",
+            label: __("Company"),
+            fieldtype: "Link",
+            options: "Company"
+        }
+    ],
+    onload: function(report) {
+        report.page.add_inner_button(__("Reconcile Now"), function() {
+            frappe.call({
+                method: "expense_request.reconciliation.reconcile_expense_journal_entries",
+                args: { company: report.get_filter_value("company") },
+                callback: function(r) {
+                    if (r.message) frappe.show_alert(r.message.message);
+                }
+            });
+        });
+    }
+};
@@ -0,0 +1,64 @@
+# Copyright (c) 2025, Bantoo and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+
+from expense_request.reconciliation import MISSING, ORPHAN, get_discrepancies, get_last_run
+
+
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+    return get_columns(), get_data(filters), get_message()
+
+
+def get_columns():
+    return [
+        {"fieldname": "discrepancy", "label": _("Discrepancy"), "fieldtype": "Data", "width": 170},
+        {"fieldname": "expense_entry", "label": _("Expense Entry"), "fieldtype": "Link", "options": "Expense Entry", "width": 160},
+        {"fieldname": "journal_entry", "label": _("Journal Entry"), "fieldtype": "Link", "options": "Journal Entry", "width": 160},
+        {"fieldname": "company", "label": _("Company"), "fieldtype": "Link", "options": "Company", "width": 160},
+        {"fieldname": "total", "label": _("Entry Total"), "fieldtype": "Currency", "width": 120},
+        {"fieldname": "journal_amount", "label": _("Journal Amount"), "fieldtype": "Currency", "width": 120},
+        {"fieldname": "detail", "label": _("Detail"), "fieldtype": "Data", "width": 300},
+    ]
+
+
+def get_data(filters):
+    data = []
+    for discrepancy, rows in get_discrepancies(filters.company).items():
+        for row in rows:
+            data.append(
+                {
+                    "discrepancy": _(discrepancy),
+                    "expense_entry": row.expense_entry,
+                    # a missing entry's registry row points at a JE that is not submitted
+                    "journal_entry": None if discrepancy == MISSING else row.journal_entry,
+                    "company": row.company,
+                    "total": row.get("total"),
+                    "journal_amount": row.get("journal_amount"),
+                    "detail": get_detail(discrepancy, row),
+                }
+            )
+    return data
+
+
+def get_detail(discrepancy, row):
+    if discrepancy == MISSING:
+        return row.posting_error or _("Posting status: {0}").format(
+            _(row.posting_status or "Not Queued")
+        )
+    if discrepancy == ORPHAN:
+        if row.registered:
+            return _("Expense Entry is cancelled or has another Journal Entry")
+        return _("Journal Entry is not registered for the Expense Entry")
+    return ""
+
+
+def get_message():
+    last_run = get_last_run()
+    if not last_run:
+        return _("Reconciliation has not run yet")
+    return _("Last run {0}: {1} Journal Entries adopted, {2} Expense Entries re-queued").format(
+        last_run["run_on"], last_run["repaired"]["adopted"], last_run["repaired"]["requeued"]
+    )
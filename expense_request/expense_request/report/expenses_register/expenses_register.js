@@ -0,0 +1,75 @@
+// Copyright (c) 2025, Bantoo and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Expenses Register"] = {
+    filters: [
+        {
+            fieldname: "company",
+            label: __("Company"),
+            fieldtype: "Link",
+            options: "Company",
+            default: frappe.defaults.get_user_default("Company"),
+            reqd: 1
+        },
+        {
+            fieldname: "from_date",
+            label: __("From Date"),
+            fieldtype: "Date",
+            default: frappe.datetime.add_months(frappe.datetime.get_today(), -1)
+        },
+        {
+            fieldname: "to_date",
+            label: __("To Date"),
+            fieldtype: "Date",
+            default: frappe.datetime.get_today()
+        },
+        {
+            fieldname: "expense_account",
+            label: __("Expense Account"),
+            fieldtype: "Link",
+            options: "Account",
+            get_query: function() {
+                return {
+                    filters: {
+                        company: frappe.query_report.get_filter_value("company"),
+                        root_type: "Expense",
+                        is_group: 0
+                    }
+                };
+            }
+        },
+        {
+            fieldname: "status",
+            label: __("Status"),
+            fieldtype: "Select",
+            options: ["", "Pending", "Approved", "Rejected"]
+        },
+        {
+            fieldname: "mode_of_payment",
+            label: __("Mode of Payment"),
+            fieldtype: "Link",
+            options: "Mode of Payment"
+        },
+        {
+            fieldname: "cost_center",
+            label: __("Cost Center"),
+            fieldtype: "Link",
+            options: "Cost Center"
+        },
+        {
+            fieldname: "project",
+            label: __("Project"),
+            fieldtype: "Link",
+            options: "Project"
+        },
+        {
+            fieldname: "group_by",
+            label: __("Group By"),
+            fieldtype: "Select",
+            options: ["", "Expense Account", "Cost Center", "Project", "Payment To", "Mode of Payment", "Status", "Month"]
+        }
+    ]
+};
+
+// Adds a filter for every active accounting dimension
+erpnext.utils.add_dimensions("Expenses Register", 8);
@@ -0,0 +1,203 @@
+# Copyright (c) 2025, Bantoo and contributors
+# For license information, please see license.txt
+
+import re
+
+import frappe
+from frappe import _
+
+from expense_request.api import get_accounting_dimensions
+
+# group_by filter -> (SQL expression, column label, fieldtype, options)
+GROUP_BY_FIELDS = {
+    "Expense Account": ("item.expense_account", _("Expense Account"), "Link", "Account"),
+    "Cost Center": ("item.cost_center", _("Cost Center"), "Link", "Cost Center"),
+    "Project": ("item.project", _("Project"), "Link", "Project"),
+    "Payment To": ("entry.payment_to", _("Payment To"), "Data", None),
+    "Mode of Payment": ("entry.mode_of_payment", _("Mode of Payment"), "Link", "Mode of Payment"),
+    "Status": ("entry.status", _("Status"), "Data", None),
+    "Month": ("date_format(entry.posting_date, '%%Y-%%m')", _("Month"), "Data", None),
+}
+
+
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+    validate_filters(filters)
+
+    dimension_fieldnames = get_dimension_fieldnames()
+
+    if filters.group_by:
+        return get_grouped_columns(filters), get_grouped_data(filters, dimension_fieldnames)
+
+    return get_columns(dimension_fieldnames), get_data(filters, dimension_fieldnames)
+
+
+def validate_filters(filters):
+    if not filters.company:
+        frappe.throw(_("Company is required"))
+
+    if filters.from_date and filters.to_date and filters.from_date > filters.to_date:
+        frappe.throw(_("From Date cannot be after To Date"))
+
+    if filters.group_by and filters.group_by not in GROUP_BY_FIELDS:
+        frappe.throw(_("Invalid Group By {0}").format(filters.group_by))
+
+
+def get_dimension_fieldnames():
+    """Dynamic accounting dimensions that exist as columns on Expense Entry Item"""
+    meta = frappe.get_meta("Expense Entry Item")
+    return [
+        dimension.fieldname
+        for dimension in get_accounting_dimensions()
+        if dimension.fieldname not in ("cost_center", "project")
+        and re.match(r"^[a-z0-9_]+$", dimension.fieldname)
+        and meta.has_field(dimension.fieldname)
+    ]
+
+
+def get_conditions(filters, dimension_fieldnames):
+    conditions = ["entry.docstatus < 2", "entry.company = %(company)s"]
+
+    if filters.from_date:
+        conditions.append("entry.posting_date >= %(from_date)s")
+    if filters.to_date:
+        conditions.append("entry.posting_date <= %(to_date)s")
+    if filters.status:
+        conditions.append("entry.status = %(status)s")
+    if filters.mode_of_payment:
+        conditions.append("entry.mode_of_payment = %(mode_of_payment)s")
+    if filters.expense_account:
+        conditions.append("item.expense_account = %(expense_account)s")
+
+    for fieldname in ["cost_center", "project", *dimension_fieldnames]:
+        if filters.get(fieldname):
+            values = filters.get(fieldname)
+            if isinstance(values, list | tuple):
+                conditions.append(f"item.`{fieldname}` in %({fieldname})s")
+                filters[fieldname] = tuple(values)
+            else:
+                conditions.append(f"item.`{fieldname}` = %({fieldname})s")
+
+    return " and ".join(conditions)
+
+
+def get_columns(dimension_fieldnames):
+    columns = [
+        {"label": _("Posting Date"), "fieldname": "posting_date", "fieldtype": "Date", "width": 100},
+        {
+            "label": _("Expense Entry"),
+            "fieldname": "expense_entry",
+            "fieldtype": "Link",
+            "options": "Expense Entry",
+            "width": 140,
+        },
+        {"label": _("Payment To"), "fieldname": "payment_to", "fieldtype": "Data", "width": 140},
+        {"label": _("Status"), "fieldname": "status", "fieldtype": "Data", "width": 90},
+        {
+            "label": _("Mode of Payment"),
+            "fieldname": "mode_of_payment",
+            "fieldtype": "Link",
+            "options": "Mode of Payment",
+            "width": 120,
+        },
+        {
+            "label": _("Expense Account"),
+            "fieldname": "expense_account",
+            "fieldtype": "Link",
+            "options": "Account",
+            "width": 180,
+        },
+        {"label": _("Description"), "fieldname": "description", "fieldtype": "Data", "width": 200},
+        {
+            "label": _("Cost Center"),
+            "fieldname": "cost_center",
+            "fieldtype": "Link",
+            "options": "Cost Center",
+            "width": 140,
+        },
+        {
+            "label": _("Project"),
+            "fieldname": "project",
+            "fieldtype": "Link",
+            "options": "Project",
+            "width": 120,
+        },
+    ]
+
+    meta = frappe.get_meta("Expense Entry Item")
+    for fieldname in dimension_fieldnames:
+        df = meta.get_field(fieldname)
+        columns.append(
+            {
+                "label": _(df.label),
+                "fieldname": fieldname,
+                "fieldtype": "Link",
+                "options": df.options,
+                "width": 120,
+            }
+        )
+
+    columns += [
+        {"label": _("Approved By"), "fieldname": "approved_by", "fieldtype": "Data", "width": 120},
+        {"label": _("Amount"), "fieldname": "amount", "fieldtype": "Currency", "width": 120},
+    ]
+    return columns
+
+
+def get_data(filters, dimension_fieldnames):
+    dimension_columns = "".join(f", item.`{fieldname}`" for fieldname in dimension_fieldnames)
+
+    return frappe.db.sql(
+        f"""
+        select
+            entry.posting_date, entry.name as expense_entry, entry.payment_to,
+            entry.status, entry.mode_of_payment, item.expense_account,
+            item.description, item.cost_center, item.project{dimension_columns},
+            entry.approved_by, item.base_amount as amount
+        from `tabExpense Entry` entry
+        inner join `tabExpense Entry Item` item
+            on item.parent = entry.name and item.parenttype = 'Expense Entry'
+        where {get_conditions(filters, dimension_fieldnames)}
+        order by entry.posting_date, entry.name, item.idx
+        """,
+        filters,
+        as_dict=True,
+    )
+
+
+def get_grouped_columns(filters):
+    _expression, label, fieldtype, options = GROUP_BY_FIELDS[filters.group_by]
+    return [
+        {
+            "label": label,
+            "fieldname": "group_value",
+            "fieldtype": fieldtype,
+            "options": options,
+            "width": 220,
+        },
+        {"label": _("Entries"), "fieldname": "entries", "fieldtype": "Int", "width": 90},
+        {"label": _("Lines"), "fieldname": "lines", "fieldtype": "Int", "width": 90},
+        {"label": _("Amount"), "fieldname": "amount", "fieldtype": "Currency", "width": 140},
+    ]
+
+
+def get_grouped_data(filters, dimension_fieldnames):
+    expression = GROUP_BY_FIELDS[filters.group_by][0]
+
+    return frappe.db.sql(
+        f"""
+        select
+            {expression} as group_value,
+            count(distinct entry.name) as entries,
+            count(*) as lines,
+            sum(item.base_amount) as amount
+        from `tabExpense Entry` entry
+        inner join `tabExpense Entry Item` item
+            on item.parent = entry.name and item.parenttype = 'Expense Entry'
+        where {get_conditions(filters, dimension_fieldnames)}
+        group by group_value
+        order by amount desc
+        """,
+        filters,
+        as_dict=True,
+    )
@@ -0,0 +1,141 @@
+# exporter.py
+# Keyset-paginated bulk read of Expense Entries with their items
+
+import base64
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint, get_datetime
+
+from expense_request.api import get_accounting_dimensions
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 2000
+
+# journal_entry and posting_status are left out: posting, consolidation,
+# Journal Entry cancellation and reconciliation write them without touching
+# modified, so a `since` sync would miss their changes
+ENTRY_FIELDS = [
+    "name",
+    "modified",
+    "docstatus",
+    "status",
+    "company",
+    "posting_date",
+    "required_by",
+    "payment_to",
+    "mode_of_payment",
+    "payment_reference",
+    "clearance_date",
+    "remarks",
+    "total",
+    "quantity",
+    "approved_by",
+    "default_cost_center",
+    "default_project",
+]
+
+ITEM_FIELDS = [
+    "name",
+    "parent",
+    "idx",
+    "expense_account",
+    "description",
+    "amount",
+    "currency",
+    "exchange_rate",
+    "base_amount",
+    "cost_center",
+    "project",
+]
+
+
+@frappe.whitelist()
+def get_expense_entries(cursor=None, since=None, limit=DEFAULT_PAGE_SIZE, company=None):
+    """One page of Expense Entries with their items, oldest change first.
+
+    Pages are keyed on (modified, name): pass the returned `next_cursor` to get
+    the following page. `since` starts an incremental sync from entries
+    modified after that timestamp. Items for the whole page are read in one
+    query. Posting state (journal_entry, posting_status) is not exported, as
+    its changes do not move `modified`. Returns {"entries", "next_cursor",
+    "has_more"}.
+    """
+
+    frappe.has_permission("Expense Entry", "read", throw=True)
+
+    limit = min(cint(limit) or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    dimension_fieldnames = [
+        d.fieldname for d in get_accounting_dimensions() if d.fieldname not in ITEM_FIELDS
+    ]
+
+    filters = []
+    or_filters = None
+    if company:
+        filters.append(["company", "=", company])
+
+    if cursor:
+        modified, name = decode_cursor(cursor)
+        # (modified, name) > cursor, written so the modified index is used
+        filters.append(["modified", ">=", modified])
+        or_filters = [["modified", ">", modified], ["name", ">", name]]
+    elif since:
+        filters.append(["modified", ">", get_datetime(since)])
+
+    # one extra row tells whether another page follows
+    entries = frappe.get_list(
+        "Expense Entry",
+        filters=filters,
+        or_filters=or_filters,
+        fields=ENTRY_FIELDS + [f"default_{fieldname}" for fieldname in dimension_fieldnames],
+        order_by="modified asc, name asc",
+        limit_page_length=limit + 1,
+    )
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    items_by_entry = get_items(entries, dimension_fieldnames)
+    for entry in entries:
+        entry["expenses"] = items_by_entry.get(entry.name, [])
+
+    return {
+        "entries": entries,
+        "next_cursor": encode_cursor(entries[-1]) if entries else cursor,
+        "has_more": has_more,
+    }
+
+
+def get_items(entries, dimension_fieldnames):
+    """{entry name: [items]} for a page of entries, in one query"""
+
+    if not entries:
+        return {}
+
+    items_by_entry = {}
+    for item in frappe.get_all(
+        "Expense Entry Item",
+        filters={
+            "parenttype": "Expense Entry",
+            "parent": ("in", [entry.name for entry in entries]),
+        },
+        fields=ITEM_FIELDS + dimension_fieldnames,
+        order_by="parent asc, idx asc",
+    ):
+        items_by_entry.setdefault(item.pop("parent"), []).append(item)
+
+    return items_by_entry
+
+
+def encode_cursor(entry):
+    value = json.dumps([str(entry.modified), entry.name])
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        modified, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return get_datetime(modified), name
+    except Exception:
+        frappe.throw(_("Invalid cursor"), title=_("Expense Entry Export"))
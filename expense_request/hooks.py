@@ -59,6 +59,8 @@ after_install = "expense_request.install.after_install"
 
 after_migrate = "expense_request.install.after_install"
 
+boot_session = "expense_request.accounting_dimensions_handler.boot_session"
+
 
 # Desk Notifications
 # ------------------
@@ -83,7 +85,47 @@ after_migrate = "expense_request.install.after_install"
 # Hook on document methods and events
 
 doc_events = {
-    "Expense Entry": {"on_update": "expense_request.api.setup"},
+    "Expense Entry": {
+        "validate": [
+            "expense_request.api.setup",
+            "expense_request.notifications.suppress_entry_notification",
+            "expense_request.duplicates.validate_duplicates",
+        ],
+        "on_update": "expense_request.api.on_update",
+        "before_submit": "expense_request.budget.check_budget",
+        "on_submit": [
+            "expense_request.summary.on_submit",
+            "expense_request.budget.on_submit",
+        ],
+        "on_cancel": [
+            "expense_request.summary.on_cancel",
+            "expense_request.budget.on_cancel",
+        ],
+    },
+    "Journal Entry": {
+        "on_submit": "expense_request.budget.on_journal_entry_submit",
+        # budget first: it reads the registry rows that release removes
+        "on_cancel": [
+            "expense_request.journal_registry.ignore_expense_entry_links",
+            "expense_request.budget.on_journal_entry_cancel",
+            "expense_request.journal_registry.release_journal_entry",
+        ],
+    },
+    "Accounts Settings": {
+        "on_update": "expense_request.budget.on_settings_update",
+    },
+    "Mode of Payment": {
+        "on_update": "expense_request.lookups.on_mode_of_payment_change",
+        "on_trash": "expense_request.lookups.on_mode_of_payment_change",
+    },
+    "User": {
+        "on_update": "expense_request.lookups.on_user_change",
+        "on_trash": "expense_request.lookups.on_user_change",
+    },
+    "Currency Exchange": {
+        "on_update": "expense_request.lookups.on_currency_exchange_change",
+        "on_trash": "expense_request.lookups.on_currency_exchange_change",
+    },
     "Accounting Dimension": {
         "after_insert": "expense_request.accounting_dimensions_handler.on_dimension_change",
         "on_update": "expense_request.accounting_dimensions_handler.on_dimension_change",
@@ -94,6 +136,17 @@ doc_events = {
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+    "all": ["expense_request.posting.retry_failed_postings"],
+    "hourly": ["expense_request.notifications.send_approval_digests"],
+    "daily": [
+        "expense_request.consolidation.consolidate_daily",
+        "expense_request.budget.rebuild_counters_daily",
+        "expense_request.reconciliation.reconcile_daily",
+    ],
+    "daily_long": ["expense_request.recurring.generate_recurring_entries"],
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"expenses.tasks.all"
@@ -149,6 +202,12 @@ fixtures = [
                     "Accounts Settings-column_break_16",
                     "Accounts Settings-notify_all_approvers",
                     "Accounts Settings-create_journals_entries_automatically",
+                    "Accounts Settings-consolidate_expense_journal_entries",
+                    "Accounts Settings-approver_notification_mode",
+                    "Accounts Settings-check_expense_budget",
+                    "Accounts Settings-duplicate_expense_action",
+                    "Accounts Settings-duplicate_expense_window",
+                    "Journal Entry-expense_entries",
                 ],
             ]
         ],
@@ -167,6 +226,17 @@ fixtures = [
     },
     {
         "dt": "Report",
-        "filters": [["ref_doctype", "in", ["Expense Entry", "Journal Entry"]]],
+        "filters": [
+            ["ref_doctype", "in", ["Expense Entry", "Journal Entry"]],
+            [
+                "name",
+                "not in",
+                [
+                    "Expenses Register",
+                    "Expense Hook Metrics",
+                    "Expense Journal Reconciliation",
+                ],
+            ],
+        ],
     },
 ]
@@ -0,0 +1,347 @@
+# importer.py
+# Streaming bulk import of Expense Entries from CSV / XLSX files
+
+import csv
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, getdate, nowdate
+
+from expense_request import journal_builder
+from expense_request.api import get_accounting_dimensions
+from expense_request.validation import get_link_error, get_link_fields, get_link_records
+
+IMPORT_BATCH_SIZE = 200
+IMPORT_CACHE_KEY = "expense_request:expense_import:{0}"
+IMPORT_RESULT_TTL = 24 * 60 * 60
+MAX_REPORTED_ERRORS = 1000
+
+# Column that groups consecutive rows into one Expense Entry
+ENTRY_REF_COLUMN = "entry_ref"
+
+ENTRY_COLUMNS = [
+    "company",
+    "posting_date",
+    "set_posting_time",
+    "required_by",
+    "payment_to",
+    "mode_of_payment",
+    "payment_reference",
+    "clearance_date",
+    "remarks",
+    "default_cost_center",
+    "default_project",
+]
+
+ITEM_COLUMNS = [
+    "expense_account",
+    "description",
+    "amount",
+    "currency",
+    "exchange_rate",
+    "cost_center",
+    "project",
+]
+
+
+@frappe.whitelist()
+def import_expense_entries(file_url, batch_size=IMPORT_BATCH_SIZE):
+    """Queue a streaming import of Expense Entries from an uploaded CSV or XLSX.
+
+    One row per expense item; consecutive rows sharing an `entry_ref` become
+    one Expense Entry. Entry columns are read from the first row of a group.
+    """
+
+    frappe.has_permission("Expense Entry", "create", throw=True)
+
+    import_id = frappe.generate_hash(length=12)
+    set_import_status(import_id, {"status": "Queued", "owner": frappe.session.user})
+
+    frappe.enqueue(
+        "expense_request.importer.run_import",
+        queue="long",
+        timeout=4 * 60 * 60,
+        import_id=import_id,
+        file_url=file_url,
+        batch_size=cint(batch_size) or IMPORT_BATCH_SIZE,
+    )
+
+    return {"import_id": import_id}
+
+
+@frappe.whitelist()
+def get_import_status(import_id):
+    """Progress and errors of an import; only the user who started it may read them"""
+
+    status = frappe.cache().get_value(IMPORT_CACHE_KEY.format(import_id))
+    if status and status.get("owner") != frappe.session.user:
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+    return status
+
+
+def set_import_status(import_id, status):
+    frappe.cache().set_value(
+        IMPORT_CACHE_KEY.format(import_id), status, expires_in_sec=IMPORT_RESULT_TTL
+    )
+
+
+def run_import(import_id, file_url, batch_size=IMPORT_BATCH_SIZE):
+    """Background job: stream the file, validate and insert one batch at a time.
+
+    Only the current batch of grouped entries is held in memory. Entries with
+    any invalid row are skipped and reported; the rest of the file carries on.
+    If the job itself fails, say the file cannot be read, the import is marked
+    Failed with the error before the exception is raised again.
+    """
+
+    summary = {
+        "status": "Running",
+        # jobs run as the user who queued them
+        "owner": frappe.session.user,
+        "rows": 0,
+        "imported": 0,
+        "failed": 0,
+        "errors": [],
+        "error_count": 0,
+    }
+
+    try:
+        accounting_dimensions = get_accounting_dimensions()
+        dimension_fieldnames = [
+            d.fieldname for d in accounting_dimensions if d.fieldname not in ITEM_COLUMNS
+        ]
+
+        batch = []
+        for entry in iter_entries(get_file_path(file_url), dimension_fieldnames):
+            summary["rows"] += len(entry["rows"])
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                import_batch(batch, summary)
+                set_import_status(import_id, summary)
+                batch = []
+
+        if batch:
+            import_batch(batch, summary)
+
+        summary["status"] = "Completed"
+
+    except Exception as e:
+        summary["status"] = "Failed"
+        summary["error"] = frappe.utils.strip_html(str(e))
+        frappe.clear_messages()
+        raise
+
+    finally:
+        set_import_status(import_id, summary)
+        frappe.publish_realtime(
+            "expense_import_complete",
+            {
+                "import_id": import_id,
+                "status": summary["status"],
+                "imported": summary["imported"],
+                "failed": summary["failed"],
+            },
+            user=frappe.session.user,
+        )
+
+    return summary
+
+
+def get_file_path(file_url):
+    """Path of an uploaded file the importing user may read; the job runs as
+    the user who queued it"""
+    file_doc = frappe.get_doc("File", {"file_url": file_url})
+    file_doc.check_permission("read")
+    return file_doc.get_full_path()
+
+
+def iter_rows(file_path):
+    """Yield (row number, dict) pairs without loading the whole file"""
+
+    if file_path.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(column or "").strip() for column in next(rows, [])]
+            for row_number, row in enumerate(rows, start=2):
+                if any(value not in (None, "") for value in row):
+                    yield row_number, dict(zip(header, row, strict=True))
+        finally:
+            workbook.close()
+    else:
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            reader.fieldnames = [column.strip() for column in reader.fieldnames or []]
+            for row_number, row in enumerate(reader, start=2):
+                if any(row.values()):
+                    yield row_number, row
+
+
+def iter_entries(file_path, dimension_fieldnames):
+    """Group consecutive rows with the same entry_ref into entries"""
+
+    entry_columns = ENTRY_COLUMNS + [f"default_{f}" for f in dimension_fieldnames]
+    item_columns = ITEM_COLUMNS + dimension_fieldnames
+
+    entry = None
+    for row_number, row in iter_rows(file_path):
+        entry_ref = str(row.get(ENTRY_REF_COLUMN) or row_number).strip()
+
+        if not entry or entry["entry_ref"] != entry_ref:
+            if entry:
+                yield entry
+            entry = {
+                "entry_ref": entry_ref,
+                "values": {c: clean(row.get(c)) for c in entry_columns if clean(row.get(c))},
+                "rows": [],
+            }
+
+        entry["rows"].append(
+            (row_number, {c: clean(row.get(c)) for c in item_columns if clean(row.get(c))})
+        )
+
+    if entry:
+        yield entry
+
+
+def clean(value):
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def import_batch(batch, summary):
+    """Validate a batch with one query per linked doctype, then insert it"""
+
+    errors = validate_batch(batch)
+
+    for entry in batch:
+        entry_errors = errors.get(entry["entry_ref"])
+        if entry_errors:
+            record_errors(summary, entry, entry_errors)
+            continue
+
+        frappe.db.savepoint("expense_import")
+        try:
+            make_expense_entry(entry).insert()
+            summary["imported"] += 1
+        except Exception as e:
+            frappe.db.rollback(save_point="expense_import")
+            frappe.clear_messages()
+            record_errors(summary, entry, [(entry["rows"][0][0], str(e))])
+
+    frappe.db.commit()
+
+
+def record_errors(summary, entry, errors):
+    summary["failed"] += 1
+    summary["error_count"] += len(errors)
+    for row_number, message in errors:
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append(
+                {"row": row_number, "entry_ref": entry["entry_ref"], "error": message}
+            )
+
+
+def validate_batch(batch):
+    """Check every link in the batch with a single IN query per doctype.
+
+    Returns {entry_ref: [(row number, message), ...]}.
+    """
+
+    link_fields = {
+        **get_link_fields("Expense Entry"),
+        **get_link_fields("Expense Entry Item"),
+    }
+
+    # Collect distinct values per doctype across the whole batch
+    values_by_doctype = {}
+    for entry in batch:
+        for _row_number, fieldname, value in iter_link_values(entry):
+            doctype = link_fields.get(fieldname)
+            if doctype:
+                values_by_doctype.setdefault(doctype, set()).add(value)
+
+    records = get_link_records(values_by_doctype)
+
+    errors = {}
+    for entry in batch:
+        entry_errors = []
+        company = entry["values"].get("company")
+        company_currency = (
+            frappe.get_cached_value("Company", company, "default_currency") if company else None
+        )
+        first_row = entry["rows"][0][0]
+
+        for fieldname in ("company", "payment_to", "mode_of_payment"):
+            if not entry["values"].get(fieldname):
+                entry_errors.append((first_row, _("{0} is required").format(fieldname)))
+
+        for row_number, row in entry["rows"]:
+            if not row.get("expense_account"):
+                entry_errors.append((row_number, _("expense_account is required")))
+            if not flt(row.get("amount")):
+                entry_errors.append((row_number, _("amount is required")))
+
+        for row_number, fieldname, value in iter_link_values(entry):
+            doctype = link_fields.get(fieldname)
+            if not doctype:
+                continue
+            error = get_link_error(
+                fieldname,
+                doctype,
+                value,
+                records[doctype].get(str(value).casefold()),
+                company,
+                company_currency,
+            )
+            if error:
+                entry_errors.append((row_number, error))
+
+        if entry_errors:
+            errors[entry["entry_ref"]] = entry_errors
+
+    return errors
+
+
+def iter_link_values(entry):
+    first_row = entry["rows"][0][0]
+    for fieldname, value in entry["values"].items():
+        yield first_row, fieldname, value
+
+    for row_number, row in entry["rows"]:
+        for fieldname, value in row.items():
+            yield row_number, fieldname, value
+
+
+def make_expense_entry(entry):
+    """Build the Expense Entry from its rows; the validate hook fills the
+    default accounting dimensions and works out totals in company currency
+    on insert"""
+
+    values = entry["values"]
+    expense_entry = frappe.get_doc(
+        {
+            "doctype": "Expense Entry",
+            **values,
+            "posting_date": getdate(values.get("posting_date") or nowdate()),
+            "required_by": values.get("required_by") or values.get("posting_date") or nowdate(),
+            "set_posting_time": 1 if values.get("posting_date") else 0,
+            "status": "Pending",
+        }
+    )
+
+    for _row_number, row in entry["rows"]:
+        item = expense_entry.append("expenses", row)
+        item.amount = flt(item.amount, 2)
+        # default_cost_center and default_project fill the core dimensions
+        # here, as the form does when an entry is keyed in
+        for fieldname in journal_builder.CORE_DIMENSIONS:
+            if not item.get(fieldname) and values.get(f"default_{fieldname}"):
+                item.set(fieldname, values.get(f"default_{fieldname}"))
+
+    # Links were checked for the whole batch in validate_batch
+    expense_entry.flags.ignore_links = True
+    return expense_entry
@@ -0,0 +1,49 @@
+# indexes.py
+# Composite indexes for the Expense Entry list, workflow and report queries
+
+import frappe
+
+# doctype -> {index name: columns}; single-column indexes on this app's
+# doctypes are set with search_index in the doctype JSON instead
+COMPOSITE_INDEXES = {
+    "Expense Entry": {
+        # list view and workflow queues: filter by status, newest first
+        "status_modified_index": ["status", "modified"],
+        # Expenses Register and Expense Summary rebuild: company and date range
+        "company_posting_date_index": ["company", "posting_date"],
+        # consolidation and status-filtered register runs
+        "status_company_posting_date_index": ["status", "company", "posting_date"],
+        # posting retry job: failed or stale postings that are due
+        "posting_status_next_attempt_index": ["posting_status", "next_posting_attempt"],
+    },
+    # ERPNext's doctype, indexed from after_install / after_migrate:
+    # reconciliation matches Journal Entries to Expense Entries on bill_no
+    "Journal Entry": {
+        "bill_no_index": ["bill_no"],
+    },
+}
+
+# doctype -> {constraint name: columns}
+UNIQUE_INDEXES = {
+    "Expense Entry": {
+        # one entry per recurring template and period
+        "recurring_template_period": ["recurring_template", "recurring_period"],
+    },
+}
+
+
+def add_indexes(doctype=None):
+    """Add the composite and unique indexes (for one doctype, or all);
+    existing ones are kept"""
+
+    for index_doctype, indexes in COMPOSITE_INDEXES.items():
+        if doctype and doctype != index_doctype:
+            continue
+        for index_name, columns in indexes.items():
+            frappe.db.add_index(index_doctype, columns, index_name=index_name)
+
+    for index_doctype, constraints in UNIQUE_INDEXES.items():
+        if doctype and doctype != index_doctype:
+            continue
+        for constraint_name, columns in constraints.items():
+            frappe.db.add_unique(index_doctype, columns, constraint_name=constraint_name)
@@ -0,0 +1,168 @@
+# instrumentation.py
+# Sampled per-phase timing and query counts for the Expense Entry hooks
+
+import functools
+import json
+import random
+import time
+from contextlib import contextmanager
+
+import frappe
+
+METRICS_KEY = "expense_request:metrics"
+METRICS = ("calls", "ms", "queries", "query_ms", "items", "dimensions")
+
+# Fraction of top-level calls that are traced; set
+# "expense_request_metrics_sample_rate" in site_config.json to override
+DEFAULT_SAMPLE_RATE = 0.05
+
+
+class Span:
+    __slots__ = ("dimensions", "items", "phase", "queries", "query_ms", "start")
+
+    def __init__(self, phase, size=None):
+        self.phase = phase
+        self.items, self.dimensions = size or (0, 0)
+        self.queries = 0
+        self.query_ms = 0.0
+        self.start = time.perf_counter()
+
+
+def get_sample_rate():
+    return float(frappe.conf.get("expense_request_metrics_sample_rate", DEFAULT_SAMPLE_RATE))
+
+
+def instrument(phase, size=None):
+    """Decorator: trace calls as `phase`.
+
+    `size` receives the call's arguments and returns (item count, dimension
+    count); it is only evaluated for sampled calls.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(phase, (lambda: size(*args, **kwargs)) if size else None):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def span(phase, size=None):
+    """Trace a block as `phase`.
+
+    The sampling decision is made once at the outermost span; nested spans of
+    an unsampled call cost one attribute lookup.
+    """
+
+    trace = getattr(frappe.local, "expense_request_trace", None)
+
+    if trace is False:
+        yield
+        return
+
+    is_root = trace is None
+    if is_root:
+        if random.random() >= get_sample_rate():
+            frappe.local.expense_request_trace = False
+            try:
+                yield
+            finally:
+                frappe.local.expense_request_trace = None
+            return
+
+    # sized before db.sql is patched, so a failing size() leaves nothing behind
+    current = Span(phase, size() if size else None)
+
+    if is_root:
+        trace = frappe.local.expense_request_trace = []
+        # restored on this object even if frappe.local.db is replaced meanwhile
+        db = frappe.local.db
+        db.sql = count_queries(db.sql)
+
+    trace.append(current)
+    try:
+        yield
+    finally:
+        trace.pop()
+        elapsed = (time.perf_counter() - current.start) * 1000
+        if is_root:
+            db.__dict__.pop("sql", None)
+            frappe.local.expense_request_trace = None
+        record(current, elapsed)
+
+
+def count_queries(sql):
+    """Wrap db.sql so every open span counts the query and its time"""
+
+    @functools.wraps(sql)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return sql(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            for open_span in getattr(frappe.local, "expense_request_trace", None) or []:
+                open_span.queries += 1
+                open_span.query_ms += elapsed
+
+    return wrapper
+
+
+def record(current, elapsed):
+    """Write the span to the structured log and add it to the site metrics"""
+
+    values = {
+        "calls": 1,
+        "ms": round(elapsed, 3),
+        "queries": current.queries,
+        "query_ms": round(current.query_ms, 3),
+        "items": current.items,
+        "dimensions": current.dimensions,
+    }
+
+    try:
+        frappe.logger("expense_request.metrics", allow_site=True).info(
+            json.dumps({"phase": current.phase, **values})
+        )
+
+        cache = frappe.cache()
+        key = cache.make_key(METRICS_KEY)
+        pipeline = cache.pipeline()
+        for metric, value in values.items():
+            pipeline.hincrbyfloat(key, f"{current.phase}:{metric}", value)
+        pipeline.execute()
+    except Exception:
+        # Metrics must never break the hook being measured
+        frappe.logger("expense_request.metrics").exception(
+            "Could not record metrics for %s", current.phase
+        )
+
+
+def entry_size(expense_entry, *args, **kwargs):
+    """(item count, dimension count) without extra queries"""
+    dimensions = getattr(frappe.local, "expense_request_dimensions", None) or []
+    return len(expense_entry.get("expenses") or []), len(dimensions)
+
+
+def get_metrics():
+    """Aggregated metrics per phase: {phase: {metric: total}}"""
+
+    cache = frappe.cache()
+    metrics = {}
+    for field, value in (cache.hgetall(cache.make_key(METRICS_KEY)) or {}).items():
+        phase, metric = frappe.safe_decode(field).rsplit(":", 1)
+        metrics.setdefault(phase, dict.fromkeys(METRICS, 0))[metric] = float(
+            frappe.safe_decode(value)
+        )
+    return metrics
+
+
+@frappe.whitelist()
+def reset_metrics():
+    frappe.only_for("System Manager")
+    cache = frappe.cache()
+    cache.delete(cache.make_key(METRICS_KEY))
@@ -0,0 +1,166 @@
+# journal_builder.py
+# Side-effect free totals, default dimension fill and JE line construction.
+#
+# Nothing here touches the database: callers pass in the entry, its items and
+# the active accounting dimensions, and apply the returned values themselves.
+# Entries and items only need a dict-style ``get``, so frappe Documents,
+# frappe._dict rows and plain dicts all work.
+
+from decimal import ROUND_HALF_UP, Decimal
+
+CENT = Decimal("0.01")
+CORE_DIMENSIONS = ("project", "cost_center")
+
+
+class JournalPlan:
+    """Result of building an entry: totals, default fills, company currency
+    item amounts and JE account lines"""
+
+    __slots__ = ("accounts", "base_amounts", "defaults", "quantity", "total")
+
+    def __init__(self, total, quantity, defaults, accounts, base_amounts):
+        self.total = total
+        self.quantity = quantity
+        self.defaults = defaults
+        self.accounts = accounts
+        self.base_amounts = base_amounts
+
+
+def to_decimal(value):
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value or 0))
+
+
+def to_amount(value):
+    """Decimal rounded to cents, as the float the JE fields expect"""
+    return float(value.quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def get_base_amount(item):
+    """Item amount converted to company currency at its exchange rate, in cents.
+
+    Items without a rate are in company currency.
+    """
+    rate = to_decimal(item.get("exchange_rate")) or Decimal(1)
+    return (to_decimal(item.get("amount")) * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def resolve_dimensions(accounting_dimensions):
+    """Dynamic dimension fieldnames, resolved once per entry"""
+    return tuple(
+        dimension.get("fieldname")
+        for dimension in accounting_dimensions
+        if dimension.get("fieldname")
+    )
+
+
+def resolve_entry_defaults(entry, dimension_fieldnames):
+    """{fieldname: default value} for dimensions with a default_<fieldname> set"""
+    defaults = {}
+    for fieldname in dimension_fieldnames:
+        value = entry.get(f"default_{fieldname}")
+        if value:
+            defaults[fieldname] = value
+    return defaults
+
+
+def get_tracked_values(entry, items, dimension_fieldnames):
+    """The entry values totals and default fills depend on, for change detection"""
+    return (
+        tuple(entry.get(f"default_{fieldname}") for fieldname in dimension_fieldnames),
+        tuple(
+            (
+                item.get("name"),
+                to_decimal(item.get("amount")),
+                item.get("currency"),
+                to_decimal(item.get("exchange_rate")),
+                tuple(item.get(fieldname) for fieldname in dimension_fieldnames),
+            )
+            for item in items
+        ),
+    )
+
+
+def compute_totals(base_amounts):
+    """Decimal company currency total and item count"""
+    return sum(base_amounts, Decimal(0)), len(base_amounts)
+
+
+def get_default_fills(items, entry_defaults):
+    """Per item index, the dimension values to fill from the entry defaults"""
+    if not entry_defaults:
+        return {}
+
+    fills = {}
+    for index, item in enumerate(items):
+        values = {
+            fieldname: value
+            for fieldname, value in entry_defaults.items()
+            if not item.get(fieldname)
+        }
+        if values:
+            fills[index] = values
+    return fills
+
+
+def build_debit_lines(items, base_amounts, dimension_fieldnames, fills=None):
+    """One debit line per item in company currency, carrying its project,
+    cost center and dimensions"""
+
+    fills = fills or {}
+    line_fieldnames = CORE_DIMENSIONS + tuple(
+        f for f in dimension_fieldnames if f not in CORE_DIMENSIONS
+    )
+
+    lines = []
+    for index, item in enumerate(items):
+        filled = fills.get(index)
+        line = {
+            "debit_in_account_currency": to_amount(base_amounts[index]),
+            "user_remark": str(item.get("description")),
+            "account": item.get("expense_account"),
+        }
+        for fieldname in line_fieldnames:
+            value = item.get(fieldname) or (filled and filled.get(fieldname))
+            if value:
+                line[fieldname] = value
+        lines.append(line)
+
+    return lines
+
+
+def build_credit_line(entry, items, total, pay_account, entry_defaults):
+    """Credit line against the payment account for the entry total"""
+
+    last_item = items[-1] if items else {}
+    line = {
+        "credit_in_account_currency": to_amount(total),
+        "user_remark": str(last_item.get("description")),
+        "account": pay_account,
+    }
+
+    if last_item.get("project"):
+        line["project"] = last_item.get("project")
+
+    line.update(entry_defaults)
+    return line
+
+
+def build(entry, items, accounting_dimensions, pay_account=None):
+    """Totals, default fills and (when pay_account is given) the JE lines"""
+
+    items = list(items)
+    dimension_fieldnames = resolve_dimensions(accounting_dimensions)
+    entry_defaults = resolve_entry_defaults(entry, dimension_fieldnames)
+
+    base_amounts = [get_base_amount(item) for item in items]
+    total, quantity = compute_totals(base_amounts)
+    fills = get_default_fills(items, entry_defaults)
+
+    accounts = []
+    if pay_account:
+        accounts = build_debit_lines(items, base_amounts, dimension_fieldnames, fills)
+        accounts.append(build_credit_line(entry, items, total, pay_account, entry_defaults))
+
+    return JournalPlan(total, quantity, fills, accounts, base_amounts)
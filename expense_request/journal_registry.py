@@ -0,0 +1,99 @@
+# journal_registry.py
+# Unique Expense Entry -> Journal Entry mapping used as the posting idempotency key
+
+import frappe
+from frappe import _
+from frappe.utils import now_datetime
+
+REGISTRY_DOCTYPE = "Expense Journal Link"
+
+
+class AlreadyPostedError(frappe.ValidationError):
+    pass
+
+
+def get_journal_entry(expense_entry_name):
+    """Journal Entry registered for an Expense Entry (primary key lookup)"""
+    return frappe.db.get_value(REGISTRY_DOCTYPE, expense_entry_name, "journal_entry")
+
+
+def is_registered(expense_entry_name):
+    return bool(frappe.db.exists(REGISTRY_DOCTYPE, expense_entry_name))
+
+
+def claim_expense_entries(expense_entry_names):
+    """Reserve the entries for posting in the current transaction.
+
+    The registry is keyed by the Expense Entry name, so a concurrent worker
+    claiming the same entry blocks on the unique key and then fails with
+    AlreadyPostedError instead of posting a second Journal Entry.
+    """
+
+    timestamp = now_datetime()
+    user = frappe.session.user
+    values = [
+        (name, name, timestamp, timestamp, user, user)
+        for name in expense_entry_names
+    ]
+
+    try:
+        frappe.db.bulk_insert(
+            REGISTRY_DOCTYPE,
+            fields=["name", "expense_entry", "creation", "modified", "owner", "modified_by"],
+            values=values,
+        )
+    except Exception as e:
+        if not frappe.db.is_duplicate_entry(e):
+            raise
+
+        frappe.throw(
+            _("Journal Entry already exists for Expense Entry {0}.").format(
+                ", ".join(expense_entry_names)
+            ),
+            exc=AlreadyPostedError,
+            title=_("Error"),
+        )
+
+
+def link_journal_entry(expense_entry_names, journal_entry):
+    """Point claimed entries at the Journal Entry posted for them"""
+    frappe.db.set_value(
+        REGISTRY_DOCTYPE,
+        {"name": ["in", expense_entry_names]},
+        "journal_entry",
+        journal_entry,
+        update_modified=False,
+    )
+
+
+def ignore_expense_entry_links(doc, method):
+    """Journal Entry on_cancel: let the Journal Entry be cancelled on its own.
+
+    Approved Expense Entries link to their Journal Entry, so frappe's
+    back-link check would refuse the cancel, or cancel the Expense Entries
+    with it. ERPNext sets ignore_linked_doctypes in its own on_cancel, which
+    runs before this hook and would drop a value set in before_cancel.
+    """
+    doc.ignore_linked_doctypes = (*(doc.get("ignore_linked_doctypes") or ()), "Expense Entry")
+
+
+def release_journal_entry(doc, method):
+    """Journal Entry on_cancel: free its Expense Entries so they can be re-posted.
+
+    They are marked Cancelled so neither reconciliation nor consolidation
+    posts them again on their own; Post Journal Entry re-posts by hand.
+    """
+
+    expense_entry_names = frappe.get_all(
+        REGISTRY_DOCTYPE, filters={"journal_entry": doc.name}, pluck="name"
+    )
+    if not expense_entry_names:
+        return
+
+    frappe.db.delete(REGISTRY_DOCTYPE, {"name": ["in", expense_entry_names]})
+    frappe.db.set_value(
+        "Expense Entry",
+        {"name": ["in", expense_entry_names]},
+        {"journal_entry": None, "posting_status": "Cancelled"},
+        update_modified=False,
+    )
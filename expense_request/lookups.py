@@ -0,0 +1,141 @@
+# lookups.py
+# Bounded in-process caches for reference data read on every approval
+
+import time
+from collections import OrderedDict
+
+import frappe
+
+GENERATION_CACHE_KEY = "expense_request:lookup_generation:{0}"
+
+
+class LookupCache:
+    """LRU cache with a TTL, scoped per site.
+
+    Entries are dropped when the cache is full (least recently used first),
+    when they are older than `ttl` seconds, or when the cache is invalidated.
+    Invalidation bumps a generation token in the site cache so other worker
+    processes drop their copies on their next request.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._generations = {}
+
+    def get(self, key, generator):
+        self._check_generation()
+
+        key = (frappe.local.site, key)
+        now = time.monotonic()
+        cached = self._data.get(key)
+
+        if cached and cached[1] > now:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return cached[0]
+
+        self.misses += 1
+        value = generator()
+        self._data[key] = (value, now + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+        return value
+
+    def invalidate(self):
+        """Drop this site's entries here and in every other worker process"""
+        self._clear_site()
+        generation = frappe.generate_hash(length=10)
+        frappe.cache().set_value(GENERATION_CACHE_KEY.format(self.name), generation)
+        self._generations[frappe.local.site] = generation
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
+
+    def _check_generation(self):
+        # get_value is memoised per request on frappe.local, so this is a
+        # single Redis read per request rather than per lookup
+        site = frappe.local.site
+        generation = frappe.cache().get_value(GENERATION_CACHE_KEY.format(self.name))
+        if self._generations.get(site) != generation:
+            self._clear_site()
+            self._generations[site] = generation
+
+    def _clear_site(self):
+        site = frappe.local.site
+        for key in [key for key in self._data if key[0] == site]:
+            del self._data[key]
+
+
+pay_account_cache = LookupCache("pay_account", maxsize=512)
+approver_name_cache = LookupCache("approver_name", maxsize=2048)
+exchange_rate_cache = LookupCache("exchange_rate", maxsize=4096, ttl=3600)
+
+
+def get_mode_of_payment_account(mode_of_payment, company):
+    """Default account of a Mode of Payment for a company"""
+    return pay_account_cache.get(
+        (mode_of_payment, company),
+        lambda: frappe.db.get_value(
+            "Mode of Payment Account",
+            {"parent": mode_of_payment, "company": company},
+            "default_account",
+        ),
+    )
+
+
+def get_user_full_name(user):
+    """First and last name of a user, without loading the User document"""
+
+    def load():
+        first_name, last_name = frappe.db.get_value(
+            "User", user, ["first_name", "last_name"]
+        ) or (None, None)
+        return str(first_name) + " " + str(last_name)
+
+    return approver_name_cache.get(user, load)
+
+
+def get_exchange_rate(from_currency, to_currency, transaction_date):
+    """Exchange rate for a day, resolved once per (from, to, date)"""
+    from erpnext.setup.utils import get_exchange_rate
+
+    return exchange_rate_cache.get(
+        (from_currency, to_currency, str(transaction_date)),
+        lambda: get_exchange_rate(from_currency, to_currency, transaction_date),
+    )
+
+
+def on_mode_of_payment_change(doc, method):
+    pay_account_cache.invalidate()
+
+
+def on_user_change(doc, method):
+    approver_name_cache.invalidate()
+
+
+def on_currency_exchange_change(doc, method):
+    exchange_rate_cache.invalidate()
+
+
+@frappe.whitelist()
+def get_lookup_cache_stats():
+    """Hit/miss counters of this worker process's lookup caches, for ops"""
+    frappe.only_for("System Manager")
+    return {
+        cache.name: cache.stats() for cache in (pay_account_cache, approver_name_cache, exchange_rate_cache)
+    }
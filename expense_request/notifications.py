@@ -0,0 +1,200 @@
+# notifications.py
+# Hourly approver digest of pending Expense Entries
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, get_url_to_form, now_datetime
+
+APPROVAL_WORKFLOW = "Expense Approval"
+DIGEST_MODE = "Digest"
+
+# Per-entry Notification shipped in the fixtures; skipped for pending entries
+# while digest mode is on
+APPROVER_NOTIFICATION = "Expense Entry"
+
+# Entries listed in one digest message; the rest are counted, not listed
+MAX_DIGEST_ROWS = 50
+
+
+def is_digest_mode():
+    return (
+        frappe.db.get_single_value("Accounts Settings", "approver_notification_mode")
+        == DIGEST_MODE
+    )
+
+
+def is_digest_enabled():
+    """Digests only go out while approver notifications are on at all"""
+    return is_digest_mode() and cint(
+        frappe.db.get_single_value("Accounts Settings", "notify_all_approvers")
+    )
+
+
+def suppress_entry_notification(expense_entry, method):
+    """Validate hook: pending entries go out in the digest, not one by one.
+
+    Only while the digest is sent, so an entry is never left unannounced.
+    """
+
+    if expense_entry.status != "Pending" or not is_digest_enabled():
+        return
+
+    # Frappe skips Notifications already listed as executed for this save
+    if expense_entry.flags.notifications_executed is None:
+        expense_entry.flags.notifications_executed = []
+    expense_entry.flags.notifications_executed.append(APPROVER_NOTIFICATION)
+
+
+def send_approval_digests():
+    """Scheduler: one message per approver listing entries not yet digested.
+
+    Approvers restricted to some companies by User Permissions only see
+    those companies' entries. Each entry is marked with
+    approval_digest_sent_on in the same transaction that queues the emails,
+    so an entry is never listed twice.
+    """
+
+    if not is_digest_enabled():
+        return
+
+    entries = get_undigested_entries()
+    if not entries:
+        return
+
+    approvers = get_approvers()
+    permitted_companies = get_permitted_companies([approver.name for approver in approvers])
+
+    # approvers with the same companies share one rendered message
+    messages = {}
+    sent = 0
+    for approver in approvers:
+        companies = permitted_companies.get(approver.name)
+        key = frozenset(companies) if companies is not None else None
+        if key not in messages:
+            visible = [entry for entry in entries if key is None or entry.company in key]
+            messages[key] = get_digest_message(visible) if visible else None
+        if not messages[key]:
+            continue
+
+        subject, message = messages[key]
+        frappe.sendmail(
+            recipients=[approver.email],
+            subject=subject,
+            message=message,
+            reference_doctype="Expense Entry",
+        )
+        sent += 1
+
+    # entries no approver may see are marked too, or they'd be fetched every hour
+    frappe.db.set_value(
+        "Expense Entry",
+        {"name": ("in", [entry.name for entry in entries])},
+        "approval_digest_sent_on",
+        now_datetime(),
+        update_modified=False,
+    )
+    frappe.db.commit()
+
+    return sent
+
+
+def get_undigested_entries():
+    return frappe.get_all(
+        "Expense Entry",
+        filters={
+            "status": "Pending",
+            "docstatus": 0,
+            "approval_digest_sent_on": ("is", "not set"),
+        },
+        fields=["name", "company", "posting_date", "payment_to", "total"],
+        order_by="creation asc",
+    )
+
+
+def get_approvers():
+    """Enabled system users holding a role allowed to approve Expense Entries"""
+
+    roles = frappe.get_all(
+        "Workflow Transition",
+        filters={"parent": APPROVAL_WORKFLOW, "action": "Approve"},
+        pluck="allowed",
+    )
+    if not roles:
+        return []
+
+    users = frappe.get_all(
+        "Has Role",
+        filters={"parenttype": "User", "role": ("in", roles)},
+        pluck="parent",
+    )
+    if not users:
+        return []
+
+    return frappe.get_all(
+        "User",
+        filters={
+            "name": ("in", list(set(users))),
+            "enabled": 1,
+            "user_type": "System User",
+        },
+        fields=["name", "email"],
+        order_by="name asc",
+    )
+
+
+def get_permitted_companies(users):
+    """{user: {company}} for users whose Company User Permissions apply to
+    Expense Entry; users without any may read every company"""
+
+    if not users:
+        return {}
+
+    companies = {}
+    for permission in frappe.get_all(
+        "User Permission",
+        filters={"user": ("in", users), "allow": "Company"},
+        fields=["user", "for_value", "apply_to_all_doctypes", "applicable_for"],
+    ):
+        if permission.apply_to_all_doctypes or permission.applicable_for == "Expense Entry":
+            companies.setdefault(permission.user, set()).add(permission.for_value)
+    return companies
+
+
+def get_digest_message(entries):
+    """Subject and HTML body listing the entries with totals per company"""
+
+    company_totals = {}
+    for entry in entries:
+        company_totals[entry.company] = company_totals.get(entry.company, 0) + flt(entry.total)
+
+    subject = _("{0} Expense Entries awaiting approval").format(len(entries))
+
+    rows = "".join(
+        f"<tr><td><a href='{get_url_to_form('Expense Entry', entry.name)}'>{entry.name}</a></td>"
+        f"<td>{entry.company}</td><td>{entry.posting_date}</td>"
+        f"<td>{frappe.utils.escape_html(entry.payment_to or '')}</td>"
+        f"<td style='text-align: right'>{flt(entry.total, 2):,.2f}</td></tr>"
+        for entry in entries[:MAX_DIGEST_ROWS]
+    )
+
+    more = ""
+    if len(entries) > MAX_DIGEST_ROWS:
+        more = "<p>{0}</p>".format(
+            _("and {0} more.").format(len(entries) - MAX_DIGEST_ROWS)
+        )
+
+    totals = "".join(
+        f"<li>{company}: {flt(total, 2):,.2f}</li>"
+        for company, total in sorted(company_totals.items())
+    )
+
+    message = (
+        f"<p>{_('The following Expense Entries are waiting for approval.')}</p>"
+        f"<table class='table table-bordered'><thead><tr>"
+        f"<th>{_('Expense Entry')}</th><th>{_('Company')}</th><th>{_('Posting Date')}</th>"
+        f"<th>{_('Payment To')}</th><th>{_('Total')}</th>"
+        f"</tr></thead><tbody>{rows}</tbody></table>{more}"
+        f"<p>{_('Total per company:')}</p><ul>{totals}</ul>"
+    )
+
+    return subject, message
@@ -0,0 +1,6 @@
+from expense_request.indexes import add_indexes
+
+
+def execute():
+    """Composite indexes for existing sites; new installs get them from on_doctype_update"""
+    add_indexes()
@@ -0,0 +1,13 @@
+import frappe
+
+
+def execute():
+    """Fingerprint existing expense items in the background"""
+    frappe.enqueue(
+        "expense_request.duplicates.run_backfill",
+        queue="long",
+        timeout=4 * 60 * 60,
+        job_id="expense_request::backfill_fingerprints",
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
@@ -0,0 +1,49 @@
+import frappe
+from frappe.utils import now_datetime
+
+
+def execute():
+    """Seed the Expense Journal Link registry from existing Journal Entries"""
+
+    # Per-entry JEs carry the Expense Entry name in bill_no; consolidated JEs
+    # are linked from the Expense Entry itself
+    rows = frappe.db.sql(
+        """
+        select ee.name, je.name
+        from `tabExpense Entry` ee
+        inner join `tabJournal Entry` je
+            on je.bill_no = ee.name and je.docstatus = 1
+        union
+        select ee.name, ee.journal_entry
+        from `tabExpense Entry` ee
+        inner join `tabJournal Entry` je
+            on je.name = ee.journal_entry and je.docstatus = 1
+        """
+    )
+
+    timestamp = now_datetime()
+    values = []
+    seen = set()
+    for expense_entry, journal_entry in rows:
+        if expense_entry in seen:
+            continue
+        seen.add(expense_entry)
+        values.append(
+            (expense_entry, expense_entry, journal_entry, timestamp, timestamp, "Administrator", "Administrator")
+        )
+
+    frappe.db.bulk_insert(
+        "Expense Journal Link",
+        fields=["name", "expense_entry", "journal_entry", "creation", "modified", "owner", "modified_by"],
+        values=values,
+        ignore_duplicates=True,
+    )
+
+    frappe.db.sql(
+        """
+        update `tabExpense Entry` ee
+        inner join `tabExpense Journal Link` link on link.name = ee.name
+        set ee.journal_entry = link.journal_entry, ee.posting_status = 'Posted'
+        where ifnull(ee.journal_entry, '') = ''
+        """
+    )
@@ -0,0 +1,11 @@
+import frappe
+
+from expense_request.accounting_dimensions_handler import reconcile_dimension_fields
+
+
+def execute():
+    """Index the accounting dimension custom fields created before they were
+    created with search_index"""
+
+    reconcile_dimension_fields()
+    frappe.db.commit()
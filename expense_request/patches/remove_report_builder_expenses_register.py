@@ -0,0 +1,8 @@
+import frappe
+
+
+def execute():
+    """The Report Builder version of Expenses Register is replaced by a standard Script Report"""
+
+    if frappe.db.get_value("Report", "Expenses Register", "report_type") == "Report Builder":
+        frappe.delete_doc("Report", "Expenses Register", force=True, ignore_permissions=True)
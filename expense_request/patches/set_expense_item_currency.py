@@ -0,0 +1,17 @@
+import frappe
+
+
+def execute():
+    """Items saved before multi-currency support are in company currency"""
+    frappe.db.sql(
+        """
+        update `tabExpense Entry Item` item
+        inner join `tabExpense Entry` entry on entry.name = item.parent
+        inner join `tabCompany` company on company.name = entry.company
+        set item.currency = company.default_currency,
+            item.exchange_rate = 1,
+            item.base_amount = item.amount
+        where item.parenttype = 'Expense Entry'
+            and ifnull(item.currency, '') = ''
+        """
+    )
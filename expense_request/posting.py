@@ -0,0 +1,188 @@
+# posting.py
+# Queue-based Journal Entry posting for approved Expense Entries
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, now_datetime
+
+from expense_request.api import create_journal_entry
+from expense_request.instrumentation import instrument
+from expense_request.journal_registry import AlreadyPostedError, get_journal_entry
+
+MAX_POSTING_ATTEMPTS = 5
+POSTING_BACKOFF_MINUTES = 2
+MAX_POSTING_BACKOFF_MINUTES = 6 * 60
+STALE_QUEUE_MINUTES = 30
+
+
+def get_posting_job_id(expense_entry_name):
+    """Idempotency key for an entry's posting job"""
+    return f"expense_entry_posting::{expense_entry_name}"
+
+
+def get_stale_after():
+    """When a queued or in-progress posting is taken to be lost and enqueued again"""
+    return add_to_date(now_datetime(), minutes=STALE_QUEUE_MINUTES)
+
+
+def queue_journal_entry(expense_entry, reset=False):
+    """Mark the entry as queued for posting and enqueue the posting worker.
+
+    Entries that are already queued, in progress or posted are left alone, so
+    repeated saves never enqueue a second posting. `reset` clears the retry
+    counter for a manual re-post of a failed entry.
+    """
+
+    if expense_entry.journal_entry or expense_entry.posting_status == "Posted":
+        return
+
+    if expense_entry.posting_status in ("Queued", "Posting") and not reset:
+        return
+
+    values = {
+        "posting_status": "Queued",
+        "posting_error": None,
+        "next_posting_attempt": get_stale_after(),
+    }
+    if reset:
+        values["posting_attempts"] = 0
+
+    expense_entry.db_set(values, notify=True)
+    enqueue_posting(expense_entry.name)
+
+
+def enqueue_posting(expense_entry_name):
+    frappe.enqueue(
+        "expense_request.posting.post_expense_entry",
+        queue="short",
+        enqueue_after_commit=True,
+        job_id=get_posting_job_id(expense_entry_name),
+        deduplicate=True,
+        expense_entry_name=expense_entry_name,
+    )
+
+
+@instrument("post_expense_entry")
+def post_expense_entry(expense_entry_name):
+    """Worker: build and submit the Journal Entry for a queued Expense Entry.
+
+    Failures are rolled back, recorded on the entry and retried with
+    exponential backoff by retry_failed_postings.
+    """
+
+    expense_entry = frappe.get_doc("Expense Entry", expense_entry_name)
+
+    if expense_entry.docstatus != 1 or expense_entry.status != "Approved":
+        return
+
+    if expense_entry.journal_entry or expense_entry.posting_status == "Posted":
+        return
+
+    # A previous attempt may have posted and died before recording it
+    existing = get_journal_entry(expense_entry.name)
+    if existing:
+        mark_posted(expense_entry, existing)
+        frappe.db.commit()
+        return existing
+
+    try:
+        expense_entry.db_set(
+            {"posting_status": "Posting", "next_posting_attempt": get_stale_after()},
+            update_modified=False,
+        )
+        journal_entry = create_journal_entry(expense_entry)
+        mark_posted(expense_entry, journal_entry)
+        frappe.db.commit()
+        return journal_entry
+
+    except AlreadyPostedError:
+        # Another worker won the race; adopt its Journal Entry once committed
+        frappe.db.rollback()
+        frappe.clear_messages()
+        existing = get_journal_entry(expense_entry.name)
+        if existing:
+            mark_posted(expense_entry, existing)
+            frappe.db.commit()
+        return existing
+
+    except Exception as e:
+        frappe.db.rollback()
+        mark_failed(expense_entry_name, e)
+        frappe.db.commit()
+
+
+def mark_posted(expense_entry, journal_entry):
+    expense_entry.db_set(
+        {
+            "journal_entry": journal_entry,
+            "posting_status": "Posted",
+            "posting_error": None,
+            "next_posting_attempt": None,
+        },
+        notify=True,
+    )
+
+
+def mark_failed(expense_entry_name, error):
+    """Record the failure and schedule the next attempt with backoff"""
+
+    attempts = (
+        frappe.db.get_value("Expense Entry", expense_entry_name, "posting_attempts") or 0
+    ) + 1
+
+    next_attempt = None
+    if attempts < MAX_POSTING_ATTEMPTS:
+        delay = min(
+            POSTING_BACKOFF_MINUTES * (2 ** (attempts - 1)), MAX_POSTING_BACKOFF_MINUTES
+        )
+        next_attempt = add_to_date(now_datetime(), minutes=delay)
+
+    frappe.db.set_value(
+        "Expense Entry",
+        expense_entry_name,
+        {
+            "posting_status": "Failed",
+            "posting_attempts": attempts,
+            "posting_error": frappe.utils.strip_html(str(error))[:1000],
+            "next_posting_attempt": next_attempt,
+        },
+        update_modified=False,
+    )
+    frappe.clear_messages()
+    frappe.log_error(
+        title=_("Expense Entry {0} posting failed").format(expense_entry_name),
+        message=frappe.get_traceback(),
+        reference_doctype="Expense Entry",
+        reference_name=expense_entry_name,
+    )
+
+
+def retry_failed_postings():
+    """Scheduler: re-enqueue failed entries that are due and stale queued ones.
+
+    next_posting_attempt is the backoff deadline of a Failed entry and the
+    stale deadline of a Queued or Posting one; exhausted entries have none.
+    Posting status writes leave `modified` alone, so it can't be used here.
+    """
+
+    due = frappe.get_all(
+        "Expense Entry",
+        filters={
+            "docstatus": 1,
+            "posting_status": ["in", ["Queued", "Posting", "Failed"]],
+            "next_posting_attempt": ["<=", now_datetime()],
+        },
+        pluck="name",
+    )
+    if not due:
+        return
+
+    frappe.db.set_value(
+        "Expense Entry",
+        {"name": ["in", due]},
+        {"posting_status": "Queued", "next_posting_attempt": get_stale_after()},
+        update_modified=False,
+    )
+
+    for name in due:
+        enqueue_posting(name)
@@ -0,0 +1,306 @@
+# reconciliation.py
+# Set-based checks of approved Expense Entries against their Journal Entries
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, now_datetime
+
+from expense_request.api import is_consolidation_enabled
+from expense_request.journal_registry import REGISTRY_DOCTYPE
+from expense_request.posting import STALE_QUEUE_MINUTES, enqueue_posting, get_stale_after
+
+REPAIR_BATCH_SIZE = 500
+RECONCILIATION_CACHE_KEY = "expense_request:journal_reconciliation"
+
+# Rows kept per discrepancy type in the stored run summary
+MAX_SUMMARY_ROWS = 100
+
+# Consolidated entries wait for the next daily run before they are missing
+CONSOLIDATION_GRACE_MINUTES = 2 * 24 * 60
+
+MISSING = "Missing Journal Entry"
+MISMATCHED = "Amount Mismatch"
+ORPHAN = "Orphan Journal Entry"
+
+
+def get_grace_cutoff():
+    minutes = (
+        CONSOLIDATION_GRACE_MINUTES if is_consolidation_enabled() else STALE_QUEUE_MINUTES
+    )
+    return add_to_date(now_datetime(), minutes=-minutes)
+
+
+def get_company_condition(alias, company):
+    return f"and {alias}.company = %(company)s" if company else ""
+
+
+# ---- checks ----
+
+
+def get_missing_journal_entries(company=None):
+    """Approved entries without a submitted Journal Entry, past the time the
+    posting queue or the daily consolidation should have posted them.
+
+    Entries whose Journal Entry was cancelled on purpose are not missing.
+    `registered` and `journal_entry_docstatus` tell a posting claim still in
+    progress apart from a registry row left by a draft or deleted Journal Entry.
+    """
+
+    return frappe.db.sql(
+        f"""
+        select entry.name as expense_entry, entry.company, entry.total,
+            entry.posting_status, entry.posting_attempts, entry.posting_error,
+            if(link.name is null, 0, 1) as registered, link.journal_entry,
+            je.docstatus as journal_entry_docstatus
+        from `tabExpense Entry` entry
+        left join `tab{REGISTRY_DOCTYPE}` link on link.name = entry.name
+        left join `tabJournal Entry` je on je.name = link.journal_entry
+        where entry.docstatus = 1
+            and entry.status = 'Approved'
+            and entry.modified < %(cutoff)s
+            and ifnull(entry.posting_status, '') != 'Cancelled'
+            and ifnull(je.docstatus, 0) != 1
+            {get_company_condition("entry", company)}
+        order by entry.name
+        """,
+        {"cutoff": get_grace_cutoff(), "company": company},
+        as_dict=True,
+    )
+
+
+def get_mismatched_journal_entries(company=None):
+    """Posted entries whose Journal Entry amount differs from the entry total.
+
+    Per-entry Journal Entries are compared on total_debit, consolidated ones
+    on the entry's row in their expense_entries table.
+    """
+
+    return frappe.db.sql(
+        f"""
+        select entry.name as expense_entry, entry.company, entry.total,
+            je.name as journal_entry,
+            coalesce(ref.amount, je.total_debit) as journal_amount
+        from `tabExpense Entry` entry
+        inner join `tab{REGISTRY_DOCTYPE}` link on link.name = entry.name
+        inner join `tabJournal Entry` je
+            on je.name = link.journal_entry and je.docstatus = 1
+        left join `tabExpense Entry Journal Reference` ref
+            on ref.parent = je.name and ref.parenttype = 'Journal Entry'
+            and ref.expense_entry = entry.name
+        where entry.docstatus = 1
+            and abs(coalesce(ref.amount, je.total_debit) - entry.total) >= 0.005
+            {get_company_condition("entry", company)}
+        order by entry.name
+        """,
+        {"company": company},
+        as_dict=True,
+    )
+
+
+def get_orphan_journal_entries(company=None):
+    """Submitted Journal Entries posted for Expense Entries that no longer back them.
+
+    Either the registry points at the Journal Entry but the entry is cancelled
+    or gone, or the Journal Entry names an entry in bill_no without being
+    registered, in which case `registered` says whether the entry already has
+    another Journal Entry. The bill_no join uses the index added in indexes.py.
+    """
+
+    return frappe.db.sql(
+        f"""
+        select link.name as expense_entry, je.company, je.name as journal_entry,
+            je.total_debit as journal_amount, 1 as registered
+        from `tab{REGISTRY_DOCTYPE}` link
+        inner join `tabJournal Entry` je
+            on je.name = link.journal_entry and je.docstatus = 1
+        left join `tabExpense Entry` entry
+            on entry.name = link.name and entry.docstatus = 1
+        where entry.name is null
+            {get_company_condition("je", company)}
+        union all
+        select je.bill_no as expense_entry, je.company, je.name as journal_entry,
+            je.total_debit as journal_amount,
+            if(other.name is null, 0, 1) as registered
+        from `tabJournal Entry` je
+        inner join `tabExpense Entry` entry
+            on entry.name = je.bill_no and entry.docstatus = 1
+        left join `tab{REGISTRY_DOCTYPE}` link on link.journal_entry = je.name
+        left join `tab{REGISTRY_DOCTYPE}` other on other.name = entry.name
+        where je.docstatus = 1
+            and link.name is null
+            {get_company_condition("je", company)}
+        order by expense_entry
+        """,
+        {"company": company},
+        as_dict=True,
+    )
+
+
+def get_discrepancies(company=None):
+    return {
+        MISSING: get_missing_journal_entries(company),
+        MISMATCHED: get_mismatched_journal_entries(company),
+        ORPHAN: get_orphan_journal_entries(company),
+    }
+
+
+# ---- job ----
+
+
+@frappe.whitelist()
+def reconcile_expense_journal_entries(company=None):
+    """Queue a reconciliation run"""
+    frappe.only_for(["System Manager", "Accounts Manager"])
+    frappe.enqueue(
+        "expense_request.reconciliation.reconcile",
+        queue="long",
+        timeout=3600,
+        job_id="expense_request::reconcile_journal_entries",
+        deduplicate=True,
+        company=company,
+    )
+    return {"message": _("Expense Journal Entry reconciliation has been queued")}
+
+
+def reconcile_daily():
+    """Scheduler: repair what can be repaired and record the rest"""
+    reconcile()
+
+
+def reconcile(company=None, repair=True):
+    """Find discrepancies, repair them in batches and store a run summary.
+
+    Unregistered Journal Entries for entries without one are adopted before
+    missing entries are re-queued, so an entry is never posted twice.
+    Mismatched amounts and remaining orphans need a person and are only
+    reported.
+    """
+
+    repaired = {"adopted": 0, "requeued": 0}
+    if repair:
+        repaired["adopted"] = adopt_journal_entries(
+            [row for row in get_orphan_journal_entries(company) if not row.registered]
+        )
+        repaired["requeued"] = requeue_missing_entries(
+            get_missing_journal_entries(company)
+        )
+
+    summary = get_run_summary(get_discrepancies(company), repaired)
+    frappe.cache().set_value(RECONCILIATION_CACHE_KEY, summary)
+    frappe.logger("expense_request.reconciliation").info(
+        {"counts": summary["counts"], "repaired": repaired}
+    )
+    return summary
+
+
+def get_run_summary(discrepancies, repaired):
+    """Counts per type with the first rows of each, small enough for the cache"""
+    return {
+        "run_on": str(now_datetime()),
+        "repaired": repaired,
+        "counts": {kind: len(rows) for kind, rows in discrepancies.items()},
+        "rows": {kind: rows[:MAX_SUMMARY_ROWS] for kind, rows in discrepancies.items()},
+    }
+
+
+def get_last_run():
+    return frappe.cache().get_value(RECONCILIATION_CACHE_KEY)
+
+
+def chunk(rows, size=REPAIR_BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def adopt_journal_entries(orphans):
+    """Register Journal Entries that were posted for an entry but never
+    recorded, one batch per transaction"""
+
+    timestamp = now_datetime()
+    adopted = 0
+    for batch in chunk(orphans):
+        # one Journal Entry per entry; later ones stay orphans for review
+        journal_entries = {}
+        for row in batch:
+            journal_entries.setdefault(row.expense_entry, row.journal_entry)
+
+        frappe.db.bulk_insert(
+            REGISTRY_DOCTYPE,
+            fields=["name", "expense_entry", "journal_entry", "creation", "modified", "owner", "modified_by"],
+            values=[
+                (name, name, journal_entry, timestamp, timestamp, "Administrator", "Administrator")
+                for name, journal_entry in journal_entries.items()
+            ],
+            ignore_duplicates=True,
+        )
+        frappe.db.sql(
+            f"""
+            update `tabExpense Entry` entry
+            inner join `tab{REGISTRY_DOCTYPE}` link on link.name = entry.name
+            set entry.journal_entry = link.journal_entry, entry.posting_status = 'Posted',
+                entry.posting_error = null, entry.next_posting_attempt = null
+            where entry.name in %(names)s
+            """,
+            {"names": list(journal_entries)},
+        )
+        frappe.db.commit()
+        adopted += len(journal_entries)
+
+    return adopted
+
+
+def can_requeue(row):
+    """Whether a missing entry is safe to post again from here.
+
+    Queued, Posting and Failed entries belong to the posting retry job, which
+    re-enqueues stale ones without touching the registry, and cancelled
+    postings are never re-posted. A registry row is only stale when it points
+    at a Journal Entry that is still a draft or was deleted; one without a
+    Journal Entry is a claim whose posting may still be in progress.
+    """
+
+    if row.posting_status in ("Queued", "Posting", "Failed", "Cancelled"):
+        return False
+
+    if not row.registered:
+        return True
+
+    return bool(row.journal_entry) and row.journal_entry_docstatus in (None, 0)
+
+
+def requeue_missing_entries(missing):
+    """Clear stale registry rows and post the entries again, a batch per
+    transaction.
+
+    Exhausted Failed entries keep failing until someone fixes the cause, so
+    like every entry can_requeue skips they are only reported.
+    """
+
+    rows = [row for row in missing if can_requeue(row)]
+    consolidated = is_consolidation_enabled()
+
+    for batch in chunk(rows):
+        names = [row.expense_entry for row in batch]
+        stale = [row.expense_entry for row in batch if row.registered]
+        if stale:
+            frappe.db.delete(REGISTRY_DOCTYPE, {"name": ["in", stale]})
+
+        frappe.db.set_value(
+            "Expense Entry",
+            {"name": ["in", names]},
+            {
+                "journal_entry": None,
+                # the daily consolidation picks up entries without a status
+                "posting_status": None if consolidated else "Queued",
+                "posting_attempts": 0,
+                "posting_error": None,
+                "next_posting_attempt": None if consolidated else get_stale_after(),
+            },
+            update_modified=False,
+        )
+        if not consolidated:
+            for name in names:
+                enqueue_posting(name)
+        frappe.db.commit()
+
+    return len(rows)
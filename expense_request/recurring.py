@@ -0,0 +1,337 @@
+# recurring.py
+# Scheduled generation of Expense Entries from Expense Entry Templates
+
+from collections import Counter
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, add_months, getdate, now_datetime, today
+
+from expense_request import journal_builder
+from expense_request.api import get_accounting_dimensions, set_exchange_rates
+from expense_request.duplicates import get_fingerprint
+
+TEMPLATE_DOCTYPE = "Expense Entry Template"
+
+FREQUENCY_MONTHS = {"Monthly": 1, "Quarterly": 3, "Half-yearly": 6, "Yearly": 12}
+
+# Expense Entry autoname is EXP-.YYYY.-.#####
+NAME_PREFIX = "EXP-{0}-"
+NAME_DIGITS = 5
+
+# Periods one template may catch up on in a single run, after downtime or
+# when a template is created with a start date in the past
+MAX_PERIODS_PER_RUN = 12
+
+# Template items are Expense Entry Items too (parenttype tells them apart);
+# dimension fields are added to this list at run time
+ITEM_FIELDS = [
+    "parent",
+    "idx",
+    "expense_account",
+    "description",
+    "amount",
+    "currency",
+    "exchange_rate",
+    "cost_center",
+    "project",
+]
+
+CORE_DIMENSIONS = [{"fieldname": "cost_center"}, {"fieldname": "project"}]
+
+TEMPLATE_FIELDS = [
+    "name", "company", "payment_to", "mode_of_payment", "remarks", "owner",
+    "frequency", "start_date", "end_date", "next_date",
+    "default_cost_center", "default_project",
+]
+
+
+def get_schedule_date(template, index):
+    """Posting date of the index-th period; months are counted from the start
+    date so month-end schedules don't drift"""
+
+    start_date = getdate(template.start_date)
+    if template.frequency == "Weekly":
+        return add_days(start_date, 7 * index)
+    return getdate(add_months(start_date, FREQUENCY_MONTHS[template.frequency] * index))
+
+
+def get_period_index(template, date):
+    start_date = getdate(template.start_date)
+    date = getdate(date)
+    if template.frequency == "Weekly":
+        return (date - start_date).days // 7
+    months = (date.year - start_date.year) * 12 + date.month - start_date.month
+    return months // FREQUENCY_MONTHS[template.frequency]
+
+
+def get_due_dates(template, as_of):
+    """Posting dates from next_date up to as_of (and end_date), and the next
+    date after them"""
+
+    dates = []
+    index = get_period_index(template, template.next_date)
+    date = getdate(template.next_date)
+    end_date = getdate(template.end_date) if template.end_date else None
+
+    while (
+        date <= as_of
+        and (not end_date or date <= end_date)
+        and len(dates) < MAX_PERIODS_PER_RUN
+    ):
+        dates.append(date)
+        index += 1
+        date = get_schedule_date(template, index)
+
+    return dates, date
+
+
+# ---- generation ----
+
+
+@frappe.whitelist()
+def generate_now():
+    """Queue a generation run for everything due today"""
+    frappe.only_for(["System Manager", "Accounts Manager"])
+    frappe.enqueue(
+        "expense_request.recurring.generate_recurring_entries",
+        queue="long",
+        timeout=3600,
+        job_id="expense_request::generate_recurring_entries",
+        deduplicate=True,
+    )
+    return {"message": _("Recurring Expense Entry generation has been queued")}
+
+
+def generate_recurring_entries(as_of=None):
+    """Scheduler (daily_long): insert every due Expense Entry of every
+    template in one transaction.
+
+    Entries are written with bulk inserts, with totals, company currency
+    amounts, fingerprints and default dimensions already applied, instead of
+    a full save per entry. Each entry records its template and period; periods
+    that already have an entry are skipped, and next_date moves past the
+    generated periods in the same commit, so a rerun never duplicates.
+
+    A template whose entries cannot be built, say for a missing exchange
+    rate, is logged and keeps its next_date, so it is retried the next day
+    without holding back the others. Returns the names of the new entries.
+    """
+
+    as_of = getdate(as_of or today())
+    dimensions = get_accounting_dimensions()
+    templates = frappe.get_all(
+        TEMPLATE_DOCTYPE,
+        filters={"disabled": 0, "next_date": ["<=", as_of]},
+        fields=TEMPLATE_FIELDS + get_default_fieldnames(dimensions),
+        order_by="name asc",
+    )
+    if not templates:
+        return []
+
+    items_by_template = get_template_items(templates, dimensions)
+
+    # templates without items generate nothing and keep their next date, so
+    # their periods are not skipped before items are added
+    templates = [template for template in templates if items_by_template.get(template.name)]
+    if not templates:
+        return []
+
+    periods = {}
+    next_dates = {}
+    for template in templates:
+        periods[template.name], next_dates[template.name] = get_due_dates(template, as_of)
+
+    generated = get_generated_periods(templates)
+
+    entries = []
+    for template in templates:
+        try:
+            entries.extend(
+                make_entry_rows(template, posting_date, items_by_template[template.name], dimensions)
+                for posting_date in periods[template.name]
+                if (template.name, posting_date) not in generated
+            )
+        except Exception:
+            del next_dates[template.name]
+            frappe.clear_messages()
+            frappe.log_error(
+                title=_("Recurring Expense Entries for {0} failed").format(template.name),
+                message=frappe.get_traceback(),
+                reference_doctype=TEMPLATE_DOCTYPE,
+                reference_name=template.name,
+            )
+
+    # names are only taken for entries that were built, so a failed
+    # template leaves no gaps in the series
+    names = reserve_names([entry_row["posting_date"] for entry_row, _rows in entries])
+    entry_rows, item_rows = [], []
+    for name, (entry_row, rows) in zip(names, entries, strict=True):
+        entry_row["name"] = name
+        for row in rows:
+            row["parent"] = name
+        entry_rows.append(entry_row)
+        item_rows.extend(rows)
+
+    if entry_rows:
+        bulk_insert("Expense Entry", entry_rows)
+        bulk_insert("Expense Entry Item", item_rows)
+
+    if next_dates:
+        frappe.db.bulk_update(
+            TEMPLATE_DOCTYPE,
+            {name: {"next_date": next_date} for name, next_date in next_dates.items()},
+            update_modified=False,
+        )
+    frappe.db.commit()
+
+    return names
+
+
+def get_default_fieldnames(dimensions):
+    """default_<dimension> fields the dimension reconciler adds to templates
+    and entries, besides the core default_cost_center and default_project"""
+    return [
+        f"default_{d.fieldname}"
+        for d in dimensions
+        if f"default_{d.fieldname}" not in TEMPLATE_FIELDS
+    ]
+
+
+def get_template_items(templates, dimensions):
+    """{template name: [items]} for all due templates, in one query"""
+
+    items_by_template = {}
+    for item in frappe.get_all(
+        "Expense Entry Item",
+        filters={
+            "parenttype": TEMPLATE_DOCTYPE,
+            "parent": ["in", [template.name for template in templates]],
+        },
+        fields=ITEM_FIELDS + [d.fieldname for d in dimensions if d.fieldname not in ITEM_FIELDS],
+        order_by="parent asc, idx asc",
+    ):
+        items_by_template.setdefault(item.pop("parent"), []).append(item)
+    return items_by_template
+
+
+def get_generated_periods(templates):
+    """{(template, period)} already generated for the templates, in one query"""
+
+    return {
+        (entry.recurring_template, getdate(entry.recurring_period))
+        for entry in frappe.get_all(
+            "Expense Entry",
+            filters={
+                "recurring_template": ["in", [template.name for template in templates]],
+                "recurring_period": [">=", min(getdate(t.next_date) for t in templates)],
+            },
+            fields=["recurring_template", "recurring_period"],
+        )
+    }
+
+
+def reserve_names(posting_dates):
+    """Names for entries with the given posting dates, in order.
+
+    Each posting year's numbers come from its own EXP-YYYY- series, taken
+    as one block per year, so an entry for December generated in January
+    is still named for December.
+    """
+
+    counts = Counter(getdate(posting_date).year for posting_date in posting_dates)
+    numbers = {}
+    # years in order, so concurrent runs lock the series rows in one order
+    for year in sorted(counts):
+        prefix = NAME_PREFIX.format(year)
+        frappe.db.sql(
+            "insert into `tabSeries` (name, current) values (%s, 0) on duplicate key update name = name",
+            (prefix,),
+        )
+        # the row stays locked until commit, so the block is ours
+        frappe.db.sql(
+            "update `tabSeries` set current = current + %s where name = %s",
+            (counts[year], prefix),
+        )
+        last = frappe.db.get_value("Series", prefix, "current", order_by="name")
+        numbers[year] = iter(range(last - counts[year] + 1, last + 1))
+
+    names = []
+    for posting_date in posting_dates:
+        year = getdate(posting_date).year
+        names.append(f"{NAME_PREFIX.format(year)}{next(numbers[year]):0{NAME_DIGITS}d}")
+    return names
+
+
+def make_entry_rows(template, posting_date, template_items, dimensions):
+    """Expense Entry and item rows for one period, ready for bulk insert
+    once the entry is named"""
+
+    items = [frappe._dict(item) for item in template_items]
+    set_exchange_rates(items, template.company, posting_date)
+
+    # default_cost_center and default_project fill the core dimensions here,
+    # as the form does when an entry is keyed in
+    plan = journal_builder.build(template, items, CORE_DIMENSIONS + list(dimensions))
+    for index, values in plan.defaults.items():
+        items[index].update(values)
+
+    entry = {
+        "name": None,
+        "company": template.company,
+        "posting_date": posting_date,
+        "set_posting_time": 1,
+        "required_by": posting_date,
+        "payment_to": template.payment_to,
+        "mode_of_payment": template.mode_of_payment,
+        "remarks": template.remarks,
+        "default_cost_center": template.default_cost_center,
+        "default_project": template.default_project,
+        **{fieldname: template.get(fieldname) for fieldname in get_default_fieldnames(dimensions)},
+        "status": "Pending",
+        "docstatus": 0,
+        "total": journal_builder.to_amount(plan.total),
+        "quantity": plan.quantity,
+        "posting_attempts": 0,
+        "recurring_template": template.name,
+        "recurring_period": posting_date,
+        "owner": template.owner,
+    }
+
+    rows = []
+    for index, (item, base_amount) in enumerate(zip(items, plan.base_amounts, strict=True), start=1):
+        item.pop("idx", None)
+        rows.append(
+            {
+                **item,
+                "name": frappe.generate_hash(length=10),
+                "parent": None,
+                "parenttype": "Expense Entry",
+                "parentfield": "expenses",
+                "idx": index,
+                "base_amount": journal_builder.to_amount(base_amount),
+                "fingerprint": get_fingerprint(
+                    template.payment_to,
+                    item.amount,
+                    item.currency,
+                    item.expense_account,
+                    item.description,
+                ),
+                "owner": template.owner,
+            }
+        )
+
+    return entry, rows
+
+
+def bulk_insert(doctype, rows):
+    timestamp = now_datetime()
+    fields = [*rows[0], "creation", "modified", "modified_by"]
+    frappe.db.bulk_insert(
+        doctype,
+        fields=fields,
+        values=[
+            [row.get(field) for field in fields[:-3]] + [timestamp, timestamp, row["owner"]]
+            for row in rows
+        ],
+    )
@@ -0,0 +1,177 @@
+# summary.py
+# Incrementally maintained Expense Summary table for dashboards and reports
+
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.utils import flt, get_first_day, getdate, now_datetime
+
+from expense_request.api import get_accounting_dimensions
+
+SUMMARY_DOCTYPE = "Expense Summary"
+CORE_KEY_FIELDS = ["expense_account", "cost_center", "project"]
+
+
+def on_submit(expense_entry, method):
+    """Expense Entry on_submit (approval): add the entry's lines to the summary"""
+    apply_entry_delta(expense_entry, 1)
+
+
+def on_cancel(expense_entry, method):
+    """Expense Entry on_cancel: remove the entry's lines from the summary.
+
+    Amendments are covered too, since an amended entry is cancelled first and
+    the amendment is added when it is approved.
+    """
+    apply_entry_delta(expense_entry, -1)
+
+
+def get_key_fields():
+    """Item fields that make up a summary row key, including dynamic dimensions"""
+
+    item_meta = frappe.get_meta("Expense Entry Item")
+    summary_meta = frappe.get_meta(SUMMARY_DOCTYPE)
+
+    fields = list(CORE_KEY_FIELDS)
+    for dimension in get_accounting_dimensions():
+        fieldname = dimension.fieldname
+        if (
+            fieldname not in fields
+            and item_meta.has_field(fieldname)
+            and summary_meta.has_field(fieldname)
+        ):
+            fields.append(fieldname)
+    return fields
+
+
+def get_summary_name(company, month, key_values):
+    """Deterministic row name, so every writer of a key upserts the same row"""
+    parts = [company or "", str(month)] + [value or "" for value in key_values]
+    return hashlib.md5("\x1f".join(parts).encode()).hexdigest()
+
+
+def apply_entry_delta(expense_entry, sign):
+    if expense_entry.status != "Approved" and sign > 0:
+        return
+
+    key_fields = get_key_fields()
+    month = get_first_day(getdate(expense_entry.posting_date))
+
+    deltas = {}
+    for item in expense_entry.expenses:
+        key_values = tuple(item.get(fieldname) or None for fieldname in key_fields)
+        amount, lines, _entries = deltas.get(key_values, (0, 0, 1))
+        deltas[key_values] = (amount + flt(item.base_amount), lines + 1, 1)
+
+    if deltas:
+        upsert_summary_rows(expense_entry.company, month, key_fields, deltas, sign)
+
+
+def upsert_summary_rows(company, month, key_fields, deltas, sign):
+    """Add deltas to summary rows atomically, creating missing rows.
+
+    `deltas` maps key values to (amount, line count, entry count).
+    """
+
+    timestamp = now_datetime()
+    user = frappe.session.user
+    columns = ["name", "company", "month", *key_fields, "amount", "line_count", "entry_count"]
+    columns += ["creation", "modified", "owner", "modified_by"]
+
+    rows = []
+    for key_values, (amount, lines, entries) in deltas.items():
+        rows.append(
+            (
+                get_summary_name(company, month, key_values),
+                company,
+                month,
+                *key_values,
+                sign * flt(amount, 2),
+                sign * lines,
+                sign * entries,
+                timestamp,
+                timestamp,
+                user,
+                user,
+            )
+        )
+
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(rows))
+    frappe.db.sql(
+        f"""
+        insert into `tab{SUMMARY_DOCTYPE}` ({", ".join(f"`{c}`" for c in columns)})
+        values {placeholders}
+        on duplicate key update
+            amount = amount + values(amount),
+            line_count = line_count + values(line_count),
+            entry_count = entry_count + values(entry_count),
+            modified = values(modified)
+        """,
+        [value for row in rows for value in row],
+    )
+
+
+@frappe.whitelist()
+def rebuild_expense_summary(company=None):
+    """Queue a full rebuild of the summary table, e.g. after adding a dimension"""
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "expense_request.summary.rebuild_summary",
+        queue="long",
+        timeout=3600,
+        company=company,
+    )
+    return {"message": _("Expense Summary rebuild has been queued")}
+
+
+def rebuild_summary(company=None):
+    """Recompute summary rows from submitted entries.
+
+    The totals are grouped in SQL and written with upsert_summary_rows, the
+    same writer the submit and cancel hooks use.
+    """
+
+    key_fields = get_key_fields()
+    frappe.db.delete(SUMMARY_DOCTYPE, {"company": company} if company else {})
+
+    deltas = {}
+    for row in get_summary_totals(key_fields, company):
+        key_values = tuple(row.get(fieldname) for fieldname in key_fields)
+        deltas.setdefault((row.company, getdate(row.month)), {})[key_values] = (
+            row.amount,
+            row.line_count,
+            row.entry_count,
+        )
+
+    for (row_company, month), month_deltas in deltas.items():
+        upsert_summary_rows(row_company, month, key_fields, month_deltas, 1)
+
+    frappe.db.commit()
+
+
+def get_summary_totals(key_fields, company=None):
+    """Approved entry lines per (company, month, key fields); empty key values
+    group with nulls, as they do in apply_entry_delta"""
+
+    month = "date_format(entry.posting_date, '%%Y-%%m-01')"
+    key_columns = [f"nullif(item.`{f}`, '')" for f in key_fields]
+    select_columns = ", ".join(
+        f"{column} as `{f}`" for column, f in zip(key_columns, key_fields, strict=True)
+    )
+
+    return frappe.db.sql(
+        f"""
+        select entry.company as company, {month} as month, {select_columns},
+            sum(item.base_amount) as amount, count(*) as line_count,
+            count(distinct entry.name) as entry_count
+        from `tabExpense Entry` entry
+        inner join `tabExpense Entry Item` item
+            on item.parent = entry.name and item.parenttype = 'Expense Entry'
+        where entry.docstatus = 1 and entry.status = 'Approved'
+            {"and entry.company = %(company)s" if company else ""}
+        group by entry.company, {month}, {", ".join(key_columns)}
+        """,
+        {"company": company},
+        as_dict=True,
+    )
@@ -0,0 +1,164 @@
+# validation.py
+# Set-based link validation for Expense Entries and their items
+
+import frappe
+from frappe import _
+
+# Item link fields that must point at ledgers rather than groups
+LEDGER_FIELDS = {"expense_account", "cost_center", "default_cost_center"}
+
+# Links that record where the entry came from; disabling the referenced
+# record must not stop the entry from being saved or approved
+REFERENCE_FIELDS = {"amended_from", "recurring_template"}
+
+
+def validate_expense_links(expense_entry):
+    """Validate every link on the entry and its items in one query per doctype.
+
+    Replaces Frappe's per-row, per-field link check. Errors for all rows are
+    collected and raised together.
+    """
+
+    errors = get_link_errors(expense_entry)
+    if errors:
+        frappe.throw(
+            errors,
+            title=_("Invalid Links"),
+            exc=frappe.LinkValidationError,
+            as_list=True,
+        )
+
+
+def get_link_errors(expense_entry):
+    parent_fields = get_link_fields(expense_entry.doctype)
+    item_fields = get_link_fields("Expense Entry Item")
+
+    # Collect the distinct values per linked doctype across all rows
+    values_by_doctype = {}
+    for doc, link_fields in iter_docs(expense_entry, parent_fields, item_fields):
+        for fieldname, doctype in link_fields.items():
+            value = doc.get(fieldname)
+            if value:
+                values_by_doctype.setdefault(doctype, set()).add(value)
+
+    records = get_link_records(values_by_doctype)
+    company_currency = (
+        frappe.get_cached_value("Company", expense_entry.company, "default_currency")
+        if expense_entry.company and "Account" in records
+        else None
+    )
+
+    errors = []
+    for doc, link_fields in iter_docs(expense_entry, parent_fields, item_fields):
+        for fieldname, doctype in link_fields.items():
+            value = doc.get(fieldname)
+            if not value:
+                continue
+
+            # names match case-insensitively in SQL; store the record's own
+            # spelling, as Frappe's link validation does
+            record = records[doctype].get(value.casefold())
+            if record and record.name != value:
+                doc.set(fieldname, record.name)
+
+            error = get_link_error(
+                fieldname,
+                doctype,
+                value,
+                record,
+                expense_entry.company,
+                company_currency,
+            )
+            if error:
+                label = doc.meta.get_label(fieldname)
+                prefix = _("Row {0}: ").format(doc.idx) if doc.parentfield else ""
+                errors.append(f"{prefix}{label}: {error}")
+
+    return errors
+
+
+def iter_docs(expense_entry, parent_fields, item_fields):
+    yield expense_entry, parent_fields
+    for item in expense_entry.get("expenses") or []:
+        yield item, item_fields
+
+
+def get_link_fields(doctype):
+    """{fieldname: linked doctype} for all Link fields, including custom dimensions"""
+    return {df.fieldname: df.options for df in frappe.get_meta(doctype).get_link_fields()}
+
+
+def get_link_records(values_by_doctype):
+    """Load the referenced records with one IN query per doctype, keyed by
+    their casefolded name"""
+
+    records = {}
+    for doctype, values in values_by_doctype.items():
+        meta = frappe.get_meta(doctype)
+        if meta.issingle:
+            records[doctype] = {doctype.casefold(): frappe._dict(name=doctype)}
+            continue
+
+        fields = ["name"]
+        for fieldname in ("company", "is_group", "root_type", "account_currency", "disabled"):
+            if meta.has_field(fieldname):
+                fields.append(fieldname)
+        if meta.is_submittable:
+            fields.append("docstatus")
+
+        records[doctype] = {
+            record.name.casefold(): record
+            for record in frappe.get_all(
+                doctype, filters={"name": ["in", list(values)]}, fields=fields
+            )
+        }
+
+    return records
+
+
+def get_link_error(fieldname, doctype, value, record, company=None, company_currency=None):
+    """Reason a linked record can't be used on an Expense Entry, if any"""
+
+    if record is None:
+        return _("{0} {1} does not exist").format(_(doctype), value)
+
+    if record.get("docstatus") == 2 and fieldname != "amended_from":
+        return _("{0} {1} is cancelled").format(_(doctype), value)
+
+    if record.get("disabled") and fieldname not in REFERENCE_FIELDS:
+        return _("{0} {1} is disabled").format(_(doctype), value)
+
+    if company and record.get("company") and record.company != company:
+        return _("{0} {1} does not belong to company {2}").format(_(doctype), value, company)
+
+    if fieldname in LEDGER_FIELDS and record.get("is_group"):
+        return _("{0} {1} is a group; select a ledger").format(_(doctype), value)
+
+    if fieldname == "expense_account" and record.get("root_type") != "Expense":
+        return _("Account {0} is not an Expense account").format(value)
+
+    if fieldname == "expense_account":
+        return get_currency_error(value, record.get("account_currency"), company_currency)
+
+
+def get_currency_error(account, account_currency, company_currency):
+    """Expense Journal Entries carry company currency amounts; an account in
+    another currency would have them converted again"""
+
+    if account_currency and company_currency and account_currency != company_currency:
+        return _(
+            "Account {0} is in {1}, but expenses are posted in the company currency {2}"
+        ).format(account, account_currency, company_currency)
+
+
+def validate_account_currency(account, company):
+    """Throw unless the account is in the company currency; both values come
+    from the document cache"""
+
+    error = get_currency_error(
+        account,
+        frappe.get_cached_value("Account", account, "account_currency"),
+        frappe.get_cached_value("Company", company, "default_currency"),
+    )
+    if error:
+        frappe.throw(error, title=_("Account Currency"))
@@ -0,0 +1,982 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+"""In-memory stand-in for the part of ``frappe`` used by this app.
+
+Lets the hooks in ``api.py``, ``posting.py`` and
+``accounting_dimensions_handler.py`` run under plain pytest, without a bench,
+MariaDB or Redis, and counts every call that would hit the database so tests
+can assert query budgets.
+
+Counting follows Frappe's shape rather than its exact SQL: ``get_all``,
+``db.exists``, ``db.get_value`` and ``db.set_value`` are one query each;
+``get_doc`` is one query plus one per child table; ``insert`` is one query
+plus one per child row; ``create_custom_field`` is an insert plus a schema
+change and a meta cache clear, which are recorded separately.
+
+Call ``install()`` before importing app modules; it is a no-op when the
+real frappe is importable.
+"""
+
+import calendar
+import datetime
+import fnmatch
+import html
+import importlib
+import json
+import logging
+import os
+import re
+import sys
+import traceback
+import types
+import uuid
+from contextlib import contextmanager
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "expense_request")
+DOCTYPE_PATH = os.path.join(APP_PATH, "expense_request", "doctype")
+
+# (parent doctype, table fieldname) -> child doctype, for doctypes not
+# described by a JSON file in this app
+EXTRA_TABLE_FIELDS = {
+    "Journal Entry": {"accounts": "Journal Entry Account"},
+    "Mode of Payment": {"accounts": "Mode of Payment Account"},
+}
+
+# Fields of doctypes from other apps that this app reads through get_meta
+EXTRA_FIELDS = {
+    "Account": ["company", "root_type", "account_currency", "is_group", "disabled"],
+    "Cost Center": ["company", "is_group", "disabled"],
+    "Project": ["company"],
+}
+
+
+class _dict(dict):
+    """dict with attribute access, as frappe._dict"""
+
+    __getattr__ = dict.get
+    __setattr__ = dict.__setitem__
+    __delattr__ = dict.__delitem__
+
+    def copy(self):
+        return _dict(dict(self).copy())
+
+
+class ValidationError(Exception):
+    pass
+
+
+class LinkValidationError(ValidationError):
+    pass
+
+
+class DuplicateEntryError(ValidationError):
+    pass
+
+
+class DoesNotExistError(ValidationError):
+    pass
+
+
+class LinkExistsError(ValidationError):
+    pass
+
+
+class PermissionError(Exception):
+    pass
+
+
+# ---- query accounting ----
+
+
+class QueryLog:
+    def __init__(self):
+        self.queries = []
+        self.schema_changes = []
+        self.cache_clears = []
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def add(self, kind, doctype=None):
+        self.queries.append((kind, doctype))
+
+    def for_doctype(self, doctype):
+        return [query for query in self.queries if query[1] == doctype]
+
+    def reset(self):
+        self.queries.clear()
+        self.schema_changes.clear()
+        self.cache_clears.clear()
+
+
+# ---- filters ----
+
+
+def _fold(value):
+    """Strings compare case-insensitively, as in MariaDB's default collation"""
+    return value.casefold() if isinstance(value, str) else value
+
+
+def _compare(value, operator, operand):
+    operator = operator.lower()
+    if operator in ("=", "=="):
+        return _fold(value) == _fold(operand)
+    if operator == "!=":
+        return _fold(value) != _fold(operand)
+    if operator == "in":
+        return _fold(value) in [_fold(item) for item in operand]
+    if operator == "not in":
+        return _fold(value) not in [_fold(item) for item in operand]
+    if operator == "is":
+        return bool(value) if operand == "set" else not value
+    if operator == "like":
+        return fnmatch.fnmatch(str(value or ""), str(operand).replace("%", "*"))
+    if value is None:
+        return False
+    if operator == "<":
+        return value < operand
+    if operator == "<=":
+        return value <= operand
+    if operator == ">":
+        return value > operand
+    if operator == ">=":
+        return value >= operand
+    raise NotImplementedError(operator)
+
+
+def _normalise_filters(filters):
+    if not filters:
+        return []
+    if isinstance(filters, str):
+        return [("name", "=", filters)]
+    if isinstance(filters, dict):
+        conditions = []
+        for fieldname, value in filters.items():
+            if isinstance(value, (list, tuple)):
+                operator, operand = value[0], value[1]
+                if operator == "is":
+                    operand = "set" if operand == "set" else "not set"
+                conditions.append((fieldname, operator, operand))
+            else:
+                conditions.append((fieldname, "=", value))
+        return conditions
+    return [tuple(condition[-3:]) for condition in filters]
+
+
+def _matches(row, conditions):
+    return all(_compare(row.get(f), op, operand) for f, op, operand in conditions)
+
+
+# ---- meta ----
+
+
+class Meta:
+    def __init__(self, doctype, fields=None, istable=0, issingle=0, is_submittable=0):
+        self.name = doctype
+        self.fields = [_dict(df) for df in fields or []]
+        self.istable = istable
+        self.issingle = issingle
+        self.is_submittable = is_submittable
+
+    def has_field(self, fieldname):
+        return any(df.fieldname == fieldname for df in self.fields)
+
+    def get_field(self, fieldname):
+        for df in self.fields:
+            if df.fieldname == fieldname:
+                return df
+
+    def get_label(self, fieldname):
+        df = self.get_field(fieldname)
+        return df.label if df else fieldname
+
+    def get_link_fields(self):
+        return [df for df in self.fields if df.fieldtype == "Link"]
+
+    def get_table_fields(self):
+        return [df for df in self.fields if df.fieldtype == "Table"]
+
+
+def _load_doctype_json(doctype):
+    folder = doctype.lower().replace(" ", "_")
+    path = os.path.join(DOCTYPE_PATH, folder, f"{folder}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+
+
+# ---- documents ----
+
+
+class Document(_dict):
+    """Minimal frappe Document: a _dict with persistence helpers"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        data = dict(args[0]) if args and isinstance(args[0], dict) else {}
+        data.update(kwargs)
+        dict.__setitem__(self, "flags", _dict())
+        for fieldname, value in data.items():
+            self.set(fieldname, value)
+
+    @property
+    def meta(self):
+        return get_meta(self.doctype)
+
+    def set(self, fieldname, value):
+        table = _table_doctype(self.get("doctype"), fieldname)
+        if table and isinstance(value, list):
+            value = [self._make_child(fieldname, table, row, i) for i, row in enumerate(value, 1)]
+        self[fieldname] = value
+
+    def append(self, fieldname, value=None):
+        table = _table_doctype(self.doctype, fieldname)
+        rows = self.setdefault(fieldname, [])
+        child = self._make_child(fieldname, table, value or {}, len(rows) + 1)
+        rows.append(child)
+        return child
+
+    def _make_child(self, fieldname, doctype, row, idx):
+        child = row if isinstance(row, Document) else Document(row)
+        child.update(
+            {
+                "doctype": doctype,
+                "parent": self.get("name"),
+                "parenttype": self.get("doctype"),
+                "parentfield": fieldname,
+                "idx": child.get("idx") or idx,
+            }
+        )
+        return child
+
+    def insert(self, ignore_permissions=None, **kwargs):
+        local.db.insert_doc(self)
+        return self
+
+    def save(self, ignore_permissions=None, **kwargs):
+        local.db.save_doc(self)
+        return self
+
+    def submit(self):
+        self.docstatus = 1
+        local.db.query("submit", self.doctype)
+        local.db.store(self, count=False)
+        return self
+
+    def cancel(self):
+        self.docstatus = 2
+        local.db.query("cancel", self.doctype)
+        local.db.store(self, count=False)
+        return self
+
+    def db_set(self, fieldname, value=None, update_modified=True, notify=False, commit=False):
+        values = fieldname if isinstance(fieldname, dict) else {fieldname: value}
+        self.update(values)
+        local.db.set_value(self.doctype, self.name, values)
+
+    def load_doc_before_save(self):
+        self.flags.doc_before_save = Document(
+            {
+                fieldname: [{k: v for k, v in row.items() if k != "flags"} for row in value]
+                if isinstance(value, list)
+                else value
+                for fieldname, value in self.items()
+                if fieldname != "flags"
+            }
+        )
+
+    def get_doc_before_save(self):
+        return self.flags.get("doc_before_save")
+
+    def check_permission(self, permtype="read"):
+        has_permission(self.doctype, permtype, self, throw=True)
+
+    def has_permission(self, permtype="read"):
+        return has_permission(self.doctype, permtype, self)
+
+    def get_full_path(self):
+        return self.get("full_path")
+
+    def as_dict(self):
+        return _dict(self)
+
+
+def _table_doctype(doctype, fieldname):
+    if not doctype:
+        return None
+    extra = EXTRA_TABLE_FIELDS.get(doctype, {})
+    if fieldname in extra:
+        return extra[fieldname]
+    meta = get_meta(doctype)
+    df = meta.get_field(fieldname)
+    if df and df.fieldtype == "Table":
+        return df.options
+
+
+# ---- database ----
+
+
+class Database:
+    def __init__(self):
+        self.tables = {}
+        self.singles = {}
+        self.log = QueryLog()
+        self.counters = {}
+        self.savepoints = []
+        self.committed = 0
+        self.sql_handlers = []
+
+    # storage helpers (not counted)
+
+    def table(self, doctype):
+        return self.tables.setdefault(doctype, {})
+
+    def add(self, doctype, rows):
+        """Seed records without counting queries"""
+        for row in rows if isinstance(rows, list) else [rows]:
+            self.store(Document(dict(row, doctype=doctype)), count=False)
+
+    def store(self, doc, count=True):
+        self.table(doc.doctype)[doc.name] = doc
+        for fieldname, value in list(doc.items()):
+            if isinstance(value, list) and value and isinstance(value[0], Document):
+                for child in value:
+                    child.parent = doc.name
+                    child.name = child.name or f"{doc.name}-{fieldname}-{child.idx}"
+                    child.docstatus = doc.get("docstatus") or 0
+                    self.table(child.doctype)[child.name] = child
+                    if count:
+                        self.query("insert", child.doctype)
+
+    def autoname(self, doc):
+        prefix = "".join(word[0] for word in doc.doctype.split()).upper()
+        self.counters[doc.doctype] = self.counters.get(doc.doctype, 0) + 1
+        return f"{prefix}-{self.counters[doc.doctype]:05d}"
+
+    def insert_doc(self, doc):
+        doc.name = doc.get("name") or self.autoname(doc)
+        if doc.name in self.table(doc.doctype):
+            raise DuplicateEntryError(doc.doctype, doc.name)
+        doc.setdefault("docstatus", 0)
+        doc.setdefault("owner", local.session.user)
+        self.query("insert", doc.doctype)
+        self.store(doc)
+
+    def save_doc(self, doc):
+        self.query("update", doc.doctype)
+        self.store(doc, count=False)
+
+    # frappe.db API
+
+    def exists(self, doctype, filters=None, cache=False):
+        if isinstance(doctype, dict):
+            filters = {k: v for k, v in doctype.items() if k != "doctype"}
+            doctype = doctype["doctype"]
+        self.query("exists", doctype)
+        if isinstance(filters, str) or filters is None:
+            return filters if filters in self.table(doctype) else None
+        conditions = _normalise_filters(filters)
+        for row in self.table(doctype).values():
+            if _matches(row, conditions):
+                return row.name
+        return None
+
+    def get_value(self, doctype, filters=None, fieldname="name", as_dict=False, cache=False, order_by=None):
+        self.query("get_value", doctype)
+        row = self._first(doctype, filters)
+        if row is None:
+            return None
+        if isinstance(fieldname, (list, tuple)):
+            if as_dict:
+                return _dict({f: row.get(f) for f in fieldname})
+            return tuple(row.get(f) for f in fieldname)
+        return _dict({fieldname: row.get(fieldname)}) if as_dict else row.get(fieldname)
+
+    def get_single_value(self, doctype, fieldname, cache=True):
+        self.query("get_single_value", doctype)
+        return self.singles.get(doctype, {}).get(fieldname)
+
+    def set_single_value(self, doctype, fieldname, value):
+        self.singles.setdefault(doctype, {})[fieldname] = value
+
+    def set_value(self, doctype, filters, fieldname, value=None, update_modified=True):
+        self.query("set_value", doctype)
+        values = fieldname if isinstance(fieldname, dict) else {fieldname: value}
+        conditions = _normalise_filters(filters)
+        for row in self.table(doctype).values():
+            if _matches(row, conditions):
+                row.update(values)
+
+    def delete(self, doctype, filters=None):
+        self.query("delete", doctype)
+        conditions = _normalise_filters(filters)
+        table = self.table(doctype)
+        for name in [name for name, row in table.items() if _matches(row, conditions)]:
+            del table[name]
+
+    def bulk_insert(self, doctype, fields, values, ignore_duplicates=False, chunk_size=10000):
+        self.query("bulk_insert", doctype)
+        table = self.table(doctype)
+        rows = [Document(dict(zip(fields, row, strict=True), doctype=doctype)) for row in values]
+        if not ignore_duplicates and any(row.name in table for row in rows):
+            raise DuplicateEntryError(doctype)
+        for row in rows:
+            table.setdefault(row.name, row)
+
+    def bulk_update(self, doctype, doc_updates, chunk_size=100, modified=None, update_modified=True):
+        self.query("bulk_update", doctype)
+        table = self.table(doctype)
+        for name, values in doc_updates.items():
+            table[name].update(values)
+
+    def updatedb(self, doctype, meta=None):
+        self.log.schema_changes.append(doctype)
+
+    def is_duplicate_entry(self, e):
+        return isinstance(e, DuplicateEntryError)
+
+    def query(self, kind, doctype=None):
+        """Count one query; goes through sql() so wrappers of db.sql see it"""
+        self.sql(f"/* {kind} {doctype} */", _query=(kind, doctype))
+
+    def sql(self, query, values=None, as_dict=False, _query=None, **kwargs):
+        self.log.add(*(_query or ("sql", None)))
+        if _query is None:
+            for pattern, handler in self.sql_handlers:
+                if pattern.search(query):
+                    return handler(query, values)
+        return []
+
+    def on_sql(self, pattern, handler):
+        """Answer raw SQL matching the regex `pattern` with handler(query, values);
+        other raw SQL returns no rows"""
+        self.sql_handlers.append((re.compile(pattern), handler))
+
+    def savepoint(self, save_point):
+        self.savepoints.append(save_point)
+
+    def release_savepoint(self, save_point):
+        pass
+
+    def commit(self):
+        self.committed += 1
+
+    def rollback(self, save_point=None):
+        pass
+
+    def _first(self, doctype, filters):
+        if filters is None:
+            return None
+        if isinstance(filters, str):
+            return self.table(doctype).get(filters)
+        conditions = _normalise_filters(filters)
+        for row in self.table(doctype).values():
+            if _matches(row, conditions):
+                return row
+        return None
+
+    def get_all(self, doctype, filters=None, fields=None, pluck=None, order_by=None, limit=None,
+                or_filters=None, limit_page_length=None, **kwargs):
+        self.query("get_all", doctype)
+        conditions = _normalise_filters(filters)
+        alternatives = _normalise_filters(or_filters)
+        rows = [
+            row
+            for row in self.table(doctype).values()
+            if _matches(row, conditions)
+            and (not alternatives or any(_matches(row, [condition]) for condition in alternatives))
+        ]
+        for clause in reversed((order_by or "").split(",") if order_by else []):
+            fieldname, _, direction = clause.strip().partition(" ")
+            rows.sort(key=lambda row: (row.get(fieldname) is not None, row.get(fieldname) or 0),
+                      reverse=direction.strip().lower() == "desc")
+        limit = limit or limit_page_length
+        if limit:
+            rows = rows[: int(limit)]
+        if pluck:
+            return [row.get(pluck) for row in rows]
+        fields = fields or ["name"]
+        if fields == ["*"]:
+            return [_dict(row) for row in rows]
+        return [_dict({_field_alias(f): row.get(_field_name(f)) for f in fields}) for row in rows]
+
+
+def _field_name(field):
+    return field.split(" as ")[0].strip().strip("`")
+
+
+def _field_alias(field):
+    return field.split(" as ")[-1].strip().strip("`")
+
+
+# ---- cache ----
+
+
+class Cache:
+    def __init__(self):
+        self.data = {}
+
+    def get_value(self, key, generator=None, user=None, expires=False, shared=False):
+        if key not in self.data and generator:
+            self.data[key] = generator()
+        return self.data.get(key)
+
+    def set_value(self, key, val, user=None, expires_in_sec=None, shared=False):
+        self.data[key] = val
+
+    def delete_value(self, keys, user=None, make_keys=True, shared=False):
+        for key in keys if isinstance(keys, (list, tuple)) else [keys]:
+            self.data.pop(key, None)
+
+    def make_key(self, key, user=None, shared=False):
+        return f"{local.site}|{key}"
+
+    def hincrby(self, name, key, amount=1):
+        values = self.data.setdefault(name, {})
+        values[key] = values.get(key, 0) + amount
+        return values[key]
+
+    hincrbyfloat = hincrby
+
+    def hgetall(self, name):
+        return {k.encode(): str(v).encode() for k, v in self.data.get(name, {}).items()}
+
+    def delete(self, *names):
+        for name in names:
+            self.data.pop(name, None)
+
+    def pipeline(self):
+        return _Pipeline(self)
+
+
+class _Pipeline:
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+    def execute(self):
+        return []
+
+
+# ---- frappe module ----
+
+local = types.SimpleNamespace()
+metas = {}
+
+
+def new_site():
+    """Fresh database, cache and request state"""
+    local.site = "test_site"
+    local.db = Database()
+    local.cache = Cache()
+    local.session = _dict(user="Administrator")
+    local.jobs = []
+    local.messages = []
+    local.errors = []
+    local.realtime = []
+    local.outbox = []
+    local.denied = set()
+    local.conf = _dict()
+    metas.clear()
+    new_request()
+    return local.db
+
+
+def new_request():
+    """Drop per-request state (frappe.local attributes) but keep db and cache"""
+    for attribute in list(vars(local)):
+        if attribute not in ("site", "db", "cache", "conf", "session", "jobs", "messages", "errors", "realtime", "outbox", "denied"):
+            delattr(local, attribute)
+    local.flags = _dict()
+
+
+def get_meta(doctype, cached=True):
+    if doctype not in metas:
+        data = _load_doctype_json(doctype) or {}
+        fields = list(data.get("fields", [])) or [
+            _dict(fieldname=fieldname, fieldtype="Data") for fieldname in EXTRA_FIELDS.get(doctype, [])
+        ]
+        metas[doctype] = Meta(
+            doctype,
+            fields,
+            istable=data.get("istable", 0),
+            issingle=data.get("issingle", 0),
+            is_submittable=data.get("is_submittable", 0),
+        )
+    meta = metas[doctype]
+    custom_fields = local.db.table("Custom Field").values() if hasattr(local, "db") else []
+    for custom_field in custom_fields:
+        if custom_field.dt == doctype and not meta.has_field(custom_field.fieldname):
+            meta.fields.append(_dict(custom_field))
+    return meta
+
+
+def get_doc(*args, **kwargs):
+    if args and isinstance(args[0], dict):
+        return Document(args[0])
+    if kwargs and not args:
+        return Document(kwargs)
+
+    doctype, name = args[0], args[1] if len(args) > 1 else args[0]
+    if isinstance(name, dict):
+        row = local.db._first(doctype, name)
+        name = row.name if row else None
+
+    local.db.query("get_doc", doctype)
+    row = local.db.table(doctype).get(name)
+    if row is None:
+        raise DoesNotExistError(f"{doctype} {name} not found")
+
+    for df in get_meta(doctype).get_table_fields():
+        local.db.query("get_doc", df.options)
+    return row
+
+
+def get_cached_doc(*args, **kwargs):
+    return get_doc(*args, **kwargs)
+
+
+def get_cached_value(doctype, name, fieldname="name", as_dict=False):
+    """Document cache: the first read of a record is a query, later ones are not"""
+    key = ("document_cache", doctype, name)
+    if key not in local.cache.data:
+        local.db.query("get_value", doctype)
+        local.cache.data[key] = local.db.table(doctype).get(name)
+    row = local.cache.data[key]
+    if row is None:
+        return None
+    if isinstance(fieldname, (list, tuple)):
+        return _dict({f: row.get(f) for f in fieldname}) if as_dict else [row.get(f) for f in fieldname]
+    return row.get(fieldname)
+
+
+def new_doc(doctype):
+    return Document(doctype=doctype)
+
+
+def delete_doc(doctype, name=None, force=False, ignore_permissions=False, **kwargs):
+    local.db.delete(doctype, {"name": name})
+
+
+def get_all(doctype, *args, **kwargs):
+    if args:
+        kwargs["filters"] = args[0]
+    return local.db.get_all(doctype, **kwargs)
+
+
+def get_list(doctype, *args, **kwargs):
+    return get_all(doctype, *args, **kwargs)
+
+
+def throw(msg, exc=ValidationError, title=None, is_minimizable=None, wide=None, as_list=False):
+    if isinstance(msg, (list, tuple)):
+        msg = "\n".join(str(m) for m in msg)
+    local.messages.append(_dict(message=msg, title=title))
+    raise exc(msg)
+
+
+def msgprint(msg, title=None, raise_exception=0, alert=False, indicator=None, **kwargs):
+    local.messages.append(_dict(message=msg, title=title))
+    if raise_exception:
+        throw(msg, title=title)
+
+
+def clear_messages():
+    local.messages.clear()
+
+
+def log_error(title=None, message=None, reference_doctype=None, reference_name=None):
+    local.errors.append(_dict(title=title, message=message))
+
+
+def get_traceback(with_context=False):
+    return traceback.format_exc()
+
+
+def whitelist(allow_guest=False, xss_safe=False, methods=None):
+    def decorator(fn):
+        return fn
+
+    return decorator
+
+
+def enqueue(method, queue="default", timeout=None, is_async=True, enqueue_after_commit=False, job_id=None, deduplicate=False, **kwargs):
+    if deduplicate and job_id and any(job.job_id == job_id and not job.done for job in local.jobs):
+        return None
+    job = _dict(method=method, queue=queue, job_id=job_id, kwargs=kwargs, done=False)
+    local.jobs.append(job)
+    return job
+
+
+def run_jobs():
+    """Run queued jobs in order, including any they enqueue"""
+    results = []
+    while True:
+        pending = [job for job in local.jobs if not job.done]
+        if not pending:
+            return results
+        for job in pending:
+            job.done = True
+            method = job.method
+            if isinstance(method, str):
+                module, _, function = method.rpartition(".")
+                method = getattr(importlib.import_module(module), function)
+            results.append(method(**job.kwargs))
+
+
+def cache():
+    return local.cache
+
+
+def generate_hash(txt=None, length=None):
+    digest = uuid.uuid4().hex
+    return digest[:length] if length else digest
+
+
+def parse_json(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def has_permission(doctype=None, ptype="read", doc=None, user=None, throw=False):
+    """Everything is permitted except (doctype, ptype) pairs in local.denied"""
+    if (doctype, ptype) not in local.denied:
+        return True
+    if throw:
+        raise PermissionError(f"No {ptype} permission for {doctype}")
+    return False
+
+
+def only_for(roles, message=False):
+    return True
+
+
+def publish_realtime(event=None, message=None, room=None, user=None, **kwargs):
+    local.realtime.append((event, message, user))
+
+
+def sendmail(recipients=None, subject=None, message=None, **kwargs):
+    local.db.query("insert", "Email Queue")
+    local.outbox.append(_dict(recipients=recipients, subject=subject, message=message, **kwargs))
+
+
+def publish_progress(*args, **kwargs):
+    pass
+
+
+def _(msg, lang=None, context=None):
+    return msg
+
+
+def bold(text):
+    return f"<strong>{text}</strong>"
+
+
+def logger(module=None, with_more_info=False, allow_site=True, filter=None, max_size=None, file_count=None):
+    return logging.getLogger(module or "frappe")
+
+
+@contextmanager
+def query_budget(limit):
+    """Fail if the block runs more than `limit` counted queries"""
+    log = local.db.log
+    start = log.count
+    yield log
+    used = log.count - start
+    if used > limit:
+        raise AssertionError(f"Query budget exceeded: {used} > {limit}: {log.queries[start:]}")
+
+
+# ---- frappe.utils ----
+
+
+def cint(value):
+    try:
+        return int(float(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def flt(value, precision=None):
+    try:
+        number = float(value or 0)
+    except (TypeError, ValueError):
+        number = 0.0
+    return round(number, precision) if precision is not None else number
+
+
+def getdate(value=None):
+    if value is None:
+        return datetime.date.today()
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def get_datetime(value=None):
+    if value is None:
+        return datetime.datetime.now()
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    return datetime.datetime.fromisoformat(str(value))
+
+
+def nowdate():
+    return datetime.date.today().isoformat()
+
+
+def now_datetime():
+    return datetime.datetime.now()
+
+
+def add_days(date, days):
+    return getdate(date) + datetime.timedelta(days=days)
+
+
+def add_months(date, months):
+    date = getdate(date)
+    month = date.month - 1 + months
+    year, month = date.year + month // 12, month % 12 + 1
+    return date.replace(year=year, month=month, day=min(date.day, calendar.monthrange(year, month)[1]))
+
+
+def add_to_date(date, days=0, hours=0, minutes=0, seconds=0, as_string=False, **kwargs):
+    return get_datetime(date) + datetime.timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def get_first_day(date):
+    return getdate(date).replace(day=1)
+
+
+def strip_html(text):
+    return re.sub(r"<[^>]*>", "", text)
+
+
+def fmt_money(amount, precision=None, currency=None, format=None):
+    return f"{flt(amount):,.{2 if precision is None else precision}f}"
+
+
+def escape_html(text):
+    return html.escape(text)
+
+
+def get_url_to_form(doctype, name):
+    return f"/app/{doctype.lower().replace(' ', '-')}/{name}"
+
+
+def safe_decode(value, encoding="utf-8"):
+    return value.decode(encoding) if isinstance(value, bytes) else value
+
+
+class _Proxy:
+    """Module attribute that follows the current site, like frappe.db"""
+
+    def __init__(self, attribute):
+        self._attribute = attribute
+
+    def __getattr__(self, name):
+        return getattr(getattr(local, self._attribute), name)
+
+
+def _make_module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """Register the stand-in as ``frappe`` unless the real one is importable"""
+
+    try:
+        import frappe
+
+        return False
+    except ImportError:
+        pass
+
+    this = sys.modules[__name__]
+    names = [
+        "_dict", "ValidationError", "LinkValidationError", "DuplicateEntryError",
+        "DoesNotExistError", "LinkExistsError", "PermissionError", "local", "get_meta", "get_doc",
+        "get_cached_doc", "get_cached_value", "new_doc", "delete_doc", "get_all", "get_list", "throw",
+        "msgprint", "clear_messages", "log_error", "get_traceback", "whitelist",
+        "enqueue", "cache", "generate_hash", "parse_json", "has_permission",
+        "only_for", "publish_realtime", "publish_progress", "_", "bold", "logger", "sendmail",
+    ]
+    frappe = _make_module("frappe", **{name: getattr(this, name) for name in names})
+    frappe.__path__ = []
+
+    frappe.db = _Proxy("db")
+    frappe.session = _Proxy("session")
+    frappe.conf = _Proxy("conf")
+
+    utils = _make_module(
+        "frappe.utils",
+        cint=cint, flt=flt, getdate=getdate, get_datetime=get_datetime, nowdate=nowdate,
+        today=nowdate, now_datetime=now_datetime, add_days=add_days, add_months=add_months,
+        add_to_date=add_to_date, get_first_day=get_first_day, strip_html=strip_html,
+        escape_html=escape_html, fmt_money=fmt_money, get_url_to_form=get_url_to_form,
+    )
+    frappe.utils = utils
+    frappe.safe_decode = safe_decode
+
+    def create_custom_field(doctype, df, ignore_validate=False, is_system_generated=True):
+        df = _dict(df)
+        if local.db.exists("Custom Field", {"dt": doctype, "fieldname": df.fieldname}):
+            return
+        local.db.insert_doc(Document(dict(df, doctype="Custom Field", dt=doctype, name=f"{doctype}-{df.fieldname}")))
+        local.db.log.schema_changes.append(doctype)
+        local.db.log.cache_clears.append(doctype)
+
+    def create_custom_fields(custom_fields, ignore_validate=False, update=True):
+        # like frappe: one lookup per field, one cache clear and schema update per doctype
+        for doctype, fields in custom_fields.items():
+            for df in fields if isinstance(fields, list) else [fields]:
+                df = _dict(df)
+                name = local.db.get_value("Custom Field", {"dt": doctype, "fieldname": df.fieldname})
+                if not name:
+                    local.db.insert_doc(Document(dict(df, doctype="Custom Field", dt=doctype, name=f"{doctype}-{df.fieldname}")))
+                elif update:
+                    field = local.db.table("Custom Field")[name]
+                    field.update(df)
+                    local.db.save_doc(field)
+            local.db.log.schema_changes.append(doctype)
+            local.db.log.cache_clears.append(doctype)
+
+    def clear_cache(user=None, doctype=None):
+        if doctype:
+            local.db.log.cache_clears.append(doctype)
+
+    frappe.clear_cache = clear_cache
+
+    def apply_workflow(doc, action):
+        doc.status = "Approved" if action == "Approve" else "Rejected"
+        doc.submit()
+        return doc
+
+    for name in ("frappe.model", "frappe.custom", "frappe.custom.doctype", "frappe.custom.doctype.custom_field"):
+        _make_module(name).__path__ = []
+    _make_module("frappe.model.document", Document=Document)
+    _make_module("frappe.model.workflow", apply_workflow=apply_workflow)
+    _make_module(
+        "frappe.custom.doctype.custom_field.custom_field",
+        create_custom_field=create_custom_field,
+        create_custom_fields=create_custom_fields,
+    )
+
+    new_site()
+    return True
+
@@ -0,0 +1,274 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import re
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from expense_request import budget
+from expense_request.accounting_dimensions_handler import get_active_dimensions
+from expense_request.journal_registry import REGISTRY_DOCTYPE
+from tests.memory_frappe import query_budget, run_jobs
+from tests.utils import COMPANY, make_entry, setup_site
+
+FISCAL_YEAR = "2025"
+COST_CENTER = "Main - TC"
+
+
+class TestBudgetCounters(unittest.TestCase):
+	"""Runs against the stand-in, with the budget module's SQL answered from
+	the in-memory tables below"""
+
+	def setUp(self):
+		self.db = setup_site(dimensions=())
+		self.db.set_single_value("Accounts Settings", "check_expense_budget", 1)
+		self.budgets = []
+		self.gl_entries = []
+
+		self.db.on_sql(r"from `tabBudget`", self.select_budgets)
+		self.db.on_sql(r"insert into `tabExpense Budget Counter`", self.upsert_counters)
+		self.db.on_sql(r"from `tabExpense Entry` entry", self.select_committed)
+		self.db.on_sql(r"from `tabGL Entry`", self.select_actual)
+
+		# erpnext is not installed here; every date is in one fiscal year
+		patcher = patch.object(budget, "get_fiscal_year", return_value=FISCAL_YEAR)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+		get_active_dimensions()
+		self.db.log.reset()
+
+	# ---- SQL answered from memory ----
+
+	def select_budgets(self, query, values):
+		return [
+			frappe._dict(row)
+			for row in self.budgets
+			if row["account"] in values["accounts"]
+		]
+
+	def upsert_counters(self, query, values):
+		columns = re.findall(r"`(\w+)`", query.split(" values ")[0])
+		counters = self.db.table(budget.COUNTER_DOCTYPE)
+		for start in range(0, len(values), len(columns)):
+			row = dict(zip(columns, values[start : start + len(columns)], strict=True))
+			counter = counters.get(row["name"])
+			if counter:
+				counter.committed += row["committed"]
+				counter.actual += row["actual"]
+			else:
+				self.db.add(budget.COUNTER_DOCTYPE, row)
+		return []
+
+	def select_committed(self, query, values):
+		fieldname = re.search(r"item\.`(\w+)` as value", query).group(1)
+		return group_amounts(
+			frappe._dict(company=entry.company, account=item.expense_account, value=item.get(fieldname), amount=item.base_amount)
+			for entry in self.db.table("Expense Entry").values()
+			if entry.docstatus == 1 and entry.status == "Approved" and not entry.get("journal_entry")
+			for item in entry.expenses
+		)
+
+	def select_actual(self, query, values):
+		fieldname = re.search(r"gle\.`(\w+)` as value", query).group(1)
+		return group_amounts(
+			frappe._dict(company=gle["company"], account=gle["account"], value=gle.get(fieldname), amount=gle["debit"] - gle["credit"])
+			for gle in self.gl_entries
+			if not gle["is_cancelled"]
+			and gle["voucher_type"] == "Journal Entry"
+			and self.db.exists(REGISTRY_DOCTYPE, {"journal_entry": gle["voucher_no"]})
+		)
+
+	# ---- fixtures ----
+
+	def make_approved_entry(self, name="EXP-2025-00001", items=2):
+		entry = make_entry(items=items, status="Approved", dimensions=(), name=name)
+		for item in entry.expenses:
+			item.base_amount = item.amount
+		return entry
+
+	def add_budget(self, account, amount, action="Stop"):
+		self.budgets.append({
+			"budget_against": "Cost Center",
+			"cost_center": COST_CENTER,
+			"project": None,
+			"action": action,
+			"account": account,
+			"budget_amount": amount,
+		})
+
+	def post_journal_entry(self, entry, name="ACC-JV-2025-00001"):
+		journal_entry = frappe.get_doc({
+			"doctype": "Journal Entry",
+			"name": name,
+			"company": entry.company,
+			"posting_date": entry.posting_date,
+			"accounts": [
+				{
+					"account": item.expense_account,
+					"cost_center": item.cost_center,
+					"debit_in_account_currency": item.base_amount,
+				}
+				for item in entry.expenses
+			] + [{"account": "Cash - TC", "credit_in_account_currency": entry.total}],
+		})
+		journal_entry.flags.expense_entries = [entry.name]
+		budget.on_journal_entry_submit(journal_entry, "on_submit")
+
+		entry.journal_entry = name
+		self.db.add(REGISTRY_DOCTYPE, {"name": entry.name, "expense_entry": entry.name, "journal_entry": name})
+		self.gl_entries.extend(
+			{
+				"company": entry.company,
+				"account": item.expense_account,
+				"cost_center": item.cost_center,
+				"debit": item.base_amount,
+				"credit": 0,
+				"is_cancelled": 0,
+				"voucher_type": "Journal Entry",
+				"voucher_no": name,
+			}
+			for item in entry.expenses
+		)
+		return journal_entry
+
+	def get_counters(self):
+		return {
+			(row.budget_against_value, row.expense_account): (round(row.committed, 2), round(row.actual, 2))
+			for row in self.db.table(budget.COUNTER_DOCTYPE).values()
+		}
+
+	# ---- approval gate ----
+
+	def test_over_budget_approval_is_blocked(self):
+		self.add_budget("Expense 0 - TC", 30)
+		budget.upsert_counters(COMPANY, FISCAL_YEAR, {("Cost Center", COST_CENTER, "Expense 0 - TC"): 25}, committed=1)
+		entry = self.make_approved_entry()
+
+		# settings, budgets, counter lock, counters
+		with query_budget(4), self.assertRaises(frappe.ValidationError):
+			budget.check_budget(entry, "before_submit")
+
+	def test_warn_budget_lets_approval_through(self):
+		self.add_budget("Expense 0 - TC", 5, action="Warn")
+		entry = self.make_approved_entry()
+
+		budget.check_budget(entry, "before_submit")
+
+		self.assertIn("Expense 0 - TC", frappe.local.messages[-1].message)
+
+	def test_approval_within_budget_passes(self):
+		self.add_budget("Expense 0 - TC", 30)
+		self.make_approved_entry(name="EXP-2025-00000")
+		budget.on_submit(self.db.table("Expense Entry")["EXP-2025-00000"], "on_submit")
+
+		budget.check_budget(self.make_approved_entry(), "before_submit")
+
+		self.assertEqual(frappe.local.messages, [])
+
+	# ---- counters ----
+
+	def test_submit_and_cancel_deltas(self):
+		entry = self.make_approved_entry()
+
+		budget.on_submit(entry, "on_submit")
+		self.assertEqual(
+			self.get_counters(),
+			{(COST_CENTER, "Expense 0 - TC"): (10.5, 0), (COST_CENTER, "Expense 1 - TC"): (11.5, 0)},
+		)
+
+		budget.on_cancel(entry, "on_cancel")
+		self.assertEqual(
+			self.get_counters(),
+			{(COST_CENTER, "Expense 0 - TC"): (0, 0), (COST_CENTER, "Expense 1 - TC"): (0, 0)},
+		)
+
+	def test_journal_entry_moves_committed_to_actual(self):
+		entry = self.make_approved_entry()
+		budget.on_submit(entry, "on_submit")
+
+		journal_entry = self.post_journal_entry(entry)
+		self.assertEqual(
+			self.get_counters(),
+			{(COST_CENTER, "Expense 0 - TC"): (0, 10.5), (COST_CENTER, "Expense 1 - TC"): (0, 11.5)},
+		)
+
+		# a posted entry's spend is released by its Journal Entry, not the entry
+		budget.on_journal_entry_cancel(journal_entry, "on_cancel")
+		self.assertEqual(
+			self.get_counters(),
+			{(COST_CENTER, "Expense 0 - TC"): (10.5, 0), (COST_CENTER, "Expense 1 - TC"): (11.5, 0)},
+		)
+
+	def test_entry_cancelled_before_its_journal_entry_stays_released(self):
+		entry = self.make_approved_entry()
+		budget.on_submit(entry, "on_submit")
+		journal_entry = self.post_journal_entry(entry)
+
+		entry.docstatus = 2
+		budget.on_cancel(entry, "on_cancel")
+		budget.on_journal_entry_cancel(journal_entry, "on_cancel")
+
+		self.assertEqual(
+			self.get_counters(),
+			{(COST_CENTER, "Expense 0 - TC"): (0, 0), (COST_CENTER, "Expense 1 - TC"): (0, 0)},
+		)
+
+	def test_rebuild_matches_incremental_counters(self):
+		posted = self.make_approved_entry(name="EXP-2025-00001", items=2)
+		pending = self.make_approved_entry(name="EXP-2025-00002", items=5)
+		budget.on_submit(posted, "on_submit")
+		budget.on_submit(pending, "on_submit")
+		self.post_journal_entry(posted)
+		incremental = self.get_counters()
+
+		# spend booked by other documents is not counted by the hooks either
+		self.gl_entries.append({
+			"company": COMPANY,
+			"account": "Expense 0 - TC",
+			"cost_center": COST_CENTER,
+			"debit": 100,
+			"credit": 0,
+			"is_cancelled": 0,
+			"voucher_type": "Purchase Invoice",
+			"voucher_no": "ACC-PINV-2025-00001",
+		})
+
+		budget.rebuild_counters()
+
+		self.assertEqual(self.get_counters(), incremental)
+
+	def test_enabling_the_check_queues_a_rebuild(self):
+		self.make_approved_entry()
+		settings = frappe.get_doc({"doctype": "Accounts Settings", "check_expense_budget": 0})
+		settings.load_doc_before_save()
+		settings.check_expense_budget = 1
+
+		budget.on_settings_update(settings, "on_update")
+		self.assertEqual([job.method for job in frappe.local.jobs], ["expense_request.budget.rebuild_counters"])
+
+		run_jobs()
+		self.assertEqual(
+			self.get_counters(),
+			{(COST_CENTER, "Expense 0 - TC"): (10.5, 0), (COST_CENTER, "Expense 1 - TC"): (11.5, 0)},
+		)
+
+		# saving again with the check already on does not rebuild
+		settings.load_doc_before_save()
+		budget.on_settings_update(settings, "on_update")
+		self.assertEqual(len(frappe.local.jobs), 1)
+
+
+def group_amounts(lines):
+	"""Sum lines per (company, fiscal_year, value, account), as the GROUP BY does"""
+	totals = {}
+	for line in lines:
+		if line.value:
+			key = (line.company, FISCAL_YEAR, line.value, line.account)
+			totals[key] = totals.get(key, 0) + line.amount
+	return [
+		frappe._dict(company=company, fiscal_year=fiscal_year, value=value, account=account, amount=amount)
+		for (company, fiscal_year, value, account), amount in totals.items()
+	]
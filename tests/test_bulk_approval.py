@@ -0,0 +1,81 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import json
+import unittest
+
+import frappe
+
+from expense_request import bulk_approval
+from tests.memory_frappe import run_jobs
+from tests.utils import make_entry, setup_site
+
+
+class TestBulkApproval(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		for i in range(5):
+			make_entry(name=f"EXP-2025-{i:05d}")
+
+	def test_entries_are_approved_in_chunks(self):
+		names = ["EXP-2025-00000", "EXP-2025-00001", "EXP-2025-00002"]
+		batch = bulk_approval.bulk_approve(names=json.dumps(names), chunk_size=2)
+		self.assertEqual(batch["total"], 3)
+		self.assertEqual(bulk_approval.get_bulk_approval_status(batch["batch_id"])["status"], "Queued")
+
+		run_jobs()
+
+		status = bulk_approval.get_bulk_approval_status(batch["batch_id"])
+		self.assertEqual((status["status"], status["processed"]), ("Completed", 3))
+		self.assertEqual([result["status"] for result in status["results"]], ["Approved"] * 3)
+		self.assertEqual(
+			[self.db.table("Expense Entry")[name].status for name in names], ["Approved"] * 3
+		)
+		self.assertEqual(self.db.table("Expense Entry")["EXP-2025-00003"].status, "Pending")
+		# one commit per chunk
+		self.assertEqual(self.db.committed, 2)
+
+	def test_failing_entry_is_reported_and_the_rest_approved(self):
+		batch = bulk_approval.bulk_approve(filters=json.dumps({"status": "Pending"}))
+		del self.db.table("Expense Entry")["EXP-2025-00002"]
+
+		run_jobs()
+
+		results = bulk_approval.get_bulk_approval_status(batch["batch_id"])["results"]
+		self.assertEqual(
+			[(result["name"], result["status"]) for result in results],
+			[(f"EXP-2025-{i:05d}", "Failed" if i == 2 else "Approved") for i in range(5)],
+		)
+
+	def test_nothing_to_approve(self):
+		with self.assertRaises(frappe.ValidationError):
+			bulk_approval.bulk_approve(names=json.dumps(["EXP-2025-99999"]))
+
+	def test_only_the_owner_reads_the_status(self):
+		batch = bulk_approval.bulk_approve(names=json.dumps(["EXP-2025-00000"]))
+		run_jobs()
+
+		frappe.local.session.user = "someone@example.com"
+		with self.assertRaises(frappe.PermissionError):
+			bulk_approval.get_bulk_approval_status(batch["batch_id"])
+
+		frappe.local.session.user = "Administrator"
+		self.assertEqual(bulk_approval.get_bulk_approval_status(batch["batch_id"])["processed"], 1)
+
+	def test_only_pending_drafts_are_approved(self):
+		self.db.table("Expense Entry")["EXP-2025-00001"].update({"status": "Approved", "docstatus": 1})
+		self.db.table("Expense Entry")["EXP-2025-00002"].update({"status": "Rejected", "docstatus": 1})
+		self.db.table("Expense Entry")["EXP-2025-00003"].status = "Rejected"
+		expected = ["EXP-2025-00000", "EXP-2025-00004"]
+
+		all_names = json.dumps([f"EXP-2025-{i:05d}" for i in range(5)])
+		self.assertEqual(bulk_approval.get_entries_to_approve(names=all_names), expected)
+		self.assertEqual(bulk_approval.get_entries_to_approve(filters=json.dumps({})), expected)
+		self.assertEqual(
+			bulk_approval.get_entries_to_approve(filters=json.dumps([["Expense Entry", "company", "=", "Test Company"]])),
+			expected,
+		)
+		self.assertEqual(bulk_approval.get_entries_to_approve(filters=json.dumps({"status": "Rejected"})), [])
+
+		with self.assertRaises(frappe.ValidationError):
+			bulk_approval.bulk_approve(names=json.dumps(["EXP-2025-00001", "EXP-2025-00002"]))
@@ -0,0 +1,128 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import sys
+import types
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from expense_request.consolidation import consolidate_expense_entries, get_unposted_entry_groups
+from tests.utils import COMPANY, make_entry, setup_site
+
+
+class TestConsolidation(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		for i in range(2):
+			make_entry(status="Approved", name=f"EXP-{i:05d}")
+
+		# erpnext is not installed here; no rate is known for any currency
+		patcher = patch.dict(sys.modules, {
+			"erpnext": types.ModuleType("erpnext"),
+			"erpnext.setup": types.ModuleType("erpnext.setup"),
+			"erpnext.setup.utils": types.SimpleNamespace(get_exchange_rate=lambda *args: 0),
+		})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def get_entry(self, name):
+		return self.db.table("Expense Entry")[name]
+
+	def test_entries_are_grouped_by_company_date_and_mode_of_payment(self):
+		make_entry(status="Approved", name="EXP-00002").posting_date = "2025-11-02"
+		make_entry(status="Approved", name="EXP-00003").mode_of_payment = "Bank"
+		make_entry(status="Pending", name="EXP-00004")
+
+		groups = get_unposted_entry_groups([], COMPANY)
+
+		self.assertEqual(
+			{key: [entry.name for entry in entries] for key, entries in groups.items()},
+			{
+				(COMPANY, "2025-11-01", "Bank"): ["EXP-00003"],
+				(COMPANY, "2025-11-01", "Cash"): ["EXP-00000", "EXP-00001"],
+				(COMPANY, "2025-11-02", "Cash"): ["EXP-00002"],
+			},
+		)
+
+	def test_entries_in_the_posting_queue_are_left_out(self):
+		for i, status in enumerate(("Queued", "Posting", "Failed", "Cancelled", "Posted"), 2):
+			make_entry(status="Approved", name=f"EXP-{i:05d}").posting_status = status
+
+		groups = get_unposted_entry_groups([])
+
+		self.assertEqual([entry.name for entry in groups[(COMPANY, "2025-11-01", "Cash")]], ["EXP-00000", "EXP-00001"])
+
+	def test_one_journal_entry_per_group(self):
+		self.assertEqual(consolidate_expense_entries(), ["JE-00001"])
+
+		journal_entry = self.db.table("Journal Entry")["JE-00001"]
+		lines = [
+			(line.account, line.get("region"), line.get("debit_in_account_currency"), line.get("credit_in_account_currency"))
+			for line in journal_entry.accounts
+		]
+		# items of both entries are summed per account and dimensions; the
+		# credit carries the entries' default dimensions
+		self.assertEqual(lines, [
+			("Expense 0 - TC", "region 0", 21.0, None),
+			("Expense 1 - TC", "region 1", 23.0, None),
+			("Expense 2 - TC", "region 0", 25.0, None),
+			("Cash - TC", None, None, 69.0),
+		])
+		self.assertEqual(journal_entry.accounts[0].cost_center, "Main - TC")
+		self.assertEqual(journal_entry.accounts[3].branch, "Default branch")
+		self.assertEqual(journal_entry.docstatus, 1)
+		self.assertEqual(
+			journal_entry.expense_entries,
+			[{"expense_entry": "EXP-00000", "amount": 34.5}, {"expense_entry": "EXP-00001", "amount": 34.5}],
+		)
+
+		for name in ("EXP-00000", "EXP-00001"):
+			self.assertEqual(self.get_entry(name).journal_entry, "JE-00001")
+			self.assertEqual(self.get_entry(name).posting_status, "Posted")
+			self.assertEqual(self.db.get_value("Expense Journal Link", name, "journal_entry"), "JE-00001")
+
+	def test_credit_lines_are_split_by_default_dimensions(self):
+		self.get_entry("EXP-00001").default_branch = "Other branch"
+
+		consolidate_expense_entries()
+
+		credits = [
+			(line.get("branch"), line.credit_in_account_currency)
+			for line in self.db.table("Journal Entry")["JE-00001"].accounts
+			if line.get("credit_in_account_currency")
+		]
+		self.assertEqual(credits, [("Default branch", 34.5), ("Other branch", 34.5)])
+
+	def test_an_entry_that_cannot_be_converted_is_left_out(self):
+		entry = make_entry(status="Approved", name="EXP-00002")
+		entry.expenses[0].currency = "USD"
+
+		self.assertEqual(consolidate_expense_entries(), ["JE-00001"])
+
+		self.assertEqual(
+			[row["expense_entry"] for row in self.db.table("Journal Entry")["JE-00001"].expense_entries],
+			["EXP-00000", "EXP-00001"],
+		)
+		failed = self.get_entry("EXP-00002")
+		self.assertEqual(failed.posting_status, "Failed")
+		self.assertEqual(failed.posting_attempts, 1)
+		self.assertIn("No exchange rate found from USD to KES", failed.posting_error)
+		self.assertIsNotNone(failed.next_posting_attempt)
+		self.assertFalse(self.db.exists("Expense Journal Link", "EXP-00002"))
+
+	def test_a_failed_group_hands_its_entries_to_the_posting_queue(self):
+		for name in ("EXP-00000", "EXP-00001"):
+			self.get_entry(name).mode_of_payment = "Bank"
+
+		self.assertEqual(consolidate_expense_entries(), [])
+
+		for name in ("EXP-00000", "EXP-00001"):
+			entry = self.get_entry(name)
+			self.assertEqual(entry.posting_status, "Failed")
+			self.assertIn("no linked account", entry.posting_error)
+		self.assertEqual(self.db.table("Journal Entry"), {})
+
+		# they are no longer picked up by the next day's run
+		self.assertEqual(get_unposted_entry_groups([]), {})
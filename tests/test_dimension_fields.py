@@ -0,0 +1,104 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import unittest
+
+from expense_request.accounting_dimensions_handler import DIMENSION_DOCTYPES, reconcile_dimension_fields
+from tests.utils import setup_site
+
+
+class TestDimensionFieldReconciler(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site(("branch", "region"))
+
+	def fieldnames(self):
+		return sorted(f"{field.dt}.{field.fieldname}" for field in self.db.table("Custom Field").values())
+
+	def test_dry_run_changes_nothing(self):
+		changes = reconcile_dimension_fields(dry_run=True)
+
+		self.assertEqual(len(changes["add"]), 9)
+		self.assertIn("Expense Entry Item.branch", changes["add"])
+		self.assertEqual(self.fieldnames(), [])
+		self.assertEqual(self.db.log.schema_changes, [])
+
+	def test_changed_dimension_is_updated(self):
+		reconcile_dimension_fields()
+		self.db.table("Accounting Dimension")["Region"].update(label="Sales Region", mandatory_for_pl=1)
+
+		changes = reconcile_dimension_fields()
+
+		self.assertEqual(
+			sorted(changes["update"]),
+			[
+				"Expense Entry Item.region",
+				"Expense Entry Template.default_region",
+				"Expense Entry.default_region",
+				"Expense Summary.region",
+			],
+		)
+		item_field = self.db.table("Custom Field")["Expense Entry Item-region"]
+		self.assertEqual((item_field.label, item_field.reqd), ("Sales Region", 1))
+
+	def test_user_layout_survives_an_update(self):
+		reconcile_dimension_fields()
+		item_field = self.db.table("Custom Field")["Expense Entry Item-region"]
+		item_field.update(insert_after="description", in_list_view=1, columns=2)
+		self.db.table("Accounting Dimension")["Region"].label = "Sales Region"
+
+		self.db.log.reset()
+		reconcile_dimension_fields()
+
+		self.assertEqual(item_field.label, "Sales Region")
+		self.assertEqual((item_field.insert_after, item_field.in_list_view, item_field.columns), ("description", 1, 2))
+		# one cache clear and schema update per DocType with updated fields
+		self.assertEqual(sorted(self.db.log.cache_clears), sorted(DIMENSION_DOCTYPES))
+		self.assertEqual(sorted(self.db.log.schema_changes), sorted(DIMENSION_DOCTYPES))
+
+	def test_existing_fields_are_indexed(self):
+		reconcile_dimension_fields()
+		for field in self.db.table("Custom Field").values():
+			field.search_index = 0
+
+		changes = reconcile_dimension_fields()
+
+		self.assertEqual(len(changes["update"]), 6)
+		self.assertTrue(self.db.table("Custom Field")["Expense Entry Item-branch"].search_index)
+
+	def test_deleted_dimension_fields_are_removed(self):
+		reconcile_dimension_fields()
+		self.db.add("Custom Field", {
+			"name": "Expense Entry Item-vehicle",
+			"dt": "Expense Entry Item",
+			"fieldname": "vehicle",
+			"fieldtype": "Link",
+			"options": "Vehicle",
+		})
+
+		self.db.log.reset()
+		changes = reconcile_dimension_fields(removed=["Region"])
+
+		self.assertEqual(
+			sorted(changes["remove"]),
+			[
+				"Expense Entry Item.region",
+				"Expense Entry Template.default_region",
+				"Expense Entry.default_region",
+				"Expense Summary.region",
+			],
+		)
+		self.assertIn("Expense Entry Item.vehicle", self.fieldnames())
+		self.assertIn("Expense Entry Item.branch", self.fieldnames())
+		# one cache clear and schema update per DocType that lost fields
+		self.assertEqual(sorted(self.db.log.cache_clears), sorted(DIMENSION_DOCTYPES))
+		self.assertEqual(sorted(self.db.log.schema_changes), sorted(DIMENSION_DOCTYPES))
+
+	def test_fields_of_missing_dimensions_are_removed(self):
+		reconcile_dimension_fields()
+		del self.db.table("Accounting Dimension")["Branch"]
+		del self.db.table("Accounting Dimension")["Region"]
+
+		changes = reconcile_dimension_fields()
+
+		self.assertEqual(len(changes["remove"]), 9)
+		self.assertEqual(self.fieldnames(), [])
@@ -0,0 +1,171 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import datetime
+import unittest
+
+import frappe
+
+from expense_request.duplicates import get_fingerprint, run_backfill, set_fingerprints, validate_duplicates
+from tests.memory_frappe import query_budget
+from tests.utils import make_entry, save_entry, setup_site
+
+
+class TestExpenseFingerprint(unittest.TestCase):
+	def test_formatting_does_not_change_fingerprint(self):
+		self.assertEqual(
+			get_fingerprint("Petty Cash Vendor", 12.5, "KES", "Fuel - TC", "Fuel, <b>Toyota</b>  KBX 123"),
+			get_fingerprint(" petty cash  vendor", "12.50", "KES", "Fuel - TC", "fuel toyota kbx-123"),
+		)
+
+	def test_fingerprint_fields(self):
+		base = get_fingerprint("Vendor", 10, "KES", "Fuel - TC", "Fuel")
+		self.assertNotEqual(base, get_fingerprint("Other Vendor", 10, "KES", "Fuel - TC", "Fuel"))
+		self.assertNotEqual(base, get_fingerprint("Vendor", 10.01, "KES", "Fuel - TC", "Fuel"))
+		self.assertNotEqual(base, get_fingerprint("Vendor", 10, "USD", "Fuel - TC", "Fuel"))
+		self.assertNotEqual(base, get_fingerprint("Vendor", 10, "KES", "Travel - TC", "Fuel"))
+		self.assertNotEqual(base, get_fingerprint("Vendor", 10, "KES", "Fuel - TC", "Diesel"))
+
+
+class TestDuplicateCheck(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		self.db.on_sql(r"where item.fingerprint in", self.select_matches)
+		self.db.on_sql(r"ifnull\(item.fingerprint, ''\) = ''", self.select_unfingerprinted)
+
+	# ---- SQL answered from memory ----
+
+	def get_items(self):
+		entries = self.db.table("Expense Entry")
+		return [
+			(item, entries[item.parent])
+			for item in self.db.table("Expense Entry Item").values()
+			if item.parenttype == "Expense Entry"
+		]
+
+	def select_matches(self, query, values):
+		rows = [
+			frappe._dict(fingerprint=item.fingerprint, parent=item.parent, match_idx=item.idx, posting_date=entry.posting_date)
+			for item, entry in self.get_items()
+			if item.fingerprint in values["fingerprints"]
+			and item.parent != values["name"]
+			and entry.docstatus < 2
+			and entry.status != "Rejected"
+			and values["from_date"] <= datetime.date.fromisoformat(entry.posting_date) <= values["to_date"]
+		]
+		return sorted(rows, key=lambda row: (row.posting_date, row.parent, row.match_idx))
+
+	def select_unfingerprinted(self, query, values):
+		return [
+			frappe._dict(
+				name=item.name, amount=item.amount, currency=item.get("currency"),
+				expense_account=item.expense_account, description=item.description, payment_to=entry.payment_to,
+			)
+			for item, entry in self.get_items()
+			if not item.get("fingerprint")
+		][: values["batch_size"]]
+
+	def claim(self, name, posting_date="2025-11-01", status="Pending"):
+		"""Store a fingerprinted entry with the same items as make_entry's"""
+		entry = make_entry(items=2, status=status, name=name)
+		entry.posting_date = posting_date
+		set_fingerprints(entry)
+		return entry
+
+	def set_action(self, action, window=None):
+		self.db.set_single_value("Accounts Settings", "duplicate_expense_action", action)
+		self.db.set_single_value("Accounts Settings", "duplicate_expense_window", window)
+
+	def test_matching_item_is_warned_about(self):
+		self.set_action("Warn")
+		self.claim("EXP-00001")
+		entry = self.claim("EXP-00002", posting_date="2025-11-20")
+		entry.expenses[0].description = "Something else"
+		frappe.local.messages.clear()
+
+		validate_duplicates(entry, "validate")
+
+		(message,) = frappe.local.messages
+		self.assertEqual(message.title, "Possible Duplicate Expense")
+		self.assertIn("Row 2 matches row 2 of", message.message)
+		self.assertNotIn("Row 1", message.message)
+
+	def test_matching_item_is_blocked(self):
+		self.set_action("Block")
+		self.claim("EXP-00001")
+		entry = make_entry(items=2, name="EXP-00002")
+
+		with self.assertRaises(frappe.ValidationError):
+			validate_duplicates(entry, "validate")
+		self.assertEqual(frappe.local.messages[-1].title, "Duplicate Expense")
+
+	def test_matches_outside_the_window_are_ignored(self):
+		self.set_action("Block", window=10)
+		self.claim("EXP-00001", posting_date="2025-10-21")
+		self.claim("EXP-00002", posting_date="2025-11-12")
+		entry = make_entry(items=2, name="EXP-00003")
+
+		# 11 days either side of 2025-11-01
+		validate_duplicates(entry, "validate")
+
+		# the window includes its last day
+		entry.posting_date = "2025-11-02"
+		with self.assertRaises(frappe.ValidationError) as raised:
+			validate_duplicates(entry, "validate")
+		self.assertIn("EXP-00002", str(raised.exception))
+		self.assertNotIn("EXP-00001", str(raised.exception))
+
+	def test_own_rejected_and_cancelled_entries_are_not_duplicates(self):
+		self.set_action("Block")
+		entry = self.claim("EXP-00001")
+		self.claim("EXP-00002", status="Rejected")
+		self.claim("EXP-00003", status="Approved").docstatus = 2
+
+		validate_duplicates(entry, "validate")
+
+	def test_other_currency_is_not_a_duplicate(self):
+		self.set_action("Block")
+		self.claim("EXP-00001")
+		entry = make_entry(items=2, name="EXP-00002")
+		for item in entry.expenses:
+			item.currency = "USD"
+
+		validate_duplicates(entry, "validate")
+
+	def test_backfill_fingerprints_items_in_batches(self):
+		for i in range(3):
+			make_entry(items=2, name=f"EXP-{i:05d}")
+		self.db.table("Expense Entry Item")["EXP-00000-expenses-1"].fingerprint = "kept"
+
+		run_backfill(batch_size=2)
+
+		items = self.db.table("Expense Entry Item")
+		self.assertEqual(items["EXP-00000-expenses-1"].fingerprint, "kept")
+		self.assertEqual(
+			items["EXP-00001-expenses-2"].fingerprint,
+			get_fingerprint("Petty Cash Vendor", 11.5, None, "Expense 1 - TC", "Line 1"),
+		)
+		self.assertTrue(all(item.fingerprint for item in items.values()))
+		# five items in batches of two, one commit each
+		self.assertEqual(self.db.committed, 3)
+
+	def test_items_are_fingerprinted_when_check_is_off(self):
+		entry = make_entry(items=2)
+
+		# the two settings, nothing else
+		with query_budget(2):
+			validate_duplicates(entry, "validate")
+
+		self.assertEqual(len({item.fingerprint for item in entry.expenses}), 2)
+
+	def test_unchanged_entry_is_not_rechecked(self):
+		self.db.set_single_value("Accounts Settings", "duplicate_expense_action", "Warn")
+		entry = make_entry(items=2)
+		validate_duplicates(entry, "validate")
+		save_entry(entry)
+		entry.load_doc_before_save()
+		entry.remarks = "Checked"
+
+		# settings only: no duplicate lookup when no item changed
+		with query_budget(2):
+			validate_duplicates(entry, "validate")
@@ -0,0 +1,82 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import sys
+import types
+import unittest
+from unittest.mock import Mock, patch
+
+import frappe
+
+from expense_request.api import get_pay_account, set_exchange_rates
+from expense_request.validation import get_link_error
+from tests.memory_frappe import new_request, query_budget
+from tests.utils import COMPANY, setup_site
+
+
+class TestExchangeRates(unittest.TestCase):
+	def setUp(self):
+		setup_site()
+		rates = {"USD": 129.5, "EUR": 140.25}
+		self.get_exchange_rate = Mock(side_effect=lambda from_currency, to_currency, date: rates[from_currency])
+
+		# erpnext is not installed here; only its rate lookup is needed
+		patcher = patch.dict(sys.modules, {
+			"erpnext": types.ModuleType("erpnext"),
+			"erpnext.setup": types.ModuleType("erpnext.setup"),
+			"erpnext.setup.utils": types.SimpleNamespace(get_exchange_rate=self.get_exchange_rate),
+		})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def make_items(self, count):
+		currencies = [None, "KES", "USD", "EUR"]
+		return [{"amount": 10, "currency": currencies[i % 4]} for i in range(count)]
+
+	def test_each_rate_is_resolved_once(self):
+		items = self.make_items(1000)
+
+		with query_budget(0):
+			set_exchange_rates(items, COMPANY, "2025-11-01")
+
+		self.assertEqual(self.get_exchange_rate.call_count, 2)
+		self.assertEqual([item["exchange_rate"] for item in items[:4]], [1, 1, 129.5, 140.25])
+		self.assertEqual(items[0]["currency"], "KES")
+
+	def test_rates_are_cached_across_requests(self):
+		set_exchange_rates(self.make_items(4), COMPANY, "2025-11-01")
+		new_request()
+		set_exchange_rates(self.make_items(4), COMPANY, "2025-11-01")
+		self.assertEqual(self.get_exchange_rate.call_count, 2)
+
+		set_exchange_rates(self.make_items(4), COMPANY, "2025-11-02")
+		self.assertEqual(self.get_exchange_rate.call_count, 4)
+
+	def test_entered_rates_are_kept(self):
+		items = [{"amount": 10, "currency": "USD", "exchange_rate": 128}]
+		set_exchange_rates(items, COMPANY, "2025-11-01")
+
+		self.assertEqual(items[0]["exchange_rate"], 128)
+		self.get_exchange_rate.assert_not_called()
+
+
+class TestAccountCurrency(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+
+	def test_foreign_currency_expense_account_is_a_link_error(self):
+		account = frappe._dict(name="Travel USD - TC", root_type="Expense", account_currency="USD")
+
+		error = get_link_error("expense_account", "Account", account.name, account, COMPANY, "KES")
+
+		self.assertEqual(
+			error, "Account Travel USD - TC is in USD, but expenses are posted in the company currency KES"
+		)
+		self.assertIsNone(get_link_error("expense_account", "Account", account.name, account, COMPANY, "USD"))
+
+	def test_foreign_currency_pay_account_is_rejected(self):
+		self.db.add("Account", {"name": "Cash USD - TC", "company": COMPANY, "account_currency": "USD"})
+		self.db.table("Mode of Payment Account")["Cash-account"].default_account = "Cash USD - TC"
+
+		with self.assertRaises(frappe.ValidationError):
+			get_pay_account("Cash", COMPANY)
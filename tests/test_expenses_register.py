@@ -0,0 +1,123 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import re
+import sqlite3
+import unittest
+
+import frappe
+
+from expense_request.expense_request.report.expenses_register import expenses_register
+from tests.utils import COMPANY, make_entry, setup_site
+
+ENTRY_COLUMNS = ["name", "company", "posting_date", "docstatus", "status", "payment_to", "mode_of_payment", "approved_by"]
+ITEM_COLUMNS = [
+	"parent", "parenttype", "idx", "expense_account", "description", "cost_center", "project", "region", "base_amount",
+]
+
+
+class TestExpensesRegister(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		self.db.add("Custom Field", {
+			"name": "Expense Entry Item-region",
+			"dt": "Expense Entry Item",
+			"fieldname": "region",
+			"label": "Region",
+			"fieldtype": "Link",
+			"options": "Region",
+		})
+
+		# three items each: Expense 0, 1 and 2 in regions 0, 1 and 0
+		make_entry(name="EXP-00001", status="Approved")
+		make_entry(name="EXP-00002").update({"posting_date": "2025-11-15", "mode_of_payment": "Bank"})
+		make_entry(name="EXP-00003").posting_date = "2025-12-01"
+		make_entry(name="EXP-00004", status="Rejected").docstatus = 2
+		make_entry(name="EXP-00005").company = "Other Company"
+		for item in self.db.table("Expense Entry Item").values():
+			item.base_amount = item.amount
+
+		self.db.on_sql(r"from `tabExpense Entry` entry", self.run_in_sqlite)
+
+	def run_in_sqlite(self, query, values):
+		"""Run the report's SQL against a copy of the stand-in's tables"""
+		connection = sqlite3.connect(":memory:")
+		connection.row_factory = sqlite3.Row
+		# the report only formats dates as '%Y-%m'
+		connection.create_function("date_format", 2, lambda value, _format: value[:7])
+
+		for doctype, columns in (("Expense Entry", ENTRY_COLUMNS), ("Expense Entry Item", ITEM_COLUMNS)):
+			connection.execute(f"create table `tab{doctype}` ({', '.join(columns)})")
+			connection.executemany(
+				f"insert into `tab{doctype}` values ({', '.join('?' * len(columns))})",
+				[[str(row.get(column)) if column == "posting_date" else row.get(column) for column in columns]
+				 for row in self.db.table(doctype).values()],
+			)
+
+		params = {}
+
+		def bind(match):
+			value = values[match.group(1)]
+			if isinstance(value, tuple):
+				params.update({f"{match.group(1)}_{i}": v for i, v in enumerate(value)})
+				return "({})".format(", ".join(f":{match.group(1)}_{i}" for i in range(len(value))))
+			params[match.group(1)] = value
+			return f":{match.group(1)}"
+
+		query = re.sub(r"%\((\w+)\)s", bind, query).replace("%%", "%")
+		return [frappe._dict(row) for row in connection.execute(query, params).fetchall()]
+
+	def run_report(self, **filters):
+		return expenses_register.execute({"company": COMPANY, **filters})
+
+	def test_lines_of_live_entries_in_the_company(self):
+		columns, data = self.run_report()
+
+		self.assertIn("region", [column["fieldname"] for column in columns])
+		self.assertEqual(
+			[(row.expense_entry, row.expense_account, row.region, row.amount) for row in data[:3]],
+			[
+				("EXP-00001", "Expense 0 - TC", "region 0", 10.5),
+				("EXP-00001", "Expense 1 - TC", "region 1", 11.5),
+				("EXP-00001", "Expense 2 - TC", "region 0", 12.5),
+			],
+		)
+		self.assertEqual([row.expense_entry for row in data[::3]], ["EXP-00001", "EXP-00002", "EXP-00003"])
+
+	def test_filters(self):
+		def entries(**filters):
+			return sorted({row.expense_entry for row in self.run_report(**filters)[1]})
+
+		self.assertEqual(entries(from_date="2025-11-15"), ["EXP-00002", "EXP-00003"])
+		self.assertEqual(entries(to_date="2025-11-15"), ["EXP-00001", "EXP-00002"])
+		self.assertEqual(entries(from_date="2025-11-02", to_date="2025-11-30"), ["EXP-00002"])
+		self.assertEqual(entries(status="Approved"), ["EXP-00001"])
+		self.assertEqual(entries(mode_of_payment="Bank"), ["EXP-00002"])
+		self.assertEqual(entries(company="Other Company"), ["EXP-00005"])
+
+		lines = self.run_report(expense_account="Expense 1 - TC", region=["region 1", "region 9"])[1]
+		self.assertEqual([(row.expense_entry, row.amount) for row in lines], [
+			("EXP-00001", 11.5), ("EXP-00002", 11.5), ("EXP-00003", 11.5),
+		])
+
+	def test_grouped_by_account(self):
+		columns, data = self.run_report(group_by="Expense Account", to_date="2025-11-30")
+
+		self.assertEqual([column["fieldname"] for column in columns], ["group_value", "entries", "lines", "amount"])
+		self.assertEqual(
+			[(row.group_value, row.entries, row.lines, row.amount) for row in data],
+			[("Expense 2 - TC", 2, 2, 25.0), ("Expense 1 - TC", 2, 2, 23.0), ("Expense 0 - TC", 2, 2, 21.0)],
+		)
+
+	def test_grouped_by_month(self):
+		data = self.run_report(group_by="Month", region="region 0")[1]
+
+		self.assertEqual(
+			[(row.group_value, row.entries, row.lines, row.amount) for row in data],
+			[("2025-11", 2, 4, 46.0), ("2025-12", 1, 2, 23.0)],
+		)
+
+	def test_invalid_filters(self):
+		for filters in ({"company": None}, {"group_by": "Owner"}, {"from_date": "2025-12-01", "to_date": "2025-11-01"}):
+			with self.assertRaises(frappe.ValidationError):
+				self.run_report(**filters)
@@ -0,0 +1,45 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import datetime
+import unittest
+
+from expense_request.accounting_dimensions_handler import get_active_dimensions
+from expense_request.exporter import get_expense_entries
+from tests.memory_frappe import query_budget
+from tests.utils import make_entry, setup_site
+
+
+class TestExpenseEntryExport(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		get_active_dimensions()
+		self.start = datetime.datetime(2025, 11, 1, 9, 0)
+		# pairs of entries share a modified timestamp, so pages split ties
+		for i in range(7):
+			entry = make_entry(items=2, name=f"EXP-{i:05d}")
+			entry.modified = self.start + datetime.timedelta(minutes=i // 2)
+
+	def test_pages_cover_every_entry_once(self):
+		names, cursor, has_more = [], None, True
+		while has_more:
+			# entries, items
+			with query_budget(2):
+				page = get_expense_entries(cursor=cursor, limit=3)
+			names += [entry.name for entry in page["entries"]]
+			cursor, has_more = page["next_cursor"], page["has_more"]
+
+		self.assertEqual(names, [f"EXP-{i:05d}" for i in range(7)])
+
+	def test_items_and_dimensions_are_included(self):
+		entry = get_expense_entries(limit=1)["entries"][0]
+
+		self.assertEqual(len(entry.expenses), 2)
+		self.assertIn("region", entry.expenses[0])
+		self.assertIn("default_branch", entry)
+
+	def test_changed_since(self):
+		page = get_expense_entries(since=str(self.start + datetime.timedelta(minutes=2)))
+
+		self.assertEqual([entry.name for entry in page["entries"]], ["EXP-00006"])
+		self.assertFalse(page["has_more"])
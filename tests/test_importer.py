@@ -0,0 +1,178 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from expense_request import api, importer
+from expense_request.accounting_dimensions_handler import get_active_dimensions
+from tests.memory_frappe import Document, query_budget, run_jobs
+from tests.utils import COMPANY, setup_site
+
+FILE_URL = "/private/files/expenses.csv"
+COLUMNS = [
+	"entry_ref", "company", "posting_date", "payment_to", "mode_of_payment",
+	"default_cost_center", "default_branch", "expense_account", "description", "amount",
+	"currency", "exchange_rate", "cost_center", "branch",
+]
+
+
+class TestExpenseImport(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		self.db.add("Mode of Payment", {"name": "Cash"})
+		self.db.add("Cost Center", [
+			{"name": "Main - TC", "company": COMPANY, "is_group": 0},
+			{"name": "All - TC", "company": COMPANY, "is_group": 1},
+		])
+		self.db.add("Account", [
+			{"name": "Fuel - TC", "company": COMPANY, "root_type": "Expense", "account_currency": "KES"},
+			{"name": "Travel - TC", "company": COMPANY, "root_type": "Expense", "account_currency": "KES"},
+			{"name": "Debtors - TC", "company": COMPANY, "root_type": "Asset", "account_currency": "KES"},
+		])
+
+		self.tempdir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.tempdir)
+		self.path = os.path.join(self.tempdir, "expenses.csv")
+		self.db.add("File", {"name": "expenses", "file_url": FILE_URL, "full_path": self.path})
+		self.db.add("Currency", {"name": "USD"})
+
+		# the Expense Entry validate hook runs on insert, as under a bench
+		insert = Document.insert
+
+		def insert_with_hooks(doc, *args, **kwargs):
+			if doc.doctype == "Expense Entry":
+				api.setup(doc, "validate")
+			return insert(doc, *args, **kwargs)
+
+		patcher = patch.object(Document, "insert", insert_with_hooks)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+		get_active_dimensions()
+		self.db.log.reset()
+
+	def write_rows(self, rows):
+		with open(self.path, "w", newline="", encoding="utf-8") as f:
+			writer = csv.DictWriter(f, fieldnames=COLUMNS)
+			writer.writeheader()
+			for row in rows:
+				writer.writerow(row)
+
+	def row(self, entry_ref, **values):
+		return {
+			"entry_ref": entry_ref,
+			"company": COMPANY,
+			"posting_date": "2025-11-01",
+			"payment_to": "Petty Cash Vendor",
+			"mode_of_payment": "Cash",
+			"default_cost_center": "Main - TC",
+			"expense_account": "Fuel - TC",
+			"description": f"Fuel {entry_ref}",
+			"amount": "100",
+			**values,
+		}
+
+	def test_consecutive_rows_are_grouped(self):
+		self.write_rows([
+			self.row("A", payment_to="  Shell  ", default_branch="Head Office"),
+			self.row("A", company="", expense_account="Travel - TC", branch="Depot"),
+			self.row("B"),
+			self.row("", description="No reference"),
+		])
+
+		entries = list(importer.iter_entries(self.path, ["branch"]))
+
+		self.assertEqual([entry["entry_ref"] for entry in entries], ["A", "B", "5"])
+		self.assertEqual(entries[0]["values"]["payment_to"], "Shell")
+		self.assertEqual(entries[0]["values"]["default_branch"], "Head Office")
+		self.assertEqual(
+			[(number, row["expense_account"], row.get("branch")) for number, row in entries[0]["rows"]],
+			[(2, "Fuel - TC", None), (3, "Travel - TC", "Depot")],
+		)
+		# entry columns come from the first row of a group only
+		self.assertNotIn("company", entries[0]["rows"][1][1])
+
+	def test_batch_is_validated_per_linked_doctype(self):
+		self.write_rows([
+			self.row("A"),
+			self.row("B", payment_to="", expense_account="Debtors - TC"),
+			self.row("C", cost_center="All - TC", amount="0"),
+			self.row("C", expense_account="Missing - TC"),
+		])
+		batch = list(importer.iter_entries(self.path, []))
+
+		# Company, Mode of Payment, Cost Center and Account, whatever the row count
+		with query_budget(4):
+			errors = importer.validate_batch(batch)
+
+		self.assertNotIn("A", errors)
+		self.assertEqual(
+			errors["B"],
+			[(3, "payment_to is required"), (3, "Account Debtors - TC is not an Expense account")],
+		)
+		self.assertEqual(
+			errors["C"],
+			[
+				(4, "amount is required"),
+				(4, "Cost Center All - TC is a group; select a ledger"),
+				(5, "Account Missing - TC does not exist"),
+			],
+		)
+
+	def test_run_import(self):
+		self.write_rows([
+			self.row("A", default_branch="Head Office"),
+			self.row("A", amount="50.255", branch="Depot"),
+			self.row("B", expense_account="Missing - TC"),
+			self.row("C", amount="12.5", currency="USD", exchange_rate="2"),
+		])
+
+		summary = importer.run_import("import-1", FILE_URL, batch_size=2)
+
+		self.assertEqual(
+			(summary["status"], summary["rows"], summary["imported"], summary["failed"]),
+			("Completed", 4, 2, 1),
+		)
+		self.assertEqual(summary["errors"], [{"row": 4, "entry_ref": "B", "error": "Account Missing - TC does not exist"}])
+		self.assertEqual(importer.get_import_status("import-1"), summary)
+
+		entries = sorted(self.db.table("Expense Entry").values(), key=lambda entry: entry.total)
+		# totals are in company currency
+		self.assertEqual([(entry.total, entry.quantity) for entry in entries], [(25.0, 1), (150.26, 2)])
+		self.assertEqual([item.branch for item in entries[1].expenses], ["Head Office", "Depot"])
+		self.assertEqual({item.cost_center for item in entries[1].expenses}, {"Main - TC"})
+
+	def test_file_needs_read_permission(self):
+		self.write_rows([self.row("A")])
+		frappe.local.denied.add(("File", "read"))
+
+		with self.assertRaises(frappe.PermissionError):
+			importer.run_import("import-2", FILE_URL)
+
+		self.assertEqual(self.db.table("Expense Entry"), {})
+		status = importer.get_import_status("import-2")
+		self.assertEqual(status["status"], "Failed")
+		self.assertTrue(status["error"])
+		self.assertEqual(
+			[(event, message["status"]) for event, message, _user in frappe.local.realtime],
+			[("expense_import_complete", "Failed")],
+		)
+
+	def test_only_the_owner_reads_the_status(self):
+		self.write_rows([self.row("A")])
+		import_id = importer.import_expense_entries(FILE_URL)["import_id"]
+		run_jobs()
+
+		frappe.local.session.user = "someone@example.com"
+		with self.assertRaises(frappe.PermissionError):
+			importer.get_import_status(import_id)
+
+		frappe.local.session.user = "Administrator"
+		self.assertEqual(importer.get_import_status(import_id)["imported"], 1)
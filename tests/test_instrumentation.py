@@ -0,0 +1,69 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import unittest
+
+import frappe
+
+from expense_request.accounting_dimensions_handler import get_active_dimensions
+from expense_request.instrumentation import get_metrics, span
+from tests import memory_frappe
+from tests.memory_frappe import new_request
+from tests.utils import DIMENSIONS, make_entry, save_entry, setup_site
+
+
+class TestInstrumentation(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		get_active_dimensions()
+
+	def test_sampled_hook_records_phases(self):
+		frappe.local.conf.expense_request_metrics_sample_rate = 1
+		entry = make_entry(items=20)
+		self.db.log.reset()
+
+		save_entry(entry, status="Approved", docstatus=1)
+
+		metrics = get_metrics()
+		self.assertEqual(metrics["setup"]["calls"], 1)
+		self.assertEqual(metrics["setup"]["items"], 20)
+		self.assertEqual(metrics["setup"]["dimensions"], len(DIMENSIONS))
+		self.assertEqual(metrics["on_update"]["queries"], len(self.db.log.queries))
+		# nested phases count their queries towards the enclosing hook too
+		self.assertLessEqual(metrics["approver"]["queries"], metrics["make_journal_entry"]["queries"])
+		self.assertNotIn("sql", vars(self.db))
+
+	def test_unsampled_hook_records_nothing(self):
+		frappe.local.conf.expense_request_metrics_sample_rate = 0
+		save_entry(make_entry(), status="Approved", docstatus=1)
+
+		self.assertEqual(get_metrics(), {})
+		self.assertIsNone(frappe.local.expense_request_trace)
+
+	def test_span_state_is_reset_after_error(self):
+		frappe.local.conf.expense_request_metrics_sample_rate = 1
+
+		with self.assertRaises(ZeroDivisionError), span("failing"):
+			1 / 0
+
+		new_request()
+		self.assertEqual(get_metrics()["failing"]["calls"], 1)
+		self.assertNotIn("sql", vars(self.db))
+
+	def test_failing_size_leaves_db_unpatched(self):
+		frappe.local.conf.expense_request_metrics_sample_rate = 1
+
+		with self.assertRaises(ZeroDivisionError), span("failing", lambda: 1 / 0):
+			pass
+
+		self.assertNotIn("sql", vars(self.db))
+		self.assertIsNone(getattr(frappe.local, "expense_request_trace", None))
+
+	def test_patched_db_is_restored_when_replaced(self):
+		frappe.local.conf.expense_request_metrics_sample_rate = 1
+
+		with span("reconnect"):
+			frappe.local.db = memory_frappe.Database()
+
+		self.assertNotIn("sql", vars(self.db))
+		self.assertNotIn("sql", vars(frappe.local.db))
@@ -0,0 +1,65 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import unittest
+from decimal import Decimal
+
+from expense_request import journal_builder
+
+DIMENSIONS = [{"fieldname": "branch", "label": "Branch"}]
+
+
+class TestJournalBuilder(unittest.TestCase):
+	def make_entry(self):
+		entry = {"name": "EXP-TEST-00001", "default_branch": "Head Office"}
+		items = [
+			{"amount": 0.1, "description": "Taxi", "expense_account": "Travel - TC", "cost_center": "Main - TC"},
+			{"amount": 0.2, "description": "Fuel", "expense_account": "Fuel - TC", "project": "PROJ-0001", "branch": "Depot"},
+		]
+		return entry, items
+
+	def test_totals_use_decimal_accumulation(self):
+		entry, items = self.make_entry()
+		plan = journal_builder.build(entry, items, DIMENSIONS)
+
+		self.assertEqual(plan.total, Decimal("0.3"))
+		self.assertEqual(plan.quantity, 2)
+
+	def test_defaults_fill_only_empty_dimensions(self):
+		entry, items = self.make_entry()
+		plan = journal_builder.build(entry, items, DIMENSIONS)
+
+		self.assertEqual(plan.defaults, {0: {"branch": "Head Office"}})
+		self.assertNotIn("branch", items[0])
+
+	def test_journal_lines_balance(self):
+		entry, items = self.make_entry()
+		plan = journal_builder.build(entry, items, DIMENSIONS, pay_account="Cash - TC")
+		debit, other, credit = plan.accounts
+
+		self.assertEqual(debit, {
+			"debit_in_account_currency": 0.1,
+			"user_remark": "Taxi",
+			"account": "Travel - TC",
+			"cost_center": "Main - TC",
+			"branch": "Head Office",
+		})
+		self.assertEqual(other["branch"], "Depot")
+		self.assertEqual(credit["credit_in_account_currency"], 0.3)
+		self.assertEqual(credit["account"], "Cash - TC")
+		self.assertEqual(credit["project"], "PROJ-0001")
+		self.assertEqual(credit["branch"], "Head Office")
+
+	def test_no_lines_without_pay_account(self):
+		entry, items = self.make_entry()
+		self.assertEqual(journal_builder.build(entry, items, DIMENSIONS).accounts, [])
+
+	def test_foreign_items_post_in_company_currency(self):
+		entry, items = self.make_entry()
+		items[1].update({"amount": 25, "currency": "USD", "exchange_rate": 129.3456})
+		plan = journal_builder.build(entry, items, DIMENSIONS, pay_account="Cash - TC")
+
+		self.assertEqual(plan.base_amounts, [Decimal("0.10"), Decimal("3233.64")])
+		self.assertEqual(plan.total, Decimal("3233.74"))
+		self.assertEqual(plan.accounts[1]["debit_in_account_currency"], 3233.64)
+		self.assertEqual(plan.accounts[2]["credit_in_account_currency"], 3233.74)
@@ -0,0 +1,77 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import unittest
+from unittest.mock import Mock, patch
+
+import frappe
+
+from expense_request import lookups
+from expense_request.lookups import LookupCache, get_mode_of_payment_account, on_mode_of_payment_change
+from tests.memory_frappe import query_budget
+from tests.utils import COMPANY, setup_site
+
+
+class TestLookupCache(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		self.cache = LookupCache("test_lookup", maxsize=2)
+
+	def test_none_results_are_cached(self):
+		generator = Mock(return_value=None)
+
+		self.assertIsNone(self.cache.get("missing", generator))
+		self.assertIsNone(self.cache.get("missing", generator))
+
+		generator.assert_called_once()
+		self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+	def test_least_recently_used_entry_is_evicted(self):
+		for key in ("a", "b"):
+			self.cache.get(key, lambda key=key: key.upper())
+		self.cache.get("a", Mock())
+		self.cache.get("c", lambda: "C")
+
+		generator = Mock(return_value="B")
+		self.cache.get("a", Mock())
+		self.cache.get("b", generator)
+		generator.assert_called_once()
+		self.assertEqual(self.cache.stats()["size"], 2)
+
+	def test_entries_expire(self):
+		generator = Mock(return_value=1)
+		with patch.object(lookups.time, "monotonic", side_effect=[0, 299, 301]):
+			for _i in range(3):
+				self.cache.get("rate", generator)
+
+		self.assertEqual(generator.call_count, 2)
+
+	def test_invalidation_reaches_other_workers(self):
+		# two worker processes holding their own copy of the same cache
+		other_worker = LookupCache("test_lookup")
+		self.cache.get("key", lambda: "old")
+		other_worker.get("key", lambda: "old")
+
+		self.cache.invalidate()
+
+		self.assertEqual(self.cache.get("key", lambda: "new"), "new")
+		self.assertEqual(other_worker.get("key", lambda: "new"), "new")
+
+	def test_sites_are_kept_apart(self):
+		self.cache.get("key", lambda: "site one")
+		frappe.local.site = "other_site"
+
+		self.assertEqual(self.cache.get("key", lambda: "site two"), "site two")
+
+		frappe.local.site = "test_site"
+		self.assertEqual(self.cache.get("key", Mock()), "site one")
+
+	def test_mode_of_payment_change_invalidates_pay_accounts(self):
+		self.assertEqual(get_mode_of_payment_account("Cash", COMPANY), "Cash - TC")
+		self.db.table("Mode of Payment Account")["Cash-account"].default_account = "Petty Cash - TC"
+
+		with query_budget(0):
+			self.assertEqual(get_mode_of_payment_account("Cash", COMPANY), "Cash - TC")
+
+		on_mode_of_payment_change(None, "on_update")
+		self.assertEqual(get_mode_of_payment_account("Cash", COMPANY), "Petty Cash - TC")
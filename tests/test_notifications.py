@@ -0,0 +1,102 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import unittest
+
+import frappe
+
+from expense_request import notifications
+from tests.memory_frappe import new_request, query_budget
+from tests.utils import make_entry, setup_site
+
+
+class TestApprovalDigest(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		self.db.set_single_value("Accounts Settings", "notify_all_approvers", 1)
+		self.db.set_single_value("Accounts Settings", "approver_notification_mode", "Digest")
+		self.db.add("Workflow Transition", {
+			"name": "approve",
+			"parent": "Expense Approval",
+			"action": "Approve",
+			"allowed": "Accounts User",
+		})
+		self.db.add("User", [
+			{"name": f"approver{i}@example.com", "email": f"approver{i}@example.com", "enabled": 1, "user_type": "System User"}
+			for i in range(3)
+		])
+		self.db.add("Has Role", [
+			{"name": f"role{i}", "parenttype": "User", "parent": f"approver{i}@example.com", "role": "Accounts User"}
+			for i in range(3)
+		])
+
+	def test_one_message_per_approver(self):
+		for i in range(40):
+			make_entry(name=f"EXP-{i:05d}")
+
+		# settings, entries, approvers (3), user permissions, one email per
+		# approver, mark entries
+		with query_budget(2 + 1 + 3 + 1 + 3 + 1):
+			notifications.send_approval_digests()
+
+		self.assertEqual(len(frappe.local.outbox), 3)
+		self.assertEqual(frappe.local.outbox[0].subject, "40 Expense Entries awaiting approval")
+
+	def test_entries_are_digested_once(self):
+		make_entry(name="EXP-00001")
+		notifications.send_approval_digests()
+		new_request()
+
+		notifications.send_approval_digests()
+		self.assertEqual(len(frappe.local.outbox), 3)
+
+		make_entry(name="EXP-00002")
+		notifications.send_approval_digests()
+		self.assertEqual(len(frappe.local.outbox), 6)
+		self.assertIn("EXP-00002", frappe.local.outbox[-1].message)
+		self.assertNotIn("EXP-00001", frappe.local.outbox[-1].message)
+
+	def test_approvers_only_see_their_companies(self):
+		make_entry(name="EXP-00001")
+		make_entry(name="EXP-00002").company = "Other Company"
+		self.db.add("User Permission", [
+			{
+				"name": "perm0",
+				"user": "approver0@example.com",
+				"allow": "Company",
+				"for_value": "Other Company",
+				"apply_to_all_doctypes": 1,
+			},
+			{
+				# restricts Sales Invoices only
+				"name": "perm1",
+				"user": "approver1@example.com",
+				"allow": "Company",
+				"for_value": "Other Company",
+				"apply_to_all_doctypes": 0,
+				"applicable_for": "Sales Invoice",
+			},
+		])
+
+		self.assertEqual(notifications.send_approval_digests(), 3)
+
+		messages = {mail.recipients[0]: mail.message for mail in frappe.local.outbox}
+		self.assertNotIn("EXP-00001", messages["approver0@example.com"])
+		self.assertIn("EXP-00002", messages["approver0@example.com"])
+		for email in ("approver1@example.com", "approver2@example.com"):
+			self.assertIn("EXP-00001", messages[email])
+			self.assertIn("EXP-00002", messages[email])
+
+	def test_pending_entry_skips_per_entry_notification(self):
+		entry = make_entry()
+		notifications.suppress_entry_notification(entry, "validate")
+
+		self.assertEqual(entry.flags.notifications_executed, [notifications.APPROVER_NOTIFICATION])
+
+	def test_per_entry_notification_is_kept_without_digest(self):
+		self.db.set_single_value("Accounts Settings", "notify_all_approvers", 0)
+		entry = make_entry()
+		notifications.suppress_entry_notification(entry, "validate")
+
+		self.assertIsNone(entry.flags.notifications_executed)
+		self.assertIsNone(notifications.send_approval_digests())
@@ -0,0 +1,109 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import datetime
+import unittest
+
+import frappe
+
+from expense_request import posting
+from tests.memory_frappe import query_budget, run_jobs
+from tests.utils import make_entry, setup_site
+
+
+def minutes_from_now(value):
+	return round((value - datetime.datetime.now()).total_seconds() / 60)
+
+
+class TestPosting(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		self.entry = make_entry(status="Approved")
+
+	def get_entry(self):
+		return self.db.table("Expense Entry")[self.entry.name]
+
+	def test_queued_entry_is_posted(self):
+		posting.queue_journal_entry(self.entry)
+		self.assertEqual(self.get_entry().posting_status, "Queued")
+		self.assertEqual(minutes_from_now(self.get_entry().next_posting_attempt), posting.STALE_QUEUE_MINUTES)
+
+		run_jobs()
+
+		entry = self.get_entry()
+		self.assertEqual((entry.posting_status, entry.journal_entry), ("Posted", "JE-00001"))
+		self.assertIsNone(entry.next_posting_attempt)
+		self.assertEqual(self.db.get_value("Expense Journal Link", entry.name, "journal_entry"), "JE-00001")
+
+	def test_failure_is_recorded_with_backoff(self):
+		self.entry.mode_of_payment = "Cheque"
+
+		self.assertIsNone(posting.post_expense_entry(self.entry.name))
+
+		entry = self.get_entry()
+		self.assertEqual((entry.posting_status, entry.posting_attempts), ("Failed", 1))
+		self.assertIn("Payment Reference and Date are Required", entry.posting_error)
+		self.assertEqual(minutes_from_now(entry.next_posting_attempt), posting.POSTING_BACKOFF_MINUTES)
+		self.assertEqual(self.db.table("Journal Entry"), {})
+
+	def test_backoff_doubles_with_each_attempt(self):
+		delays = []
+		for _ in range(posting.MAX_POSTING_ATTEMPTS - 1):
+			posting.mark_failed(self.entry.name, "Closed period")
+			delays.append(minutes_from_now(self.get_entry().next_posting_attempt))
+		self.assertEqual(delays, [2, 4, 8, 16])
+
+	def test_no_retry_after_the_last_attempt(self):
+		self.entry.posting_attempts = posting.MAX_POSTING_ATTEMPTS - 1
+		posting.mark_failed(self.entry.name, "Closed period")
+
+		entry = self.get_entry()
+		self.assertEqual((entry.posting_status, entry.posting_attempts), ("Failed", posting.MAX_POSTING_ATTEMPTS))
+		self.assertIsNone(entry.next_posting_attempt)
+
+		entry.modified = datetime.datetime(2025, 1, 1)
+		posting.retry_failed_postings()
+		self.assertEqual(frappe.local.jobs, [])
+
+
+class TestRetryFailedPostings(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		now = datetime.datetime.now()
+		past, future = now - datetime.timedelta(minutes=1), now + datetime.timedelta(minutes=10)
+		long_ago = datetime.datetime(2025, 1, 1)
+
+		states = [
+			("Failed", past),  # backoff over
+			("Failed", future),  # still backing off
+			("Failed", None),  # out of attempts
+			("Queued", past),  # worker lost
+			("Queued", future),  # waiting for a worker
+			("Posting", past),  # worker died mid-post
+			("Posted", None),
+		]
+		for i, (status, next_attempt) in enumerate(states):
+			entry = make_entry(status="Approved", name=f"EXP-{i:05d}")
+			# an approval long ago must not make a fresh queue entry look stale
+			entry.update({"posting_status": status, "next_posting_attempt": next_attempt, "modified": long_ago})
+		self.db.log.reset()
+
+	def test_due_and_stale_entries_are_requeued(self):
+		# one read and one update for all due entries
+		with query_budget(2):
+			posting.retry_failed_postings()
+
+		queued = [job.kwargs["expense_entry_name"] for job in frappe.local.jobs]
+		self.assertEqual(queued, ["EXP-00000", "EXP-00003", "EXP-00005"])
+		for name in queued:
+			entry = self.db.table("Expense Entry")[name]
+			self.assertEqual(entry.posting_status, "Queued")
+			self.assertEqual(minutes_from_now(entry.next_posting_attempt), posting.STALE_QUEUE_MINUTES)
+		self.assertEqual(self.db.table("Expense Entry")["EXP-00001"].posting_status, "Failed")
+
+	def test_requeued_entries_are_not_enqueued_again_on_the_next_tick(self):
+		posting.retry_failed_postings()
+		frappe.local.jobs.clear()
+
+		posting.retry_failed_postings()
+		self.assertEqual(frappe.local.jobs, [])
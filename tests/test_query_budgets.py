@@ -0,0 +1,147 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+"""Query budgets for the save, approve, post and dimension sync paths.
+
+Runs against the in-memory frappe stand-in, so a change that adds queries to
+these paths fails in plain pytest.
+"""
+
+import unittest
+
+import frappe
+
+from expense_request import accounting_dimensions_handler, api
+from expense_request.accounting_dimensions_handler import (
+	get_active_dimensions,
+	get_dimension_payload,
+	get_dimension_payload_for_client,
+)
+from tests.memory_frappe import new_request, query_budget, run_jobs
+from tests.utils import COMPANY, DIMENSIONS, make_entry, save_entry, setup_site
+
+
+class TestQueryBudgets(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+
+	def warm_up(self):
+		get_active_dimensions()
+		new_request()
+		self.db.log.reset()
+
+	def test_save_pending_entry(self):
+		self.warm_up()
+		entry = make_entry(items=300)
+
+		with query_budget(0):
+			api.setup(entry, "validate")
+			api.on_update(entry, "on_update")
+
+		self.assertEqual(entry.quantity, 300)
+
+	def test_save_without_item_changes_skips_recompute(self):
+		self.warm_up()
+		entry = make_entry(items=5)
+		save_entry(entry)
+		entry.total = None
+
+		save_entry(entry, remarks="Checked")
+		self.assertIsNone(entry.total)
+
+		save_entry(entry, expenses=entry.expenses[:4])
+		self.assertEqual(entry.quantity, 4)
+
+	def test_approve_entry(self):
+		self.warm_up()
+		entry = make_entry(items=50)
+
+		# approver name, approved_by, consolidation setting, queued status
+		with query_budget(4):
+			save_entry(entry, status="Approved", docstatus=1)
+
+		self.assertEqual(entry.posting_status, "Queued")
+		self.assertEqual(len(frappe.local.jobs), 1)
+
+	def test_repeat_save_of_approved_entry_does_not_requeue(self):
+		self.warm_up()
+		entry = make_entry()
+		save_entry(entry, status="Approved", docstatus=1)
+		new_request()
+
+		with query_budget(0):
+			save_entry(entry)
+
+		self.assertEqual(len(frappe.local.jobs), 1)
+
+	def test_post_journal_entry(self):
+		self.warm_up()
+		entry = make_entry(items=50)
+		save_entry(entry, status="Approved", docstatus=1)
+		new_request()
+		self.db.log.reset()
+
+		# entry load + items, registry lookup, posting status, registry claim,
+		# pay account, JE insert + 51 rows, submit, registry link, posted status
+		with query_budget(61):
+			(journal_entry,) = run_jobs()
+
+		je = self.db.table("Journal Entry")[journal_entry]
+		debit = sum(row.get("debit_in_account_currency") or 0 for row in je.accounts)
+		credit = sum(row.get("credit_in_account_currency") or 0 for row in je.accounts)
+		self.assertAlmostEqual(debit, credit)
+		self.assertEqual(self.db.table("Expense Journal Link")[entry.name].journal_entry, journal_entry)
+		self.assertEqual(entry.posting_status, "Posted")
+
+	def test_posting_is_idempotent(self):
+		entry = save_entry(make_entry(), status="Approved", docstatus=1)
+		run_jobs()
+
+		from expense_request.posting import post_expense_entry
+
+		post_expense_entry(entry.name)
+		self.assertEqual(len(self.db.table("Journal Entry")), 1)
+
+	def test_form_onload_dimension_payload(self):
+		self.db.add("Accounting Dimension Detail", {
+			"name": "branch-default",
+			"parenttype": "Accounting Dimension",
+			"parent": "Branch",
+			"company": COMPANY,
+			"default_dimension": "Head Office",
+		})
+
+		# dimensions, dimension defaults
+		with query_budget(2):
+			payload = get_dimension_payload()
+
+		self.assertEqual(payload["company_defaults"], {COMPANY: {"branch": "Head Office"}})
+		self.assertEqual([d["fieldname"] for d in payload["dimensions"]], list(DIMENSIONS))
+
+		new_request()
+		with query_budget(0):
+			self.assertEqual(get_dimension_payload_for_client(payload["version"]), {"version": payload["version"]})
+
+		self.db.table("Accounting Dimension")["Region"].label = "Sales Region"
+		accounting_dimensions_handler.on_dimension_change(self.db.table("Accounting Dimension")["Region"], "on_update")
+		self.assertNotEqual(get_dimension_payload()["version"], payload["version"])
+
+	def test_dimension_sync(self):
+		fields = 4 * len(DIMENSIONS) + 1
+
+		# dimensions, custom fields, then a lookup and insert per new field
+		with query_budget(2 + 2 * fields) as log:
+			accounting_dimensions_handler.sync_all_accounting_dimensions()
+
+		self.assertEqual(len(self.db.table("Custom Field")), fields)
+		self.assertEqual(sorted(log.schema_changes), sorted(accounting_dimensions_handler.DIMENSION_DOCTYPES))
+		self.assertEqual(sorted(log.cache_clears), sorted(accounting_dimensions_handler.DIMENSION_DOCTYPES))
+
+	def test_dimension_sync_without_changes(self):
+		accounting_dimensions_handler.sync_all_accounting_dimensions()
+		self.db.log.reset()
+
+		with query_budget(2) as log:
+			accounting_dimensions_handler.sync_all_accounting_dimensions()
+
+		self.assertEqual(log.schema_changes, [])
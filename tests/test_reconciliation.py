@@ -0,0 +1,350 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import datetime
+import importlib
+import unittest
+
+import frappe
+
+from expense_request import hooks
+from expense_request.consolidation import get_unposted_entry_groups
+from expense_request.journal_registry import release_journal_entry
+from expense_request.posting import MAX_POSTING_ATTEMPTS
+from expense_request.reconciliation import (
+	MISMATCHED,
+	MISSING,
+	ORPHAN,
+	get_mismatched_journal_entries,
+	get_missing_journal_entries,
+	get_orphan_journal_entries,
+	reconcile,
+	requeue_missing_entries,
+)
+from tests.memory_frappe import query_budget
+from tests.utils import COMPANY, make_entry, setup_site
+
+LONG_AGO = datetime.datetime(2025, 1, 1)
+
+
+class ReconciliationTestCase(unittest.TestCase):
+	"""Answers the reconciliation queries from the stand-in's tables"""
+
+	def setUp(self):
+		self.db = setup_site()
+		self.db.on_sql(r"as journal_entry_docstatus", self.select_missing)
+		self.db.on_sql(r"`tabExpense Entry Journal Reference` ref", self.select_mismatched)
+		self.db.on_sql(r"union all", self.select_orphans)
+		self.db.on_sql(r"update `tabExpense Entry` entry", self.adopt_registered)
+
+	def add_journal_entry(self, name, total_debit, docstatus=1, **values):
+		self.db.add("Journal Entry", {
+			"name": name, "company": COMPANY, "total_debit": total_debit, "docstatus": docstatus, **values,
+		})
+
+	def register(self, expense_entry, journal_entry):
+		self.db.add("Expense Journal Link", {"name": expense_entry, "expense_entry": expense_entry, "journal_entry": journal_entry})
+
+	# ---- SQL answered from memory ----
+
+	def get_rows(self, doctype):
+		return list(self.db.table(doctype).values())
+
+	def get_submitted(self, doctype, name):
+		row = self.db.table(doctype).get(name)
+		return row if row and row.docstatus == 1 else None
+
+	def in_company(self, row, values):
+		return not values["company"] or row.company == values["company"]
+
+	def select_missing(self, query, values):
+		rows = []
+		for entry in sorted(self.get_rows("Expense Entry"), key=lambda entry: entry.name):
+			link = self.db.table("Expense Journal Link").get(entry.name)
+			journal_entry = self.db.table("Journal Entry").get(link.journal_entry) if link else None
+			if (
+				entry.docstatus == 1
+				and entry.status == "Approved"
+				and entry.modified < values["cutoff"]
+				and entry.posting_status != "Cancelled"
+				and (journal_entry.docstatus if journal_entry else 0) != 1
+				and self.in_company(entry, values)
+			):
+				rows.append(frappe._dict(
+					expense_entry=entry.name,
+					company=entry.company,
+					total=entry.total,
+					posting_status=entry.posting_status,
+					posting_attempts=entry.posting_attempts,
+					posting_error=entry.posting_error,
+					registered=1 if link else 0,
+					journal_entry=link.journal_entry if link else None,
+					journal_entry_docstatus=journal_entry.docstatus if journal_entry else None,
+				))
+		return rows
+
+	def select_mismatched(self, query, values):
+		rows = []
+		for entry in sorted(self.get_rows("Expense Entry"), key=lambda entry: entry.name):
+			link = self.db.table("Expense Journal Link").get(entry.name)
+			journal_entry = self.get_submitted("Journal Entry", link.journal_entry) if link else None
+			if entry.docstatus != 1 or not journal_entry or not self.in_company(entry, values):
+				continue
+			reference = next(
+				(row for row in journal_entry.get("expense_entries") or [] if row["expense_entry"] == entry.name),
+				None,
+			)
+			amount = reference["amount"] if reference else journal_entry.total_debit
+			if abs(amount - entry.total) >= 0.005:
+				rows.append(frappe._dict(
+					expense_entry=entry.name, company=entry.company, total=entry.total,
+					journal_entry=journal_entry.name, journal_amount=amount,
+				))
+		return rows
+
+	def select_orphans(self, query, values):
+		rows = []
+		links = self.get_rows("Expense Journal Link")
+		for link in links:
+			journal_entry = self.get_submitted("Journal Entry", link.journal_entry)
+			if journal_entry and not self.get_submitted("Expense Entry", link.name) and self.in_company(journal_entry, values):
+				rows.append(frappe._dict(
+					expense_entry=link.name, company=journal_entry.company, journal_entry=journal_entry.name,
+					journal_amount=journal_entry.total_debit, registered=1,
+				))
+		for journal_entry in self.get_rows("Journal Entry"):
+			if (
+				journal_entry.docstatus == 1
+				and self.get_submitted("Expense Entry", journal_entry.get("bill_no"))
+				and not any(link.journal_entry == journal_entry.name for link in links)
+				and self.in_company(journal_entry, values)
+			):
+				rows.append(frappe._dict(
+					expense_entry=journal_entry.bill_no, company=journal_entry.company,
+					journal_entry=journal_entry.name, journal_amount=journal_entry.total_debit,
+					registered=1 if self.db.table("Expense Journal Link").get(journal_entry.bill_no) else 0,
+				))
+		return sorted(rows, key=lambda row: row.expense_entry)
+
+	def adopt_registered(self, query, values):
+		for name in values["names"]:
+			link = self.db.table("Expense Journal Link").get(name)
+			if link:
+				self.db.table("Expense Entry")[name].update({
+					"journal_entry": link.journal_entry, "posting_status": "Posted",
+					"posting_error": None, "next_posting_attempt": None,
+				})
+		return []
+
+
+class TestRequeueMissingEntries(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		self.missing = []
+		states = [(None, 0), ("Failed", 1), ("Failed", MAX_POSTING_ATTEMPTS), ("Posted", 0)]
+		for i, (status, attempts) in enumerate(states):
+			entry = make_entry(status="Approved", name=f"EXP-{i:05d}")
+			entry.update({"posting_status": status, "posting_attempts": attempts})
+			self.missing.append(frappe._dict(expense_entry=entry.name, posting_status=status, posting_attempts=attempts))
+		self.db.add("Expense Journal Link", {"name": "EXP-00003", "expense_entry": "EXP-00003", "journal_entry": "JV-DELETED"})
+		self.missing[3].update({"registered": 1, "journal_entry": "JV-DELETED"})
+		self.db.log.reset()
+
+	def test_requeues_in_one_batch(self):
+		# settings, then registry cleanup and status reset per batch
+		with query_budget(3):
+			self.assertEqual(requeue_missing_entries(self.missing), 2)
+
+		queued = [job.kwargs["expense_entry_name"] for job in frappe.local.jobs]
+		self.assertEqual(queued, ["EXP-00000", "EXP-00003"])
+		self.assertFalse(self.db.exists("Expense Journal Link", "EXP-00003"))
+		self.assertEqual(self.db.get_value("Expense Entry", "EXP-00003", "posting_status"), "Queued")
+
+	def test_failed_entries_are_left_alone(self):
+		requeue_missing_entries(self.missing)
+
+		# retries left belong to the retry job; exhausted ones are report-only
+		self.assertEqual(self.db.get_value("Expense Entry", "EXP-00001", "posting_attempts"), 1)
+		self.assertEqual(self.db.get_value("Expense Entry", "EXP-00002", "posting_status"), "Failed")
+		self.assertEqual(self.db.get_value("Expense Entry", "EXP-00002", "posting_attempts"), MAX_POSTING_ATTEMPTS)
+
+	def test_claims_in_progress_are_left_alone(self):
+		# a worker claimed the entries and has not linked its Journal Entry yet
+		claimed = []
+		for i, status in ((4, "Posting"), (5, None)):
+			entry = make_entry(status="Approved", name=f"EXP-{i:05d}")
+			entry.posting_status = status
+			self.db.add("Expense Journal Link", {"name": entry.name, "expense_entry": entry.name})
+			claimed.append(frappe._dict(expense_entry=entry.name, posting_status=status, registered=1))
+		queued = make_entry(status="Approved", name="EXP-00006")
+		queued.posting_status = "Queued"
+		claimed.append(frappe._dict(expense_entry=queued.name, posting_status="Queued"))
+
+		self.assertEqual(requeue_missing_entries(claimed), 0)
+
+		self.assertEqual(frappe.local.jobs, [])
+		self.assertTrue(self.db.exists("Expense Journal Link", "EXP-00004"))
+		self.assertTrue(self.db.exists("Expense Journal Link", "EXP-00005"))
+		self.assertEqual(self.db.get_value("Expense Entry", "EXP-00004", "posting_status"), "Posting")
+
+	def test_draft_journal_entry_is_released(self):
+		self.missing[3].journal_entry_docstatus = 0
+		requeue_missing_entries(self.missing)
+		self.assertFalse(self.db.exists("Expense Journal Link", "EXP-00003"))
+
+		# a cancelled one whose cancel hook did not run is only reported
+		self.db.add("Expense Journal Link", {"name": "EXP-00003", "expense_entry": "EXP-00003", "journal_entry": "JV-CANCELLED"})
+		self.missing[3].update({"journal_entry": "JV-CANCELLED", "journal_entry_docstatus": 2})
+		frappe.local.jobs.clear()
+		requeue_missing_entries(self.missing[3:])
+		self.assertTrue(self.db.exists("Expense Journal Link", "EXP-00003"))
+		self.assertEqual(frappe.local.jobs, [])
+
+	def test_consolidated_entries_are_left_for_consolidation(self):
+		self.db.set_single_value("Accounts Settings", "consolidate_expense_journal_entries", 1)
+		requeue_missing_entries(self.missing)
+
+		self.assertEqual(frappe.local.jobs, [])
+		self.assertIsNone(self.db.get_value("Expense Entry", "EXP-00000", "posting_status"))
+
+
+class TestReconcile(ReconciliationTestCase):
+	def setUp(self):
+		super().setUp()
+		states = [
+			# posting_status, registered Journal Entry
+			(None, None),  # never posted
+			("Posted", "JV-0001"),  # posted
+			("Posted", "JV-0002"),  # posted for the wrong amount
+			(None, None),  # posted, but the registry was never written
+			("Posted", "JV-0004"),  # entry cancelled afterwards
+			("Cancelled", None),  # Journal Entry cancelled on purpose
+			(None, None),  # approved just now
+			("Queued", None),  # left to the retry job
+			("Posted", "JV-0008"),  # consolidated
+		]
+		for i, (status, journal_entry) in enumerate(states):
+			entry = make_entry(status="Approved", name=f"EXP-{i:05d}")
+			entry.update({"total": 34.5, "posting_status": status, "journal_entry": journal_entry, "modified": LONG_AGO})
+			if journal_entry:
+				self.register(entry.name, journal_entry)
+
+		self.add_journal_entry("JV-0001", 34.5, bill_no="EXP-00001")
+		self.add_journal_entry("JV-0002", 30, bill_no="EXP-00002")
+		self.add_journal_entry("JV-0003", 34.5, bill_no="EXP-00003")
+		self.add_journal_entry("JV-0004", 34.5, bill_no="EXP-00004")
+		self.add_journal_entry("JV-0008", 100, expense_entries=[{"expense_entry": "EXP-00008", "amount": 34.5}])
+		# a second Journal Entry for an entry that already has one
+		self.add_journal_entry("JV-0009", 34.5, bill_no="EXP-00001")
+
+		self.db.table("Expense Entry")["EXP-00004"].docstatus = 2
+		self.db.table("Expense Entry")["EXP-00006"].modified = datetime.datetime.now()
+		self.db.log.reset()
+
+	def names(self, rows):
+		return [(row.expense_entry, row.get("journal_entry")) for row in rows]
+
+	def test_missing_journal_entries(self):
+		self.assertEqual(
+			self.names(get_missing_journal_entries()),
+			[("EXP-00000", None), ("EXP-00003", None), ("EXP-00007", None)],
+		)
+		self.assertEqual(get_missing_journal_entries("Other Company"), [])
+
+	def test_mismatched_journal_entries(self):
+		rows = get_mismatched_journal_entries()
+		self.assertEqual(self.names(rows), [("EXP-00002", "JV-0002")])
+		self.assertEqual((rows[0].total, rows[0].journal_amount), (34.5, 30))
+
+	def test_orphan_journal_entries(self):
+		rows = get_orphan_journal_entries()
+		self.assertEqual(
+			[(row.expense_entry, row.journal_entry, row.registered) for row in rows],
+			[("EXP-00001", "JV-0009", 1), ("EXP-00003", "JV-0003", 0), ("EXP-00004", "JV-0004", 1)],
+		)
+
+	def test_reconcile_adopts_then_requeues(self):
+		summary = reconcile()
+
+		self.assertEqual(summary["repaired"], {"adopted": 1, "requeued": 1})
+
+		# the unregistered Journal Entry is adopted, not posted again
+		adopted = self.db.table("Expense Entry")["EXP-00003"]
+		self.assertEqual((adopted.journal_entry, adopted.posting_status), ("JV-0003", "Posted"))
+		self.assertEqual(self.db.get_value("Expense Journal Link", "EXP-00003", "journal_entry"), "JV-0003")
+		self.assertEqual([job.kwargs["expense_entry_name"] for job in frappe.local.jobs], ["EXP-00000"])
+		self.assertEqual(self.db.get_value("Expense Entry", "EXP-00000", "posting_status"), "Queued")
+
+		# what is left needs a person, or is still with the posting queue
+		self.assertEqual(self.names(summary["rows"][MISSING]), [("EXP-00000", None), ("EXP-00007", None)])
+		self.assertEqual(self.names(summary["rows"][MISMATCHED]), [("EXP-00002", "JV-0002")])
+		self.assertEqual(self.names(summary["rows"][ORPHAN]), [("EXP-00001", "JV-0009"), ("EXP-00004", "JV-0004")])
+		self.assertEqual(self.db.get_value("Expense Journal Link", "EXP-00001", "journal_entry"), "JV-0001")
+
+	def test_report_only_run_repairs_nothing(self):
+		summary = reconcile(repair=False)
+
+		self.assertEqual(summary["counts"], {MISSING: 3, MISMATCHED: 1, ORPHAN: 3})
+		self.assertEqual(frappe.local.jobs, [])
+		self.assertFalse(self.db.exists("Expense Journal Link", "EXP-00003"))
+
+
+class TestCancelledJournalEntry(ReconciliationTestCase):
+	def setUp(self):
+		super().setUp()
+		entry = make_entry(status="Approved")
+		entry.update({"journal_entry": "JV-0001", "posting_status": "Posted", "total": 34.5, "modified": LONG_AGO})
+		self.register(entry.name, "JV-0001")
+		self.add_journal_entry("JV-0001", 34.5, bill_no=entry.name)
+		self.entry = entry
+
+	def cancel_journal_entry(self, name, skip=()):
+		"""Cancel as frappe does: ERPNext's on_cancel, this app's on_cancel
+		hooks, then the check for submitted documents still linking to it"""
+		journal_entry = self.db.table("Journal Entry")[name]
+		journal_entry.docstatus = 2
+		journal_entry.ignore_linked_doctypes = ("GL Entry", "Payment Ledger Entry")
+
+		for path in hooks.doc_events["Journal Entry"]["on_cancel"]:
+			module, _, function = path.rpartition(".")
+			if function not in skip:
+				getattr(importlib.import_module(module), function)(journal_entry, "on_cancel")
+
+		for doctype, rows in self.db.tables.items():
+			if doctype in journal_entry.ignore_linked_doctypes:
+				continue
+			fieldnames = [df.fieldname for df in frappe.get_meta(doctype).get_link_fields() if df.options == "Journal Entry"]
+			for row in rows.values():
+				if row.docstatus == 1 and any(row.get(fieldname) == name for fieldname in fieldnames):
+					raise frappe.LinkExistsError(f"Cannot cancel: {doctype} {row.name} is linked")
+
+	def test_journal_entry_is_cancelled_on_its_own(self):
+		# linked without a registry row, so release leaves the link in place
+		entry = make_entry(status="Approved", name="EXP-00002")
+		entry.update({"journal_entry": "JV-0002", "posting_status": "Posted"})
+		self.add_journal_entry("JV-0002", 34.5)
+
+		with self.assertRaises(frappe.LinkExistsError):
+			self.cancel_journal_entry("JV-0002", skip=("ignore_expense_entry_links",))
+
+		self.db.table("Journal Entry")["JV-0002"].docstatus = 1
+		self.cancel_journal_entry("JV-0002")
+
+		self.assertEqual(self.db.table("Journal Entry")["JV-0002"].docstatus, 2)
+		self.assertEqual(entry.docstatus, 1)
+
+	def test_cancel_then_reconcile_does_not_repost(self):
+		self.cancel_journal_entry("JV-0001")
+
+		self.assertEqual(self.db.get_value("Expense Entry", self.entry.name, "posting_status"), "Cancelled")
+		self.assertFalse(self.db.exists("Expense Journal Link", self.entry.name))
+
+		summary = reconcile()
+
+		self.assertEqual(summary["counts"], {MISSING: 0, MISMATCHED: 0, ORPHAN: 0})
+		self.assertEqual(frappe.local.jobs, [])
+		self.assertEqual(self.db.get_value("Expense Entry", self.entry.name, "posting_status"), "Cancelled")
+
+	def test_cancelled_entries_are_not_consolidated(self):
+		release_journal_entry(frappe._dict(name="JV-0001"), "on_cancel")
+		self.assertEqual(get_unposted_entry_groups([]), {})
@@ -0,0 +1,154 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import datetime
+import sys
+import types
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from expense_request import recurring
+from expense_request.accounting_dimensions_handler import get_active_dimensions
+from tests.memory_frappe import query_budget
+from tests.utils import COMPANY, setup_site
+
+
+def date(value):
+	return datetime.date.fromisoformat(value)
+
+
+class TestRecurringEntries(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		self.add_template("Rent", "Monthly", "2025-08-31", default_cost_center="Main - TC", default_region="Coast")
+		self.add_template("Fuel Float", "Weekly", "2025-11-10")
+
+		# naming series rows live in the stand-in's Series table
+		self.db.on_sql(r"insert into `tabSeries`", self.insert_series)
+		self.db.on_sql(r"update `tabSeries`", self.update_series)
+
+		get_active_dimensions()
+		self.db.log.reset()
+
+	def insert_series(self, query, values):
+		(prefix,) = values
+		if prefix not in self.db.table("Series"):
+			self.db.add("Series", {"name": prefix, "current": 0})
+		return []
+
+	def update_series(self, query, values):
+		count, prefix = values
+		self.db.table("Series")[prefix].current += count
+		return []
+
+	def add_template(self, name, frequency, start_date, **values):
+		self.db.add("Expense Entry Template", {
+			"name": name,
+			"company": COMPANY,
+			"payment_to": "Landlord",
+			"mode_of_payment": "Cash",
+			"frequency": frequency,
+			"start_date": date(start_date),
+			"next_date": date(start_date),
+			"disabled": 0,
+			"owner": "Administrator",
+			**values,
+		})
+		self.db.add("Expense Entry Item", [
+			{
+				"name": f"{name}-{idx}",
+				"parent": name,
+				"parenttype": "Expense Entry Template",
+				"parentfield": "expenses",
+				"idx": idx,
+				"expense_account": "Rent - TC",
+				"description": f"{name} {idx}",
+				"amount": 500,
+				"branch": "Depot" if idx == 1 else None,
+			}
+			for idx in (1, 2)
+		])
+
+	def get_entries(self):
+		return sorted(self.db.table("Expense Entry").values(), key=lambda entry: entry.name)
+
+	def test_due_periods_are_inserted_in_bulk(self):
+		# templates, their items, generated periods, one series block,
+		# two inserts, next dates
+		with query_budget(9):
+			names = recurring.generate_recurring_entries(as_of="2025-11-30")
+
+		periods = [(entry.recurring_template, entry.recurring_period) for entry in self.get_entries()]
+		self.assertEqual(names, [f"EXP-2025-{number:05d}" for number in range(1, 8)])
+		self.assertEqual(
+			[period for template, period in periods if template == "Rent"],
+			[date("2025-08-31"), date("2025-09-30"), date("2025-10-31"), date("2025-11-30")],
+		)
+		self.assertEqual(self.db.get_value("Expense Entry Template", "Rent", "next_date"), date("2025-12-31"))
+		self.assertEqual(self.db.get_value("Expense Entry Template", "Fuel Float", "next_date"), date("2025-12-01"))
+
+	def test_entries_have_totals_and_default_dimensions(self):
+		recurring.generate_recurring_entries(as_of="2025-08-31")
+		entry = self.get_entries()[0]
+		items = self.db.get_all("Expense Entry Item", filters={"parent": entry.name}, fields=["*"], order_by="idx asc")
+
+		self.assertEqual((entry.status, entry.docstatus, entry.total, entry.quantity), ("Pending", 0, 500 * 2, 2))
+		self.assertEqual([item.cost_center for item in items], ["Main - TC", "Main - TC"])
+		self.assertEqual([item.branch for item in items], ["Depot", None])
+		self.assertEqual(entry.default_region, "Coast")
+		self.assertEqual([item.region for item in items], ["Coast", "Coast"])
+		self.assertEqual([item.base_amount for item in items], [500, 500])
+		self.assertTrue(all(item.fingerprint for item in items))
+
+	def test_rerun_never_duplicates(self):
+		recurring.generate_recurring_entries(as_of="2025-11-30")
+		self.assertEqual(recurring.generate_recurring_entries(as_of="2025-11-30"), [])
+
+		# even if the schedule is wound back, generated periods are skipped
+		self.db.set_value("Expense Entry Template", "Rent", "next_date", date("2025-08-31"))
+		names = recurring.generate_recurring_entries(as_of="2025-12-31")
+
+		# December only: Rent on the 31st and five weekly floats
+		periods = [(entry.recurring_template, entry.recurring_period) for entry in self.get_entries()]
+		self.assertEqual(len(names), 6)
+		self.assertEqual(len(periods), len(set(periods)))
+
+	def test_names_follow_the_posting_year(self):
+		self.db.add("Series", {"name": "EXP-2025-", "current": 41})
+		self.db.set_value("Expense Entry Template", "Rent", "disabled", 1)
+		self.db.set_value("Expense Entry Template", "Fuel Float", "next_date", date("2025-12-22"))
+
+		names = recurring.generate_recurring_entries(as_of="2026-01-12")
+
+		self.assertEqual(
+			names,
+			["EXP-2025-00042", "EXP-2025-00043", "EXP-2026-00001", "EXP-2026-00002"],
+		)
+		self.assertEqual(self.db.table("Series")["EXP-2025-"].current, 43)
+
+	def test_template_without_items_keeps_its_next_date(self):
+		self.db.delete("Expense Entry Item", {"parent": "Rent"})
+
+		names = recurring.generate_recurring_entries(as_of="2025-11-30")
+
+		self.assertEqual({entry.recurring_template for entry in self.get_entries()}, {"Fuel Float"})
+		self.assertEqual(len(names), 3)
+		self.assertEqual(self.db.get_value("Expense Entry Template", "Rent", "next_date"), date("2025-08-31"))
+
+	def test_failing_template_does_not_block_the_others(self):
+		self.db.set_value("Expense Entry Item", {"parent": "Fuel Float"}, "currency", "USD")
+		# erpnext is not installed here; the rate lookup finds no USD rate
+		with patch.dict(sys.modules, {
+			"erpnext": types.ModuleType("erpnext"),
+			"erpnext.setup": types.ModuleType("erpnext.setup"),
+			"erpnext.setup.utils": types.SimpleNamespace(get_exchange_rate=lambda *args: 0),
+		}):
+			names = recurring.generate_recurring_entries(as_of="2025-11-30")
+
+		self.assertEqual(names, [f"EXP-2025-{number:05d}" for number in range(1, 5)])
+		self.assertEqual({entry.recurring_template for entry in self.get_entries()}, {"Rent"})
+		self.assertEqual(self.db.get_value("Expense Entry Template", "Rent", "next_date"), date("2025-12-31"))
+		self.assertEqual(self.db.get_value("Expense Entry Template", "Fuel Float", "next_date"), date("2025-11-10"))
+		self.assertEqual([error.title for error in frappe.local.errors], ["Recurring Expense Entries for Fuel Float failed"])
@@ -0,0 +1,139 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import re
+import unittest
+
+import frappe
+from frappe.utils import get_first_day, getdate
+
+from expense_request import accounting_dimensions_handler, summary
+from expense_request.accounting_dimensions_handler import get_active_dimensions, reconcile_dimension_fields
+from tests.memory_frappe import query_budget, run_jobs
+from tests.utils import COMPANY, make_entry, setup_site
+
+
+class TestExpenseSummary(unittest.TestCase):
+	"""Runs against the stand-in, with the summary module's SQL answered from
+	the in-memory tables below"""
+
+	def setUp(self):
+		self.db = setup_site()
+		# dimension fields on the items and the summary make them key fields
+		reconcile_dimension_fields()
+		self.db.on_sql(r"insert into `tabExpense Summary`", self.upsert_rows)
+		self.db.on_sql(r"from `tabExpense Entry` entry", self.select_totals)
+
+		get_active_dimensions()
+		summary.get_key_fields()
+		self.db.log.reset()
+
+	# ---- SQL answered from memory ----
+
+	def upsert_rows(self, query, values):
+		columns = re.findall(r"`(\w+)`", query.split(" values ")[0])
+		rows = self.db.table(summary.SUMMARY_DOCTYPE)
+		for start in range(0, len(values), len(columns)):
+			row = dict(zip(columns, values[start : start + len(columns)], strict=True))
+			existing = rows.get(row["name"])
+			if existing:
+				for column in ("amount", "line_count", "entry_count"):
+					existing[column] += row[column]
+			else:
+				self.db.add(summary.SUMMARY_DOCTYPE, row)
+		return []
+
+	def select_totals(self, query, values):
+		key_fields = re.findall(r"nullif\(item\.`(\w+)`, ''\) as", query)
+		totals = {}
+		for entry in self.db.table("Expense Entry").values():
+			if entry.docstatus != 1 or entry.status != "Approved":
+				continue
+			for item in entry.expenses:
+				key = (
+					entry.company,
+					str(get_first_day(getdate(entry.posting_date))),
+					*(item.get(fieldname) or None for fieldname in key_fields),
+				)
+				amount, lines, entries = totals.get(key, (0, 0, set()))
+				totals[key] = (amount + item.base_amount, lines + 1, entries | {entry.name})
+		return [
+			frappe._dict(
+				company=key[0],
+				month=key[1],
+				**dict(zip(key_fields, key[2:], strict=True)),
+				amount=amount,
+				line_count=lines,
+				entry_count=len(entries),
+			)
+			for key, (amount, lines, entries) in totals.items()
+		]
+
+	# ---- fixtures ----
+
+	def approve(self, name, items=3):
+		entry = make_entry(items=items, status="Approved", name=name)
+		for item in entry.expenses:
+			item.base_amount = item.amount
+		summary.on_submit(entry, "on_submit")
+		return entry
+
+	def get_rows(self):
+		return {
+			(row.expense_account, row.region): (round(row.amount, 2), row.line_count, row.entry_count)
+			for row in self.db.table(summary.SUMMARY_DOCTYPE).values()
+		}
+
+	def test_approval_is_one_upsert(self):
+		entry = make_entry(items=20, status="Approved")
+		for item in entry.expenses:
+			item.base_amount = item.amount
+
+		with query_budget(1):
+			summary.on_submit(entry, "on_submit")
+
+		rows = self.db.table(summary.SUMMARY_DOCTYPE).values()
+		self.assertEqual(sum(row.line_count for row in rows), 20)
+		self.assertEqual({row.entry_count for row in rows}, {1})
+
+	def test_submit_and_cancel_deltas(self):
+		first = self.approve("EXP-2025-00001", items=2)
+		self.approve("EXP-2025-00002", items=1)
+		self.assertEqual(
+			self.get_rows(),
+			{("Expense 0 - TC", "region 0"): (21, 2, 2), ("Expense 1 - TC", "region 1"): (11.5, 1, 1)},
+		)
+
+		summary.on_cancel(first, "on_cancel")
+		self.assertEqual(
+			self.get_rows(),
+			{("Expense 0 - TC", "region 0"): (10.5, 1, 1), ("Expense 1 - TC", "region 1"): (0, 0, 0)},
+		)
+
+	def test_rebuild_matches_incremental_rows(self):
+		self.approve("EXP-2025-00001", items=5)
+		self.approve("EXP-2025-00002", items=7)
+		cancelled = self.approve("EXP-2025-00003", items=2)
+		summary.on_cancel(cancelled, "on_cancel")
+		cancelled.docstatus = 2
+		incremental = {key: value for key, value in self.get_rows().items() if value[1]}
+
+		summary.rebuild_summary()
+
+		self.assertEqual(self.get_rows(), incremental)
+		self.assertEqual({row.company for row in self.db.table(summary.SUMMARY_DOCTYPE).values()}, {COMPANY})
+
+	def test_rows_are_rebuilt_when_a_dimension_is_disabled(self):
+		entry = self.approve("EXP-2025-00001", items=2)
+
+		branch = self.db.table("Accounting Dimension")["Branch"]
+		branch.load_doc_before_save()
+		branch.disabled = 1
+		accounting_dimensions_handler.on_dimension_change(branch, "on_update")
+		run_jobs()
+
+		# the cancellation finds the rows written without the branch key
+		summary.on_cancel(entry, "on_cancel")
+		rows = self.db.table(summary.SUMMARY_DOCTYPE).values()
+		self.assertEqual(len(rows), 2)
+		self.assertEqual({(row.get("branch"), row.line_count, row.entry_count) for row in rows}, {(None, 0, 0)})
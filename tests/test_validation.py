@@ -0,0 +1,126 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+import unittest
+
+import frappe
+
+from expense_request.expense_request.doctype.expense_entry.expense_entry import ExpenseEntry
+from tests.memory_frappe import query_budget
+from tests.utils import COMPANY, setup_site
+
+
+class TestLinkValidation(unittest.TestCase):
+	def setUp(self):
+		self.db = setup_site()
+		self.db.add("Mode of Payment", {"name": "Cash"})
+		self.db.add("Project", {"name": "PROJ-0001", "company": COMPANY})
+		self.db.add("Cost Center", [
+			{"name": "Main - TC", "company": COMPANY, "is_group": 0},
+			{"name": "All - TC", "company": COMPANY, "is_group": 1},
+			{"name": "Main - OC", "company": "Other Company", "is_group": 0},
+		])
+		self.db.add("Account", [
+			{"name": f"Expense {i} - TC", "company": COMPANY, "root_type": "Expense", "account_currency": "KES"}
+			for i in range(4)
+		])
+
+	def make_entry(self, items=20, overrides=None):
+		"""Entry with `items` valid rows; overrides maps a row index to changed values"""
+		overrides = overrides or {}
+		entry = ExpenseEntry({
+			"doctype": "Expense Entry",
+			"name": "EXP-2025-00001",
+			"company": COMPANY,
+			"mode_of_payment": "Cash",
+			"default_cost_center": "Main - TC",
+			"expenses": [
+				{
+					"expense_account": f"Expense {i % 4} - TC",
+					"amount": 10,
+					"cost_center": "Main - TC",
+					"project": "PROJ-0001",
+					**overrides.get(i, {}),
+				}
+				for i in range(items)
+			],
+		})
+		entry._action = "save"
+		return entry
+
+	def test_links_are_checked_once_per_linked_doctype(self):
+		entry = self.make_entry(items=20)
+
+		# Mode of Payment, Company, Cost Center, Account and Project, for any item count
+		with query_budget(5):
+			entry._validate_links()
+
+	def test_errors_of_every_row_are_raised_together(self):
+		entry = self.make_entry(items=4, overrides={
+			1: {"expense_account": "Missing - TC"},
+			2: {"cost_center": "All - TC"},
+			3: {"cost_center": "Main - OC"},
+		})
+
+		with self.assertRaises(frappe.LinkValidationError) as raised:
+			entry._validate_links()
+
+		self.assertEqual(
+			str(raised.exception).splitlines(),
+			[
+				"Row 2: Expense Account: Account Missing - TC does not exist",
+				"Row 3: Cost Center: Cost Center All - TC is a group; select a ledger",
+				"Row 4: Cost Center: Cost Center Main - OC does not belong to company Test Company",
+			],
+		)
+
+	def test_links_in_another_case_take_the_record_name(self):
+		entry = self.make_entry(items=2, overrides={1: {"expense_account": "expense 1 - tc", "cost_center": "MAIN - TC"}})
+
+		entry._validate_links()
+
+		self.assertEqual(
+			[(item.expense_account, item.cost_center) for item in entry.expenses],
+			[("Expense 0 - TC", "Main - TC"), ("Expense 1 - TC", "Main - TC")],
+		)
+
+	def test_dimension_custom_fields_are_checked(self):
+		self.db.add("Custom Field", {
+			"name": "Expense Entry Item-branch",
+			"dt": "Expense Entry Item",
+			"fieldname": "branch",
+			"label": "Branch",
+			"fieldtype": "Link",
+			"options": "Branch",
+		})
+		self.db.add("Branch", {"name": "Depot"})
+		entry = self.make_entry(items=2, overrides={0: {"branch": "Depot"}, 1: {"branch": "Nairobi"}})
+
+		with self.assertRaises(frappe.LinkValidationError) as raised:
+			entry._validate_links()
+
+		self.assertEqual(str(raised.exception), "Row 2: Branch: Branch Nairobi does not exist")
+
+	def test_skipped_when_ignoring_links_or_cancelling(self):
+		entry = self.make_entry(items=2, overrides={0: {"expense_account": "Missing - TC"}})
+		entry.flags.ignore_links = True
+		with query_budget(0):
+			entry._validate_links()
+
+		entry.flags.ignore_links = False
+		entry._action = "cancel"
+		with query_budget(0):
+			entry._validate_links()
+
+	def test_disabled_template_does_not_block_generated_entries(self):
+		self.db.add("Expense Entry Template", {"name": "Rent", "company": COMPANY, "disabled": 1})
+		self.db.add("Cost Center", {"name": "Closed - TC", "company": COMPANY, "is_group": 0, "disabled": 1})
+		entry = self.make_entry(items=2)
+		entry.recurring_template = "Rent"
+		entry._validate_links()
+
+		entry.default_cost_center = "Closed - TC"
+		with self.assertRaises(frappe.LinkValidationError) as raised:
+			entry._validate_links()
+
+		self.assertEqual(str(raised.exception), "Default Cost Center: Cost Center Closed - TC is disabled")
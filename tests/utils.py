@@ -0,0 +1,95 @@
+# Copyright (c) 2025, Bantoo and Contributors
+# See license.txt
+
+"""Fixtures for tests that run against the in-memory frappe stand-in"""
+
+import frappe
+
+from expense_request.accounting_dimensions_handler import clear_dimension_cache
+from expense_request.lookups import (
+	approver_name_cache,
+	exchange_rate_cache,
+	pay_account_cache,
+)
+from tests import memory_frappe
+
+COMPANY = "Test Company"
+DIMENSIONS = ("branch", "region", "department")
+
+
+def setup_site(dimensions=DIMENSIONS):
+	"""Fresh in-memory site with dimensions, a Cash account and an approver"""
+	db = memory_frappe.new_site()
+
+	db.add("Accounting Dimension", [
+		{
+			"name": fieldname.title(),
+			"fieldname": fieldname,
+			"label": fieldname.title(),
+			"document_type": fieldname.title(),
+			"disabled": 0,
+			"mandatory_for_bs": 0,
+			"mandatory_for_pl": 0,
+		}
+		for fieldname in dimensions
+	])
+	db.add("Mode of Payment Account", {
+		"name": "Cash-account",
+		"parent": "Cash",
+		"company": COMPANY,
+		"default_account": "Cash - TC",
+	})
+	db.add("User", {"name": "Administrator", "first_name": "Ada", "last_name": "Admin"})
+	db.add("Company", {"name": COMPANY, "default_currency": "KES"})
+	db.add("Account", {"name": "Cash - TC", "company": COMPANY, "account_currency": "KES"})
+
+	clear_dimension_cache()
+	pay_account_cache.invalidate()
+	approver_name_cache.invalidate()
+	exchange_rate_cache.invalidate()
+	# company and account records are in the document cache on a warm site
+	frappe.get_cached_value("Company", COMPANY, "default_currency")
+	frappe.get_cached_value("Account", "Cash - TC", "account_currency")
+	db.log.reset()
+	return db
+
+
+def make_entry(items=3, status="Pending", dimensions=DIMENSIONS, name="EXP-2025-00001"):
+	"""Store an Expense Entry and return it as loaded from the database"""
+	db = frappe.local.db
+	entry = frappe.get_doc({
+		"doctype": "Expense Entry",
+		"name": name,
+		"company": COMPANY,
+		"posting_date": "2025-11-01",
+		"payment_to": "Petty Cash Vendor",
+		"mode_of_payment": "Cash",
+		"status": status,
+		"docstatus": 1 if status == "Approved" else 0,
+		"default_cost_center": "Main - TC",
+		**{f"default_{fieldname}": f"Default {fieldname}" for fieldname in dimensions[:1]},
+		"expenses": [
+			{
+				"expense_account": f"Expense {i % 4} - TC",
+				"description": f"Line {i}",
+				"amount": 10.5 + i,
+				"cost_center": "Main - TC",
+				**{fieldname: f"{fieldname} {i % 2}" for fieldname in dimensions[1:]},
+			}
+			for i in range(items)
+		],
+	})
+	db.store(entry, count=False)
+	db.log.reset()
+	return entry
+
+
+def save_entry(entry, **changes):
+	"""Apply changes to a stored entry and run its validate and on_update hooks"""
+	from expense_request import api
+
+	entry.load_doc_before_save()
+	entry.update(changes)
+	api.setup(entry, "validate")
+	api.on_update(entry, "on_update")
+	return entry